@@ -0,0 +1,248 @@
+import hashlib
+import threading
+from collections import OrderedDict, deque, namedtuple
+import numpy as np
+import pandas as pd
+
+# 물류센터(인천 중구) 수취 건은 반품으로 보고 발송주소 기준으로 지역을 판정
+LOGISTICS_CENTER_KEYWORDS = ('인천', '중구')
+JEJU_KEYWORDS = ('제주', '서귀포')
+
+# 도서산간 지역 (공백을 뺀 주소에 포함되면 해당)
+# 군 전체가 섬인 곳은 군 이름, 일부 읍/면만 섬인 곳은 '시군+읍면' 으로 등록 - 택배사 목록이 바뀌면 함께 수정
+REMOTE_AREAS = (
+    '옹진군', '울릉군', '신안군',
+    '강화군교동면', '강화군삼산면', '강화군서도면',
+    '군산시옥도면', '부안군위도면', '보령시오천면',
+    '여수시남면', '여수시삼산면', '여수시화정면',
+    '완도군고금면', '완도군금당면', '완도군금일읍', '완도군노화읍', '완도군보길면',
+    '완도군생일면', '완도군소안면', '완도군약산면', '완도군청산면',
+    '진도군조도면', '영광군낙월면', '고흥군봉래면',
+    '통영시사량면', '통영시욕지면', '통영시한산면',
+    '제주시우도면', '제주시추자면',
+)
+# 주소 맨 앞이나 괄호 바로 뒤의 5자리 우편번호 앞자리 (지역명이 빠진 주소용)
+# '(402호)', '(63빌딩)' 처럼 숫자가 5자리가 아니면 우편번호로 보지 않음
+POSTAL_CODE_DIGITS = 5
+JEJU_POSTAL_PREFIXES = ('63',)
+REMOTE_POSTAL_PREFIXES = ('231', '402', '588')  # 옹진군, 울릉군, 신안군
+
+# 판정 결과 비트 (우편번호 비트는 숫자가 정확히 5자리로 끝날 때 제주/도서산간 비트로 옮김)
+_INCHEON, _JUNGGU, JEJU_FLAG, REMOTE_FLAG = 1, 2, 4, 8
+_POSTAL_JEJU, _POSTAL_REMOTE = 16, 32
+_POSTAL_FLAGS = _POSTAL_JEJU | _POSTAL_REMOTE
+_POSTAL_SHIFT = 2
+_CENTER_FLAGS = _INCHEON | _JUNGGU
+
+# 한 번의 일괄 실행 동안 여러 파일에 걸쳐 유지되는 주소 판정 캐시 크기
+ADDRESS_CACHE_SIZE = 200000
+# 한 번에 문자 배열로 펼치는 주소 수 (메모리 상한)
+MATCH_CHUNK_SIZE = 20000
+
+AddressCacheInfo = namedtuple('AddressCacheInfo', 'hits misses maxsize currsize')
+
+def normalize_address(address):
+    """Removes spaces so keyword matching is robust to spacing differences."""
+    return str(address).replace(' ', '')
+
+def default_keywords():
+    """Keyword -> flag bits for the logistics center, 제주 and 도서산간 areas and postal prefixes."""
+    keywords = {LOGISTICS_CENTER_KEYWORDS[0]: _INCHEON, LOGISTICS_CENTER_KEYWORDS[1]: _JUNGGU}
+    for keyword in JEJU_KEYWORDS:
+        keywords[keyword] = JEJU_FLAG
+    for area in REMOTE_AREAS:
+        keywords[area] = keywords.get(area, 0) | REMOTE_FLAG
+    # 우편번호는 여는 괄호 바로 뒤에서만 인정 (주소 앞에는 '(' 를 붙여서 검사)
+    for prefixes, flag in ((JEJU_POSTAL_PREFIXES, _POSTAL_JEJU), (REMOTE_POSTAL_PREFIXES, _POSTAL_REMOTE)):
+        for prefix in prefixes:
+            for bracket in '([':
+                keywords[bracket + prefix] = keywords.get(bracket + prefix, 0) | flag
+    return keywords
+
+class AreaMatcher:
+    """Aho-Corasick automaton over address keywords, compiled to a dense transition table.
+
+    match() walks every text once, character by character, and returns the
+    OR of the flag bits of all keywords it contains. Many texts are walked
+    side by side as NumPy columns, so the cost per character is a table lookup.
+    Postal-prefix keywords only count when their digit run is exactly
+    POSTAL_CODE_DIGITS long; the run length is tracked in the same pass.
+    """
+
+    def __init__(self, keywords):
+        alphabet = sorted({ch for text in keywords for ch in text})
+        # 문자 클래스 0 은 어떤 키워드에도 없는 문자 (패딩 포함)
+        classes = {ch: index + 1 for index, ch in enumerate(alphabet)}
+        self._class_of = np.zeros(0x10000, dtype=np.uint16)
+        for ch, index in classes.items():
+            self._class_of[ord(ch)] = index
+
+        goto = [{}]
+        out = [0]
+        for text, flag in keywords.items():
+            state = 0
+            for ch in text:
+                nxt = goto[state].get(classes[ch])
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][classes[ch]] = nxt
+                    goto.append({})
+                    out.append(0)
+                state = nxt
+            out[state] |= flag
+
+        # 실패 링크를 따라간 결과까지 전이표에 미리 채워 넣음 (DFA)
+        delta = np.zeros((len(goto), len(alphabet) + 1), dtype=np.int32)
+        fail = [0] * len(goto)
+        pending = deque()
+        for cls, nxt in goto[0].items():
+            delta[0, cls] = nxt
+            pending.append(nxt)
+        while pending:
+            state = pending.popleft()
+            out[state] |= out[fail[state]]
+            for cls in range(delta.shape[1]):
+                nxt = goto[state].get(cls)
+                if nxt is None:
+                    delta[state, cls] = delta[fail[state], cls]
+                else:
+                    fail[nxt] = delta[fail[state], cls]
+                    delta[state, cls] = nxt
+                    pending.append(nxt)
+        self._delta = delta
+        self._out = np.array(out, dtype=np.uint8)
+
+    def match(self, texts):
+        """Flag bits per text as a uint8 array."""
+        texts = list(texts)
+        flags = np.zeros(len(texts), dtype=np.uint8)
+        for start in range(0, len(texts), MATCH_CHUNK_SIZE):
+            chunk = np.array(texts[start:start + MATCH_CHUNK_SIZE], dtype=str)
+            codes = chunk.view(np.uint32).reshape(len(chunk), -1)
+            # 끝에 빈 열을 하나 더 붙여 마지막 숫자열도 길이를 확인
+            codes = np.ascontiguousarray(np.pad(codes, ((0, 0), (0, 1))).T)
+            state = np.zeros(len(chunk), dtype=np.int32)
+            found = np.zeros(len(chunk), dtype=np.uint8)
+            run = np.zeros(len(chunk), dtype=np.int32)
+            pending = np.zeros(len(chunk), dtype=np.uint8)
+            for column in codes:
+                digit = (column >= 0x30) & (column <= 0x39)
+                ended = ~digit & (run == POSTAL_CODE_DIGITS)
+                found[ended] |= pending[ended] >> _POSTAL_SHIFT
+                run = np.where(digit, run + 1, 0)
+                state = self._delta[state, self._class_of[np.minimum(column, 0xFFFF)]]
+                hits = self._out[state]
+                pending = np.where(digit, pending | (hits & _POSTAL_FLAGS), 0).astype(np.uint8)
+                found |= hits & ~np.uint8(_POSTAL_FLAGS)
+            flags[start:start + len(chunk)] = found
+        return flags
+
+_MATCHER = AreaMatcher(default_keywords())
+
+# 판정 규칙(키워드/지역/우편번호 규칙)의 fingerprint - 규칙이 바뀌면 원장에 저장된 지역구분/예상운임을 재사용하지 않음
+# 키워드 목록 변경은 자동으로 반영되고, 판정 로직 자체를 바꿀 때는 CLASSIFIER_REVISION 을 올림
+CLASSIFIER_REVISION = 2
+_RULES_VERSION = hashlib.sha1(repr((
+    CLASSIFIER_REVISION, sorted(default_keywords().items()), POSTAL_CODE_DIGITS,
+)).encode('utf-8')).hexdigest()[:12]
+
+def classifier_version():
+    """Fingerprint of the classification rules (REMOTE_AREAS, JEJU_KEYWORDS, postal prefixes, ...)."""
+    return _RULES_VERSION
+
+def _scan_text(address):
+    return '(' + normalize_address(address)
+
+# 주소 -> 판정 비트 LRU 캐시 (스레드 간 공유, 가득 차면 가장 오래 안 쓴 주소부터 버림)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {'hits': 0, 'misses': 0}
+
+def _cached_flags(values):
+    """Flag bits per value; each value not seen before is matched once and remembered."""
+    with _cache_lock:
+        known = [_cache.get(value) for value in values]
+        for value, flag in zip(values, known):
+            if flag is not None:
+                _cache.move_to_end(value)
+    missing = [index for index, flag in enumerate(known) if flag is None]
+    if missing:
+        found = _MATCHER.match([_scan_text(values[index]) for index in missing]).tolist()
+        for index, flag in zip(missing, found):
+            known[index] = flag
+    with _cache_lock:
+        _cache_stats['hits'] += len(values) - len(missing)
+        _cache_stats['misses'] += len(missing)
+        for index in missing[-ADDRESS_CACHE_SIZE:]:
+            _cache[values[index]] = known[index]
+        while len(_cache) > ADDRESS_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return np.array(known, dtype=np.uint8)
+
+def _flags_to_tuple(flags):
+    return (flags & _CENTER_FLAGS) == _CENTER_FLAGS, bool(flags & JEJU_FLAG), bool(flags & REMOTE_FLAG)
+
+def classify_address(address):
+    """Returns (is_logistics_center, is_jeju, is_remote) for a single raw address.
+
+    All checks run on the normalized address in one automaton pass;
+    a postal code at the start or in brackets counts as well.
+    """
+    return _flags_to_tuple(int(_cached_flags([address])[0]))
+
+def _classify_unique(values):
+    """Factorizes values and classifies each distinct one once; returns (flags per distinct value, codes)."""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=False)
+    return _cached_flags(list(uniques)), codes
+
+def classify_addresses(addresses, sender_addresses=None):
+    """Classifies aligned receiver/sender columns.
+
+    Returns (is_jeju, is_return, is_remote) boolean arrays. A row is a return
+    when the receiver is the logistics center and a non-blank sender address
+    exists; its region then comes from the sender address.
+    """
+    flags, codes = _classify_unique(addresses)
+    flags = flags[codes]
+    is_center = (flags & _CENTER_FLAGS) == _CENTER_FLAGS
+    receiver_jeju = (flags & JEJU_FLAG) != 0
+    receiver_remote = (flags & REMOTE_FLAG) != 0
+
+    if sender_addresses is None:
+        return receiver_jeju, np.zeros(len(codes), dtype=bool), receiver_remote
+
+    senders = pd.Series(sender_addresses, dtype=object)
+    senders = senders.where(senders.notna(), '')
+    sender_codes, sender_uniques = pd.factorize(senders)
+    sender_text = [str(value).strip() for value in sender_uniques]
+    has_sender = np.array([text != '' for text in sender_text], dtype=bool)[sender_codes]
+    sender_flags = _cached_flags(sender_text)[sender_codes]
+
+    is_return = is_center & has_sender
+    is_jeju = np.where(is_return, (sender_flags & JEJU_FLAG) != 0, receiver_jeju)
+    is_remote = np.where(is_return, (sender_flags & REMOTE_FLAG) != 0, receiver_remote)
+    return is_jeju, is_return, is_remote
+
+def region_label(is_jeju, is_remote, is_return=False):
+    """지역구분 text: 전국 / 제주 / 도서산간 / 제주 도서산간, with ' (반품)' for returns."""
+    label = '제주' if is_jeju else '전국'
+    if is_remote:
+        label = '제주 도서산간' if is_jeju else '도서산간'
+    return label + " (반품)" if is_return else label
+
+def region_labels(is_jeju, is_remote, is_return):
+    """Vectorized region_label over aligned boolean arrays."""
+    codes = np.asarray(is_jeju, dtype=np.intp) + 2 * np.asarray(is_remote, dtype=np.intp) \
+        + 4 * np.asarray(is_return, dtype=np.intp)
+    labels = np.array([region_label(code & 1, code & 2, code & 4) for code in range(8)], dtype=object)
+    return labels[codes]
+
+def address_cache_info():
+    """Hit/miss statistics of the shared address cache."""
+    with _cache_lock:
+        return AddressCacheInfo(_cache_stats['hits'], _cache_stats['misses'], ADDRESS_CACHE_SIZE, len(_cache))
+
+def clear_address_cache():
+    with _cache_lock:
+        _cache.clear()
+        _cache_stats['hits'] = _cache_stats['misses'] = 0
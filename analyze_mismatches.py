@@ -1,43 +1,123 @@
-import pandas as pd
+import argparse
 import os
+import time
+from results_warehouse import ResultsWarehouse, WAREHOUSE_PATH
+from invoice_io import read_invoice
 
-# result_file = 'results/verified_(incheon)ilayngilyangLogis(2025.9).xlsx' 
-# Let's check the new file specifically as the user mentioned "new raw data"
-result_file = 'results/verified_(incheon)ilayngilyangLogis(2025.11).xlsx'
+# 결과 저장소(SQLite)에서 월/법인/서비스를 가로질러 불일치 건을 조회
+# 예) python analyze_mismatches.py --entity TFSK --region 제주 --remark Surcharge --from 2025-01 --to 2025-12
 
-if not os.path.exists(result_file):
-    print(f"File not found: {result_file}")
-    exit()
+ENTITY_FOLDERS = ('TFSS', 'TFSK', 'FSK')
 
-print(f"Loading {result_file}...")
-df = pd.read_excel(result_file)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Query verified rows stored in the results warehouse.")
+    parser.add_argument('--db', default=WAREHOUSE_PATH, help="results warehouse (SQLite) path")
+    parser.add_argument('--entity', help="법인 (TFSS/TFSK/FSK)")
+    parser.add_argument('--service', help="운송 서비스 (택배/직배송/퀵서비스)")
+    parser.add_argument('--month', help="single month, YYYY-MM")
+    parser.add_argument('--from', dest='month_from', help="first month, YYYY-MM")
+    parser.add_argument('--to', dest='month_to', help="last month, YYYY-MM")
+    parser.add_argument('--region', help="지역구분 contains, e.g. 제주 or 반품")
+    parser.add_argument('--remark', help="비고 contains, e.g. Surcharge")
+    parser.add_argument('--waybill', help="운송장번호")
+    parser.add_argument('--all', action='store_true', help="include matching (✅ 일치) rows too")
+    parser.add_argument('--top', type=int, default=5, help="number of rows to print")
+    parser.add_argument('--csv', help="write the matching rows to this CSV file")
+    parser.add_argument('--summary', metavar='DIMS', nargs='?', const='month,entity',
+                        help="print the aggregate cube grouped by comma separated dimensions "
+                             "(month, entity, service, region, weight_bracket, remark; default: month,entity)")
+    parser.add_argument('--import', dest='import_paths', nargs='+', metavar='FILE',
+                        help="load existing verified_* files (xlsx/csv/parquet) into the warehouse first")
+    parser.add_argument('--rate-file', help="rate workbook whose weight brackets label the imported rows "
+                                            "(default: the brackets of the service's latest run)")
+    return parser.parse_args(argv)
 
-print(f"Total rows: {len(df)}")
-mismatches = df[df['검증결과'] == 'Mismatch']
-print(f"Total mismatches: {len(mismatches)}")
+def _entity_from_path(path):
+    parts = os.path.normpath(os.path.abspath(path)).split(os.sep)
+    for part in reversed(parts):
+        if part in ENTITY_FOLDERS:
+            return part
+    return ''
 
-if len(mismatches) > 0:
-    print("\n--- Top 5 Mismatches ---")
-    cols_to_show = ['수취주소', '무게', '발송금액', '예상요금', '차액', '비고_검증']
-    # Check if columns exist before printing
-    valid_cols = [c for c in cols_to_show if c in df.columns]
-    print(mismatches[valid_cols].head().to_string())
+def import_workbooks(warehouse, paths, entity=None, service=None, weight_limits=None):
+    """Backfills the warehouse from verified workbooks that were written before it existed."""
+    for path in paths:
+        try:
+            df, _ = read_invoice(path)
+        except Exception as e:
+            print(f"Error reading {path}: {e}")
+            continue
+        if '결과' not in df.columns:
+            print(f"Skipping {path}: not a verified workbook (no '결과' column)")
+            continue
+        file_entity = entity or _entity_from_path(path)
+        source_file = os.path.basename(path)
+        if source_file.startswith('verified_'):
+            source_file = source_file[len('verified_'):]
+        warehouse.record_run(df, file_entity, service or '', source_file, weight_limits=weight_limits)
+        print(f"Imported {len(df)} rows from {path} (entity: {file_entity or '-'})")
 
-    print("\n--- Mismatch Remarks Distribution ---")
-    print(mismatches['비고_검증'].value_counts())
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.import_paths and not os.path.exists(args.db):
+        print(f"Results warehouse not found: {args.db}")
+        print("Run a verification first, or use --import to load existing verified workbooks.")
+        return
+
+    with ResultsWarehouse(args.db) as warehouse:
+        if args.import_paths:
+            weight_limits = None
+            if args.rate_file:
+                from tariffs import load_rate_table, DEFAULT_SERVICE
+                weight_limits = load_rate_table(args.rate_file, args.service or DEFAULT_SERVICE).limits
+            import_workbooks(warehouse, args.import_paths, args.entity, args.service, weight_limits)
+
+        if args.summary:
+            # 집계 큐브만 읽음 (행 단위 테이블은 조회하지 않음)
+            started = time.perf_counter()
+            summary = warehouse.summary(by=args.summary.split(','), entity=args.entity, service=args.service,
+                                        month_from=args.month or args.month_from, month_to=args.month or args.month_to)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(f"Summary by {args.summary} ({elapsed_ms:.1f} ms)")
+            print(summary.to_string(index=False) if not summary.empty else "No rows found!")
+            return
+
+        started = time.perf_counter()
+        rows = warehouse.query_rows(
+            entity=args.entity,
+            service=args.service,
+            month_from=args.month or args.month_from,
+            month_to=args.month or args.month_to,
+            region=args.region,
+            remark=args.remark,
+            waybill=args.waybill,
+            mismatches_only=not args.all,
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+    label = "rows" if args.all else "mismatches"
+    print(f"Total {label}: {len(rows)} ({elapsed_ms:.1f} ms)")
+    if rows.empty:
+        print("No mismatches found!" if not args.all else "No rows found!")
+        return
+
+    print(f"\n--- Top {args.top} ---")
+    print(rows.head(args.top).to_string())
+
+    print("\n--- By month / entity ---")
+    print(rows.groupby(['month', 'entity', 'service']).size().to_string())
+
+    print("\n--- Remarks Distribution ---")
+    print(rows['remark'].value_counts().to_string())
 
     print("\n--- Average Difference ---")
-    print(f"Mean Diff: {mismatches['차액'].mean()}")
-    print(f"Min Diff: {mismatches['차액'].min()}")
-    print(f"Max Diff: {mismatches['차액'].max()}")
-    
-    # Check for potential shifting issues or non-numeric weights
-    print("\n--- Data Type Check (Weight) ---")
-    print(df['무게'].dtype)
-    non_numeric_weights = df[pd.to_numeric(df['무게'], errors='coerce').isna()]
-    if not non_numeric_weights.empty:
-        print(f"Found {len(non_numeric_weights)} rows with non-numeric weights:")
-        print(non_numeric_weights[['무게']].head())
-
-else:
-    print("No mismatches found!")
+    print(f"Mean Diff: {rows['diff'].mean()}")
+    print(f"Min Diff: {rows['diff'].min()}")
+    print(f"Max Diff: {rows['diff'].max()}")
+
+    if args.csv:
+        rows.to_csv(args.csv, index=False, encoding='utf-8-sig')
+        print(f"\nSaved {len(rows)} rows to {args.csv}")
+
+if __name__ == "__main__":
+    main()
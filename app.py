@@ -2,59 +2,64 @@
 import pandas as pd
 import io
 import os
-from datetime import datetime
-import shutil
 # 전역 경로 상수는 가져오지 않음.
 # 경로는 verification_page() 내부에서 서비스 선택에 따라 동적으로 설정됩니다.
-from verify_cost import load_rate_table, calculate_expected_cost
+from verify_cost import perform_verification, MATCH_STATUS, MISMATCH_STATUS, DUPLICATE_STATUS
+from tariffs import TARIFFS
+from entity_folders import BASE_DIR, SERVICE_OPTIONS, ENTITY_OPTIONS, ensure_entity_folder_structure
+from xlsx_stream import write_dataframe_xlsx
+from excel_loader import read_file_bytes
+from invoice_io import OUTPUT_FORMATS, invoice_format, is_invoice_file, read_invoice, sniff_invoice
+from verification_jobs import JobManager, VerificationJob
+from invoice_cache import load_cached_frame, store_cached_frame
+from result_view import ResultView, PAGE_SIZE_OPTIONS, page_count
+from results_warehouse import ResultsWarehouse, WAREHOUSE_PATH
+from waybill_index import WaybillIndex
 
 st.set_page_config(page_title="배송비 검증 시스템", layout="wide")
 st.title("🚀 배송비 자동 검증 시스템")
 
-# 공통 결과 표시 함수
-def ensure_entity_folder_structure(data_dir, entities):
-    structure = {}
-    for entity in entities:
-        entity_root = os.path.join(data_dir, entity)
-        input_dir = os.path.join(entity_root, "input")
-        output_dir = os.path.join(entity_root, "output")
-        verified_dir = os.path.join(entity_root, "verified")
-
-        os.makedirs(input_dir, exist_ok=True)
-        os.makedirs(output_dir, exist_ok=True)
-        os.makedirs(verified_dir, exist_ok=True)
-
-        structure[entity] = {
-            "root": entity_root,
-            "input": input_dir,
-            "output": output_dir,
-            "verified": verified_dir,
-        }
-    return structure
-
-def build_unique_target_path(directory, filename):
-    target_path = os.path.join(directory, filename)
-    if not os.path.exists(target_path):
-        return target_path
-
-    name, ext = os.path.splitext(filename)
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    candidate = os.path.join(directory, f"{name}_{timestamp}{ext}")
-    suffix = 1
-    while os.path.exists(candidate):
-        candidate = os.path.join(directory, f"{name}_{timestamp}_{suffix}{ext}")
-        suffix += 1
-    return candidate
-
-def display_verification_results(final_df):
-    col_actual_cost = '발송금액'
-    
-    # 요약 메트릭
-    total_count = len(final_df)
-    mismatch_df = final_df[final_df['결과'] == "❌ 불일치"]
-    mismatch_count = len(mismatch_df)
-    match_count = total_count - mismatch_count
-    match_rate = (match_count / total_count) * 100 if total_count > 0 else 0
+def get_result_view(final_df):
+    # 같은 결과 객체에 대해서는 필터 마스크/요약 집계를 리런마다 다시 계산하지 않음
+    cached = st.session_state.get('result_view')
+    if cached and cached[0] is final_df:
+        return cached[1]
+    view = ResultView(final_df)
+    st.session_state['result_view'] = (final_df, view)
+    return view
+
+def style_result_page(page_df, highlight_cols):
+    # 스타일은 화면에 보이는 페이지에만 적용
+    money_cols = [c for c in ['발송금액', '예상운임', '차액'] if c in page_df.columns]
+    styled = page_df.style.format("{:,}원", subset=money_cols)
+    if '결과' in page_df.columns:
+        styled = styled.map(
+            lambda v: 'color: red; font-weight: bold;' if v == MISMATCH_STATUS else ('color: green; font-weight: bold;' if v == MATCH_STATUS else ('color: darkorange; font-weight: bold;' if v == DUPLICATE_STATUS else '')),
+            subset=['결과']
+        )
+    highlight_cols = [c for c in highlight_cols if c in page_df.columns]
+    if highlight_cols:
+        styled = styled.map(lambda v: 'color: red; font-weight: bold;', subset=highlight_cols)
+    return styled
+
+def show_result_page(view, positions, key, columns=None, highlight_cols=()):
+    # 페이지 단위 표시 (대용량 결과도 브라우저에는 한 페이지만 전송)
+    col_size, col_page, col_info = st.columns([1, 1, 2])
+    page_size = col_size.selectbox("페이지당 행 수", PAGE_SIZE_OPTIONS, index=1, key=f"{key}_page_size")
+    pages = page_count(len(positions), page_size)
+    page_number = col_page.number_input("페이지", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+    page_number = min(int(page_number), pages)
+    start = (page_number - 1) * page_size
+    col_info.caption(f"{len(positions):,}건 중 {min(start + 1, len(positions)):,}–{min(start + page_size, len(positions)):,}건 표시 ({page_number}/{pages} 페이지)")
+    st.dataframe(style_result_page(view.page(positions, page_number, page_size, columns), highlight_cols))
+
+def display_verification_results(final_df, source_path=None):
+    # 요약 메트릭 (캐시된 집계 사용)
+    view = get_result_view(final_df)
+    total_count = view.total_count
+    mismatch_count = view.mismatch_count
+    match_count = view.match_count
+    match_rate = view.match_rate
 
     # 1. 🚨 불일치 건 즉시 표시 (최상단)
     if mismatch_count > 0:
@@ -63,154 +68,194 @@ def display_verification_results(final_df):
             # 불일치 데이터만 표시 (주요 컬럼 위주로)
             cols_to_show = ['운송장번호', '수취주소', '무게', '규격', '발송금액', '예상운임', '차액', '비고', '결과']
             # 존재하는 컬럼만 선택
-            existing_cols = [c for c in cols_to_show if c in mismatch_df.columns]
+            existing_cols = [c for c in cols_to_show if c in final_df.columns]
             if not existing_cols: # 중요 컬럼이 없으면 전체 표시
-                existing_cols = mismatch_df.columns.tolist()
-            
-            st.dataframe(
-                mismatch_df[existing_cols].style.map(
-                    lambda v: 'color: red; font-weight: bold;', subset=[c for c in ['차액', '결과'] if c in existing_cols]
-                ).format("{:,}원", subset=[c for c in ['발송금액', '예상운임', '차액'] if c in existing_cols])
-            )
-    else:
+                existing_cols = final_df.columns.tolist()
+            show_result_page(view, view.select(mismatch_only=True), "mismatch", existing_cols, highlight_cols=['차액', '결과'])
+    elif view.duplicate_count == 0:
         st.success("🎉 모든 배송비가 운임표와 정확히 일치합니다!")
         st.balloons()
 
+    # 다른 파일(다른 월/법인)에서 이미 청구된 운송장
+    if view.duplicate_count > 0:
+        st.warning(f"⚠️ **{view.duplicate_count}건**의 운송장이 다른 파일에서 이미 청구되었습니다.")
+        with st.expander("⚠️ 중복 청구 내역", expanded=True):
+            dup_cols = [c for c in ['운송장번호', '수취주소', '무게', '발송금액', '예상운임', '차액', '결과'] if c in final_df.columns]
+            show_result_page(view, view.select(duplicates_only=True), "duplicate", dup_cols or None, highlight_cols=['결과'])
+
     # 2. 메트릭 카드
-    col1, col2, col3 = st.columns(3)
-    col1.metric("총 건수", f"{total_count}건")
-    col2.metric("일치 건수", f"{match_count}건", delta=f"{match_rate:.1f}%")
-    col3.metric("불일치 건수", f"{mismatch_count}건", delta_color="inverse")
+    metric_cols = st.columns(4 if view.duplicate_count else 3)
+    metric_cols[0].metric("총 건수", f"{total_count}건")
+    metric_cols[1].metric("일치 건수", f"{match_count}건", delta=f"{match_rate:.1f}%")
+    metric_cols[2].metric("불일치 건수", f"{mismatch_count}건", delta_color="inverse")
+    if view.duplicate_count:
+        metric_cols[3].metric("중복 청구", f"{view.duplicate_count}건")
+    st.caption(f"결과 메모리: 행당 {view.bytes_per_row:,.0f} bytes (총 {view.bytes_per_row * total_count / 1024 / 1024:,.1f} MB)")
+
+    if view.region_counts:
+        with st.expander("📊 지역구분별 집계", expanded=False):
+            st.dataframe(pd.DataFrame(
+                [(region, total, mismatches) for region, (total, mismatches) in view.region_counts.items()],
+                columns=['지역구분', '건수', '불일치 건수']
+            ), hide_index=True)
 
     st.divider()
 
     # 3. 전체 데이터 상세 목록 (복구됨)
     st.subheader("📋 검증 결과 상세 목록")
     
-    # 필터 옵션
-    show_mismatch_only = st.checkbox("❌ 불일치 건만 보기", value=False)
-    
-    if show_mismatch_only:
-        display_df = mismatch_df
-    else:
-        display_df = final_df
-        
-    # 데이터프레임 표시 (스타일링 적용)
-    # 주요 컬럼 위주로 표시하되, 사용자가 필요로 하는 '지역구분' 포함
-    cols_to_display = [col for col in display_df.columns if col not in ['수취주소_원본', '발송주소_원본']] # 너무 긴 컬럼 제외 가능
-    
-    st.dataframe(
-        display_df.style.map(
-            lambda v: 'color: red; font-weight: bold;' if v == "❌ 불일치" else ('color: green; font-weight: bold;' if v == "✅ 일치" else ''),
-            subset=['결과']
-        ).format("{:,}원", subset=[col for col in [col_actual_cost, '예상운임', '차액'] if col in display_df.columns])
-    )
+    # 필터 옵션 (미리 계산한 마스크로 서버에서 필터링)
+    filter_cols = st.columns(3)
+    show_mismatch_only = filter_cols[0].checkbox("❌ 불일치 건만 보기", value=False)
+    selected_regions = filter_cols[1].multiselect("지역구분", view.options.get('지역구분', []))
+    selected_entities = filter_cols[2].multiselect("법인", view.options.get('법인', []))
+    positions = view.select(show_mismatch_only, selected_regions, selected_entities)
+
+    # 주요 컬럼 위주로 표시하되, 사용자가 필요로 하는 '지역구분' 포함 (너무 긴 원본 주소 컬럼 제외)
+    show_result_page(view, positions, "detail")
 
     # 결과 다운로드
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        final_df.to_excel(writer, index=False)
+    # verified 폴더에 이미 저장된 엑셀 파일이 있으면 그 바이트를 그대로 사용하고,
+    # 없거나 csv/parquet 로 보관된 경우 요청 시 한 번만 엑셀로 변환 (리런마다 다시 직렬화하지 않음)
+    if source_path and invoice_format(source_path) == 'xlsx' and os.path.exists(source_path):
+        download_data = read_file_bytes(source_path)
+        download_name = os.path.basename(source_path)
+    else:
+        # 같은 결과 객체에 대해 만든 바이트만 재사용
+        cached = st.session_state.get('download_bytes')
+        download_data = cached[1] if cached and cached[0] is final_df else None
+        download_name = "배송비_검증결과.xlsx"
+        if download_data is None:
+            if st.button("📦 다운로드용 엑셀 파일 준비"):
+                output = io.BytesIO()
+                write_dataframe_xlsx(final_df, output)
+                st.session_state['download_bytes'] = (final_df, output.getvalue())
+                st.rerun()
+            return
+
     st.download_button(
         label="📥 검증 결과 엑셀 다운로드",
-        data=output.getvalue(),
-        file_name="배송비_검증결과.xlsx",
+        data=download_data,
+        file_name=download_name,
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 
 
-# 검증 로직 분리 (재사용을 위해)
-def perform_verification(df, rate_map, selected_entity):
-    results = []
-    
-    # 컬럼 매핑 (유연하게 처리)
-    col_weight = '무게'
-    col_address = '수취주소'
-    col_actual_cost = '발송금액'
-    col_sender_address = None
-    
-    # 컬럼 찾기
-    for col in df.columns:
-        if '발송' in col and '주소' in col:
-            col_sender_address = col
-        elif '수취' in col and '주소' in col:
-            col_address = col
-        elif '무게' in col:
-            col_weight = col
-        elif '발송' in col and '금액' in col:
-            col_actual_cost = col
-
-    # 필수 컬럼 검사
-    missing_cols = []
-    if col_weight not in df.columns: missing_cols.append('무게')
-    if col_address not in df.columns: missing_cols.append('수취주소')
-    if col_actual_cost not in df.columns: missing_cols.append('발송금액')
-    
-    if missing_cols:
-        return None, f"필수 컬럼 누락: {', '.join(missing_cols)} (발견된 컬럼: {list(df.columns)})"
-
-    # 로직 수행
-    for index, row in df.iterrows():
-        weight = row.get(col_weight, 0)
-        address = row.get(col_address, '')
-        actual = row.get(col_actual_cost, 0)
-        
-        sender_addr = None
-        if col_sender_address:
-            val = row.get(col_sender_address)
-            if pd.notna(val) and str(val).strip() != '':
-                sender_addr = str(val).strip()
-
-        expected, region, remark = calculate_expected_cost(weight, address, rate_map, sender_address=sender_addr)
-        diff = actual - expected
-        status = "✅ 일치" if diff == 0 else "❌ 불일치"
-        
-        results.append({
-            '법인': selected_entity,
-            '운송장번호': row.get('운송장번호', ''),
-            '수취주소': address,
-            '무게': weight,
-            '규격': row.get('규격', ''),
-            '발송금액': actual,
-            '예상운임': expected,
-            '지역구분': region,
-            '차액': diff,
-            '결과': status,
-            '비고': remark
-        })
-
-    final_df = df.copy()
-    final_df['법인'] = selected_entity
-    final_df['예상운임'] = [r['예상운임'] for r in results]
-    final_df['지역구분'] = [r['지역구분'] for r in results]
-    final_df['차액'] = [r['차액'] for r in results]
-    final_df['결과'] = [r['결과'] for r in results]
-    final_df['비고'] = [r['비고'] for r in results]
-    
-    return final_df, None
-
 # === 설정 ===
-# 기본 데이터 경로 (최상위 폴더)
-BASE_DIR = r'C:\Users\yunh1\OneDrive - Thermo Fisher Scientific\비용 검증 프로그램'
+# 기본 데이터 경로 (최상위 폴더)는 entity_folders.BASE_DIR 사용
 
-# 1. 운임표 로드 (캐싱 적용 - 경로를 인자로 받음)
-@st.cache_data
-def get_rate_map(file_path, mtime):
+# 1. 운임표 로드 (서버 전체에서 서비스별로 한 번만 컴파일해 공유, 파일이 바뀌면 다시 컴파일)
+def get_rate_map(service, file_path):
     if not os.path.exists(file_path):
         return None
-    return load_rate_table(file_path)
+    return TARIFFS.get(service, file_path)
+
+# 백그라운드 검증 작업 풀 (서버 프로세스 전체에서 하나를 공유, 세션은 작업 ID만 보관)
+@st.cache_resource
+def get_job_manager():
+    return JobManager()
+
+def get_session_job(service=None, entity=None):
+    # 새로고침으로 세션이 비면 주소의 ?job= 으로, 그것도 없으면 같은 서비스/법인의 진행 중 작업에 다시 연결
+    manager = get_job_manager()
+    job_id = st.session_state.get('verification_job_id') or st.query_params.get('job')
+    job = manager.get(job_id) if job_id else None
+    if job is None and service is not None:
+        running = manager.active_jobs(service, entity)
+        job = running[-1] if running else None
+    if job is not None and st.session_state.get('verification_job_id') != job.id:
+        follow_job(job)
+    return job
+
+def follow_job(job):
+    st.session_state['verification_job_id'] = job.id
+    st.query_params['job'] = job.id
+
+def format_eta(seconds):
+    if seconds is None:
+        return "계산 중"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}분 {seconds}초" if minutes else f"{seconds}초"
+
+def publish_job_result(job):
+    # 작업 완료 시 한 번만 세션에 반영 (그 사이 이력 보기로 다른 결과를 열었다면 덮어쓰지 않음)
+    st.session_state['published_job_id'] = job.id
+    st.session_state['perf_records'] = job.perf_records
+    # 결과 frame 은 작업에서 꺼내 옴 (완료 작업 목록이 frame 을 계속 들고 있지 않도록)
+    result = job.take_result()
+    if result is not None and st.session_state.get('verification_result') is None:
+        final_df, display_name, verified_path = result
+        if final_df is None:
+            # 다른 세션이 이미 꺼내 간 결과는 verified 파일(캐시)에서 다시 읽음
+            final_df = load_job_frame(job, verified_path)
+            if final_df is None:
+                return
+        st.session_state['verification_result'] = final_df
+        st.session_state['current_file_name'] = display_name
+        st.session_state['current_file_path'] = verified_path
+
+def load_job_frame(job, verified_path):
+    if not verified_path:
+        return None
+    try:
+        final_df = load_cached_frame(verified_path, job.rate_mtime, f"verified|{job.entity}")
+        return final_df if final_df is not None else read_invoice(verified_path)[0]
+    except Exception as e:
+        st.warning(f"⚠️ 검증 결과 파일을 다시 읽지 못했습니다: {e}")
+        return None
+
+@st.fragment(run_every=1.0)
+def display_job_progress():
+    # 진행 중인 작업만 1초마다 이 부분만 다시 그림 (다른 화면 조작은 그대로 가능)
+    job = get_session_job()
+    if job is None:
+        return
+    if job.is_finished:
+        st.rerun()
+    progress = job.progress()
+    current = f" - {progress['current_file']}" if progress['current_file'] else ""
+    st.progress(progress['fraction'], text=f"처리 중 ({progress['files_done']}/{progress['files_total']}){current}")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("완료 파일", f"{progress['files_done']}/{progress['files_total']}")
+    col2.metric("처리 속도", f"{progress['rows_per_sec']:,.0f}행/초")
+    col3.metric("예상 남은 시간", format_eta(progress['eta_seconds']))
+
+def display_job_status():
+    job = get_session_job()
+    if job is None:
+        return
+    st.markdown(f"#### ⚙️ 검증 작업 ({job.service} / {job.entity}, {len(job.files)}개 파일)")
+    if not job.is_finished:
+        display_job_progress()
+        return
+    if st.session_state.get('published_job_id') != job.id:
+        publish_job_result(job)
+
+    for level, text in job.messages:
+        getattr(st, level)(text)
+    for filename, summary, head_df in job.previews:
+        with st.expander(f"🔎 [디버깅] 읽어온 원본 데이터 확인 (상위 5행) - {filename}"):
+            st.write(summary)
+            st.dataframe(head_df)
+    progress = job.progress()
+    st.success(
+        f"✅ 총 {len(job.files)}개 중 {job.success_count}개 검증 완료! "
+        f"(이동: {job.moved_count}건, 실패: {job.fail_count}건, {progress['elapsed_seconds']:.1f}초, "
+        f"{progress['rows_per_sec']:,.0f}행/초)"
+    )
 
 def verification_page():
     # === 운송 서비스 선택 ===
-    service_options = ["택배", "직배송", "퀵서비스"]
-    selected_service = st.sidebar.selectbox("운송 서비스 선택", service_options, index=0)
+    service_options = SERVICE_OPTIONS
+    selected_service = st.sidebar.selectbox("운송 서비스 선택", service_options, index=0, key="selected_service")
     
     # 선택된 서비스에 따른 데이터 경로 설정
     DATA_DIR = os.path.join(BASE_DIR, selected_service)
-    RATE_FILE = os.path.join(DATA_DIR, '운송요금_운임표.xlsx')
+    RATE_FILE = TARIFFS.rate_file(selected_service, DATA_DIR)
     
     # 2. 운임표 로드
     rate_file_mtime = os.path.getmtime(RATE_FILE) if os.path.exists(RATE_FILE) else 0
-    rate_map = get_rate_map(RATE_FILE, rate_file_mtime)
+    rate_map = get_rate_map(selected_service, RATE_FILE)
 
     st.markdown(f"### 🚛 {selected_service} 비용 검증 시스템")
 
@@ -227,7 +272,7 @@ def verification_page():
     st.sidebar.header("📁 데이터 업로드 (신규)")
 
     # 법인 선택 추가
-    entity_options = ["TFSS", "TFSK", "FSK"]
+    entity_options = ENTITY_OPTIONS
     selected_entity = st.sidebar.radio("법인 선택", entity_options, horizontal=True, key="verify_entity_radio")
 
     folder_map = ensure_entity_folder_structure(DATA_DIR, entity_options)
@@ -243,9 +288,30 @@ def verification_page():
     )
 
     selected_files = []
+    use_streaming = False
+    use_profiling = st.sidebar.checkbox(
+        "성능 프로파일링 (cProfile/tracemalloc)",
+        value=False,
+        help="검증 시 함수별 프로파일과 단계별 최대 메모리를 함께 기록합니다. 처리 속도가 다소 느려집니다."
+    )
+
+    # 증분 검증: 운송장번호 기준으로 신규/변경 행만 재계산
+    use_incremental = st.sidebar.checkbox(
+        "증분 검증 (변경된 행만 재계산)",
+        value=False,
+        help="이전에 같은 운임표로 검증한 운송장은 결과를 재사용합니다. 수정/누적 재발송 파일 재검증 시 빠릅니다."
+    )
+
+    # verified 폴더 보관 형식 (parquet 은 엑셀보다 훨씬 빠르고 작음)
+    output_format = st.sidebar.selectbox(
+        "검증 결과 저장 형식",
+        OUTPUT_FORMATS,
+        key="output_format",
+        help="verified 폴더에 저장할 형식입니다. xlsx 는 엑셀에서 바로 열 수 있고, parquet 는 보관/재조회가 빠릅니다."
+    )
     
     if os.path.exists(input_dir):
-        files = [f for f in os.listdir(input_dir) if f.endswith('.xlsx') and not f.startswith('~$')]
+        files = [f for f in os.listdir(input_dir) if is_invoice_file(f)]
         files.sort(key=lambda x: os.path.getmtime(os.path.join(input_dir, x)), reverse=True)
         
         # 검증 모드 선택 (단일 vs 다중)
@@ -261,6 +327,12 @@ def verification_page():
             # 전체 선택 옵션
             if st.sidebar.checkbox("전체 선택", value=False):
                 selected_files = files
+            # 대용량 파일은 청크 단위로 읽고 써서 메모리 사용량을 일정하게 유지
+            use_streaming = st.sidebar.checkbox(
+                "대용량 스트리밍 모드 (메모리 절약)",
+                value=False,
+                help="파일 전체를 메모리에 올리지 않고 청크 단위로 검증하여 verified 폴더에 바로 저장합니다. 화면에는 요약만 표시됩니다."
+            )
         else:
             # 단일 선택 모드
             selected_file = st.sidebar.selectbox(
@@ -272,126 +344,47 @@ def verification_page():
                 selected_files = [selected_file]
     
     if not files:
-        st.sidebar.warning(f"'{selected_entity}' 폴더에 엑셀 파일이 없습니다.")
+        st.sidebar.warning(f"'{selected_entity}' 폴더에 송장 파일(xlsx/csv/parquet)이 없습니다.")
         st.sidebar.caption(f"파일을 아래 경로에 넣어주세요:\n{input_dir}")
     elif selected_files:
         st.sidebar.info(f"{len(selected_files)}개 파일 선택됨")
+        # 선택한 파일의 시트/헤더만 빠르게 확인 (데이터 행은 읽지 않음)
+        for filename in selected_files:
+            try:
+                info = sniff_invoice(os.path.join(input_dir, filename))
+            except Exception as e:
+                st.sidebar.warning(f"⚠️ {filename}: 파일 구조 확인 실패 ({e})")
+                continue
+            if info.missing:
+                where = f" - '{info.sheet}' 시트" if info.sheet else ""
+                st.sidebar.warning(f"⚠️ {filename}: 필수 컬럼 누락 ({', '.join(info.missing)}){where}")
+
+    active_job = get_session_job(selected_service, selected_entity)
+    if active_job is not None and active_job.is_finished:
+        active_job = None
 
-    process_new = False
-    
     # 여기서부터 검증 로직 시작
     if selected_files:
         if rate_map is None:
             st.sidebar.button("🔍 검증 시작", disabled=True, key="verify_btn_disabled", help="운임표 파일(data/운송요금_운임표.xlsx)이 필요합니다.")
             st.sidebar.error("❌ 운임표 파일이 없어 검증할 수 없습니다.")
-        elif st.sidebar.button("🔍 선택한 파일 검증 시작"):
+        elif st.sidebar.button("🔍 선택한 파일 검증 시작", disabled=active_job is not None):
             # ✅ [핵심 수정] 검증 시작 즉시 이전 결과 초기화
             # 그렇지 않으면, 새 파일 검증이 끝나고 rerun되기 전에 이전 결과가 화면에 표시됨
             st.session_state['verification_result'] = None
             st.session_state['current_file_name'] = None
-            
-            process_new = True
-            # 프로그레스 바
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            success_count = 0
-            fail_count = 0
-            moved_count = 0
-            
-            # 결과 저장용 리스트 (마지막 파일만 보여주거나, 요약만 보여주거나 선택 필요)
-            # 여기서는 마지막 성공한 파일의 결과를 보여주는 것으로 유지하거나, 전체 요약만 보여주는 방식.
-            # UX상 여러개 처리시에는 요약이 낫고, 상세는 이력에서 보는게 나을 수 있음.
-            # 하지만 사용자는 바로 보고싶어 할 수 있으므로, 마지막 처리된 파일 정보를 세션에 저장.
-            
-            for i, selected_filename in enumerate(selected_files):
-                status_text.text(f"처리 중 ({i+1}/{len(selected_files)}): {selected_filename}")
-                selected_file_path = os.path.join(input_dir, selected_filename)
-                
-                # ✅ [수정] RESULTS_DIR 기반 중복 감지 로직 삭제
-                # 이전 로직은 '(2025 10)' in '(2025 10_1)' 처럼 문자열 포함 관계로
-                # 잘못된 중복을 감지하는 버그가 있었음.
-
-                try:
-                    file_name_for_save = os.path.basename(selected_file_path)
-                    
-                    try:
-                        # [캐싱/잠금 방지] 임시 파일로 복사하여 읽기
-                        import tempfile
-                        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-                            shutil.copy2(selected_file_path, tmp.name)
-                            temp_path = tmp.name
-                        
-                        try:
-                            with pd.ExcelFile(temp_path) as xls:
-                                sheet_to_use = 0
-                                if '세부내역' in xls.sheet_names:
-                                    sheet_to_use = '세부내역'
-                                
-                                df = pd.read_excel(xls, sheet_name=sheet_to_use)
-                            df.columns = df.columns.str.strip()
-                        finally:
-                            # 임시 파일 삭제
-                            if os.path.exists(temp_path):
-                                try:
-                                    os.remove(temp_path)
-                                except:
-                                    pass
-                    except Exception as e:
-                        st.error(f"❌ 파일 읽기 실패: {e}")
-                        fail_count += 1
-                        continue 
-                    
-                    # [디버깅] 파일 정보 및 데이터 확인
-                    file_mtime = datetime.fromtimestamp(os.path.getmtime(selected_file_path)).strftime('%Y-%m-%d %H:%M:%S')
-                    st.info(f"📂 **파일 읽기 성공**: `{selected_filename}`\n\n🕒 **마지막 수정 시간**: {file_mtime}")
-                    
-                    with st.expander("🔎 [디버깅] 읽어온 원본 데이터 확인 (상위 5행)"):
-                        st.write(f"총 {len(df)}행, '발송금액' 합계: {df['발송금액'].sum() if '발송금액' in df.columns else 'N/A'}")
-                        st.dataframe(df.head())
 
-                    # === 검증 로직 수행 (함수 호출) ===
-                    final_df, error_msg = perform_verification(df, rate_map, selected_entity)
-                    
-                    if error_msg:
-                        st.error(f"❌ [{selected_filename}] {error_msg}")
-                        fail_count += 1
-                        continue
-
-                    success_count += 1
-                    
-                    # 마지막 성공 결과를 세션에 저장 (화면 표시용)
-                    st.session_state['verification_result'] = final_df
-                    st.session_state['current_file_name'] = f"[{selected_entity}] {file_name_for_save} (최근 처리됨)"
-                    st.session_state['current_file_path'] = None # 저장된 경로가 없으므로 None
-                    
-                    # === 파일 이동 로직 (Verified 폴더) ===
-                    verified_target_path = build_unique_target_path(verified_dir, f"verified_{selected_filename}")
-                    output_target_path = build_unique_target_path(output_dir, selected_filename)
-
-                    try:
-                        final_df.to_excel(verified_target_path, index=False)
-                        shutil.move(selected_file_path, output_target_path)
-                        moved_count += 1
-                    except Exception as e:
-                        st.error(f"파일 저장 또는 이동 실패: {e}")
-                        fail_count += 1
-                        
-                except Exception as e:
-                    st.error(f"❌ [{selected_filename}] 처리 중 오류: {e}")
-                    fail_count += 1
-                
-                # 진행률 업데이트
-                progress_bar.progress((i + 1) / len(selected_files))
-
-            status_text.text("작업 완료!")
-            st.success(f"✅ 총 {len(selected_files)}개 중 {success_count}개 검증 완료! (이동: {moved_count}건, 실패: {fail_count}건)")
-            
-            if moved_count > 0:
-                st.info("🔄 목록 갱신을 위해 2초 후 새로고침됩니다...")
-                import time
-                time.sleep(2)
-                st.rerun()
+            # 검증은 서버의 작업 풀에서 백그라운드로 실행 (새로고침해도 중단되지 않음)
+            job = VerificationJob(
+                selected_files, selected_entity, selected_service, selected_paths, rate_map, rate_file_mtime,
+                use_streaming=use_streaming, use_incremental=use_incremental, use_profiling=use_profiling,
+                output_format=output_format
+            )
+            get_job_manager().submit(job)
+            follow_job(job)
+            st.rerun()
+        if active_job is not None:
+            st.sidebar.caption("⏳ 검증 작업이 진행 중입니다. 완료되면 새 작업을 시작할 수 있습니다.")
 
     # 3. 사이드바 설정 (Verified 이력 보기)
     st.sidebar.divider()
@@ -399,54 +392,116 @@ def verification_page():
     
     # verified_dir is already resolved by selected entity folder structure
     if os.path.exists(verified_dir):
-        verified_files = [f for f in os.listdir(verified_dir) if f.endswith('.xlsx')]
+        verified_files = [f for f in os.listdir(verified_dir) if is_invoice_file(f)]
         verified_files.sort(key=lambda x: os.path.getmtime(os.path.join(verified_dir, x)), reverse=True)
         
         if verified_files:
             selected_history = st.sidebar.selectbox("완료된 파일 선택", verified_files)
             if st.sidebar.button("📂 결과 다시 보기"):
-                if not process_new: # 새로운 파일 처리 중이 아닐 때만 이력 보기 실행
-                    try:
-                        history_path = os.path.join(verified_dir, selected_history)
-                        
-                        # [캐싱/잠금 방지] 임시 파일로 복사하여 읽기
-                        import tempfile
-                        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-                            shutil.copy2(history_path, tmp.name)
-                            temp_path = tmp.name
-                        
+                try:
+                    history_path = os.path.join(verified_dir, selected_history)
+                    cache_tag = f"verified|{selected_entity}"
+
+                    # [캐시] 같은 파일 + 같은 운임표면 엑셀 파싱과 재검증을 건너뜀
+                    verified_df = load_cached_frame(history_path, rate_file_mtime, cache_tag)
+                    error_msg = None
+                    if verified_df is None:
+                        # [잠금 방지] 원본을 한 번만 메모리로 읽어 파싱 (임시 파일 복사 없음)
+                        history_source_df, _ = read_invoice(history_path)
+                    
+                        # 재검증 수행 (다른 파일에서 이미 청구된 운송장도 다시 표시, 같은 송장끼리는 중복 아님)
                         try:
-                            with pd.ExcelFile(temp_path) as xls:
-                                sheet_to_use = 0
-                                if '세부내역' in xls.sheet_names:
-                                    sheet_to_use = '세부내역'
-                                history_source_df = pd.read_excel(xls, sheet_name=sheet_to_use)
-                            history_source_df.columns = history_source_df.columns.str.strip()
+                            waybill_index = WaybillIndex()
+                        except Exception as e:
+                            st.warning(f"⚠️ 운송장 색인 사용 불가: {e}")
+                            waybill_index = None
+                        try:
+                            verified_df, error_msg = perform_verification(
+                                history_source_df, rate_map, selected_entity, waybill_index=waybill_index,
+                                service=selected_service, source_file=selected_history)
                         finally:
-                            if os.path.exists(temp_path):
-                                try:
-                                    os.remove(temp_path)
-                                except:
-                                    pass
-                        
-                        # 재검증 수행
-                        verified_df, error_msg = perform_verification(history_source_df, rate_map, selected_entity)
-                        
+                            if waybill_index is not None:
+                                waybill_index.close()
+                    
                         if verified_df is not None:
-                            st.info(f"📂 불러온 파일: {selected_history} (재검증 결과)")
-                            st.session_state['verification_result'] = verified_df
-                            st.session_state['current_file_name'] = f"📂 {selected_history} (완료 건)"
-                            st.rerun() 
-                        else:
-                            st.error(f"검증 실패: {error_msg}")
-                            
-                    except Exception as e:
-                        st.sidebar.error(f"파일 로드 실패: {e}")
+                            try:
+                                store_cached_frame(history_path, verified_df, rate_file_mtime, cache_tag)
+                            except Exception:
+                                pass
+                    
+                    if verified_df is not None:
+                        st.info(f"📂 불러온 파일: {selected_history} (재검증 결과)")
+                        st.session_state['verification_result'] = verified_df
+                        st.session_state['current_file_name'] = f"📂 {selected_history} (완료 건)"
+                        st.session_state['current_file_path'] = history_path
+                        st.rerun() 
+                    else:
+                        st.error(f"검증 실패: {error_msg}")
+                        
+                except Exception as e:
+                    st.sidebar.error(f"파일 로드 실패: {e}")
         else:
             st.sidebar.info("완료된 파일이 없습니다.")
     else:
         st.sidebar.info("완료된 파일 폴더가 없습니다.")
 
+def display_performance_panel():
+    perf_records = st.session_state.get('perf_records')
+    if not perf_records:
+        return
+    with st.expander("⏱️ 성능 (최근 검증 실행)", expanded=False):
+        rows = []
+        for record in perf_records:
+            for stage in record['stages']:
+                rows.append({
+                    '파일': record['run'],
+                    '단계': stage['stage'],
+                    '소요(초)': stage['seconds'],
+                    '행/초': stage.get('rows_per_sec'),
+                    # peak_mb 는 단계별 최대치(tracemalloc), peak_rss_mb 는 프로세스 시작 이후 최대 RSS
+                    '단계 최대 메모리(MB)': stage.get('peak_mb'),
+                    '프로세스 최대 RSS(MB)': stage.get('peak_rss_mb'),
+                })
+        st.dataframe(pd.DataFrame(rows), hide_index=True)
+        total_seconds = sum(record['total_seconds'] for record in perf_records)
+        total_rows = sum(record.get('rows', 0) for record in perf_records)
+        st.caption(f"총 {len(perf_records)}개 파일, {total_rows:,}행, {total_seconds:.2f}초 · 실행 로그: run_log.jsonl")
+        for record in perf_records:
+            if record.get('profile'):
+                st.text(f"[{record['run']}] cProfile 상위 함수")
+                st.code(record['profile'])
+
+# 누적 요약: 결과 저장소의 집계 큐브만 읽음 (엑셀/행 단위 데이터는 다시 읽지 않음)
+SUMMARY_DIMENSIONS = {'월': 'month', '법인': 'entity', '서비스': 'service', '지역구분': 'region',
+                      '무게 구간': 'weight_bracket', '비고': 'remark'}
+
+def display_summary_view(service):
+    st.subheader("📈 누적 요약 (결과 저장소)")
+    if not os.path.exists(WAREHOUSE_PATH):
+        st.info("아직 결과 저장소에 기록된 검증이 없습니다.")
+        return
+    col_by, col_scope = st.columns([3, 1])
+    labels = col_by.multiselect("묶음 기준", list(SUMMARY_DIMENSIONS), default=['월', '법인'])
+    all_services = col_scope.checkbox("모든 서비스", value=False)
+    by = [SUMMARY_DIMENSIONS[label] for label in labels]
+    with ResultsWarehouse() as warehouse:
+        summary = warehouse.summary(by=by, service=None if all_services else service)
+    if summary.empty:
+        st.info("조건에 맞는 검증 결과가 없습니다.")
+        return
+
+    total_rows = int(summary['rows'].sum())
+    total_mismatches = int(summary['mismatches'].sum())
+    col1, col2, col3 = st.columns(3)
+    col1.metric("총 건수", f"{total_rows:,}건")
+    col2.metric("불일치 건수", f"{total_mismatches:,}건")
+    col3.metric("차액 합계", f"{summary['diff_sum'].sum():,.0f}원")
+
+    summary['불일치율(%)'] = (summary['mismatches'] / summary['rows'].where(summary['rows'] > 0) * 100).round(1)
+    names = {column: label for label, column in SUMMARY_DIMENSIONS.items()}
+    names.update(rows='건수', mismatches='불일치 건수', diff_sum='차액 합계')
+    st.dataframe(summary.rename(columns=names), hide_index=True)
+
 def open_folder(path):
     import platform
     import subprocess
@@ -459,11 +514,18 @@ def open_folder(path):
 
 # 메인 로직 실행
 verification_page()
+display_job_status()
+display_performance_panel()
+
+st.sidebar.divider()
+if st.sidebar.checkbox("📈 누적 요약 보기", value=False, key="show_summary_view"):
+    st.divider()
+    display_summary_view(st.session_state.get('selected_service'))
 
 # 세션 스테이트에 저장된 결과가 있으면 표시 (리런 시에도 유지됨)
 if 'verification_result' in st.session_state and st.session_state['verification_result'] is not None:
     st.divider()
     if 'current_file_name' in st.session_state:
         st.subheader(f"📊 현재 보기: {st.session_state['current_file_name']}")
-    display_verification_results(st.session_state['verification_result'])
+    display_verification_results(st.session_state['verification_result'], st.session_state.get('current_file_path'))
 
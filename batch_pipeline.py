@@ -0,0 +1,77 @@
+import queue
+import threading
+from collections import namedtuple
+
+# 파일 단위 작업을 단계(읽기 → 검증 → 저장/이동)별 스레드로 나눠 겹쳐 실행
+# 단계 사이 큐의 크기를 제한해 앞 단계가 너무 앞서가지 않도록 함 (메모리 상한)
+DEFAULT_QUEUE_SIZE = 2
+_DONE = object()
+
+class PipelineStage(namedtuple('PipelineStage', 'name func workers on_exit')):
+    """One pipeline step: func(item) -> item for the next stage, or None to drop it.
+
+    workers threads run func concurrently; on_exit() is called in each worker
+    thread when it finishes (e.g. to close a per-thread SQLite connection).
+    """
+
+    def __new__(cls, name, func, workers=1, on_exit=None):
+        return super().__new__(cls, name, func, max(1, workers), on_exit)
+
+def run_pipeline(items, stages, queue_size=DEFAULT_QUEUE_SIZE):
+    """Feeds items through stages with bounded queues in between; blocks until all are done.
+
+    The first exception raised by a stage stops the feed, lets the items
+    already queued drain without further processing and is re-raised here.
+    """
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    errors = []
+    failed = threading.Event()
+
+    def feed():
+        for item in items:
+            if failed.is_set():
+                break
+            queues[0].put(item)
+        queues[0].put(_DONE)
+
+    def work(index, stage, remaining):
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(stages) else None
+        try:
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    # 같은 단계의 다른 작업자도 끝나도록 종료 표시를 되돌려 놓음
+                    inbox.put(_DONE)
+                    break
+                if failed.is_set():
+                    continue
+                try:
+                    result = stage.func(item)
+                except Exception as e:
+                    errors.append(e)
+                    failed.set()
+                    continue
+                if result is not None and outbox is not None:
+                    outbox.put(result)
+        finally:
+            if stage.on_exit is not None:
+                stage.on_exit()
+            with remaining['lock']:
+                remaining['count'] -= 1
+                last = remaining['count'] == 0
+            if last and outbox is not None:
+                outbox.put(_DONE)
+
+    threads = [threading.Thread(target=feed, name='pipeline-feed', daemon=True)]
+    for index, stage in enumerate(stages):
+        remaining = {'count': stage.workers, 'lock': threading.Lock()}
+        for n in range(stage.workers):
+            threads.append(threading.Thread(target=work, args=(index, stage, remaining),
+                                            name=f"pipeline-{stage.name}-{n}", daemon=True))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
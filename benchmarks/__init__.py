@@ -0,0 +1 @@
+"""Synthetic invoice generator and stage benchmarks for the verification pipeline."""
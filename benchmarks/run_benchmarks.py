@@ -0,0 +1,164 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+from verify_cost import (load_rate_table, calculate_expected_cost, calculate_expected_costs,
+                         assign_result_columns, process_file)
+from excel_loader import read_invoice_frame
+from xlsx_stream import write_dataframe_xlsx
+from benchmarks.synthetic import make_invoice, make_rate_table, write_rate_table_xlsx, write_invoice_xlsx
+
+# 사용 예)
+#   python -m benchmarks.run_benchmarks --sizes 1000,100000 --save-baseline
+#   python -m benchmarks.run_benchmarks --sizes 1000,100000      (baseline 대비 성능 저하 시 exit 1)
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_TOLERANCE = 0.25
+SCALAR_SAMPLE_ROWS = 20000
+# 측정 잡음 때문에 게이트가 흔들리지 않도록 최소 DEFAULT_REPEAT 번, 합계 MIN_MEASURE_SECONDS 이상 반복해 최솟값 사용
+DEFAULT_REPEAT = 3
+MIN_MEASURE_SECONDS = 0.5
+MAX_REPEAT = 100
+
+def _best_time(func, repeat=DEFAULT_REPEAT, min_seconds=MIN_MEASURE_SECONDS):
+    """Best of at least `repeat` runs, repeated until min_seconds have been measured (at most MAX_REPEAT runs)."""
+    best = None
+    total = 0.0
+    runs = 0
+    while runs < repeat or (total < min_seconds and runs < MAX_REPEAT):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        total += elapsed
+        runs += 1
+    return best
+
+def run_size(rows, work_dir, repeat=DEFAULT_REPEAT, args=None, min_seconds=MIN_MEASURE_SECONDS):
+    """Times each verification stage for one invoice size; returns {stage: rows per second}."""
+    rate_table = make_rate_table()
+    invoice = make_invoice(rows, jeju_share=args.jeju_share, return_share=args.return_share,
+                           heavy_share=args.heavy_share, remote_share=args.remote_share, rate_table=rate_table)
+    invoice_path = write_invoice_xlsx(os.path.join(work_dir, f"invoice_{rows}.xlsx"), invoice)
+    results = {}
+
+    # 1. xlsx read
+    holder = {}
+    def read():
+        holder['df'], _ = read_invoice_frame(invoice_path, strip_columns=False)
+    results['xlsx_read'] = rows / _best_time(read, repeat, min_seconds)
+    df = holder['df']
+
+    # 2. scalar pricing (reference implementation, sampled)
+    sample = df.head(SCALAR_SAMPLE_ROWS)
+    def scalar():
+        for weight, address, sender in zip(sample['무게'], sample['수취주소'], sample['발송주소']):
+            calculate_expected_cost(weight, address, rate_table, sender_address=sender if isinstance(sender, str) else None)
+    results['scalar_pricing'] = len(sample) / _best_time(scalar, repeat, min_seconds)
+
+    # 3. batch pricing
+    priced = {}
+    def pricing():
+        priced['result'] = calculate_expected_costs(df['무게'], df['수취주소'], rate_table, sender_addresses=df['발송주소'])
+    results['pricing'] = rows / _best_time(pricing, repeat, min_seconds)
+
+    # 4. result assembly
+    expected, regions, remarks = priced['result']
+    def assembly():
+        assign_result_columns(df, df['발송금액'], expected, regions, remarks)
+    results['assembly'] = rows / _best_time(assembly, repeat, min_seconds)
+
+    # 5. xlsx write
+    out_path = os.path.join(work_dir, f"verified_{rows}.xlsx")
+    results['xlsx_write'] = rows / _best_time(lambda: write_dataframe_xlsx(df, out_path), repeat, min_seconds)
+
+    # 6. end to end (process_file, without the results warehouse)
+    results_dir = os.path.join(work_dir, 'results')
+    def end_to_end():
+        with contextlib.redirect_stdout(io.StringIO()):
+            process_file(invoice_path, rate_table, results_dir=results_dir)
+    results['process_file'] = rows / _best_time(end_to_end, repeat, min_seconds)
+    return results
+
+def run_rate_table(work_dir, repeat=DEFAULT_REPEAT, min_seconds=MIN_MEASURE_SECONDS):
+    path = write_rate_table_xlsx(os.path.join(work_dir, '운송요금_운임표.xlsx'))
+    return 1 / _best_time(lambda: load_rate_table(path), repeat, min_seconds)
+
+def compare_with_baseline(report, baseline, tolerance):
+    """Returns a list of (key, current, baseline) entries that regressed past tolerance."""
+    regressions = []
+    for size, stages in report.items():
+        for stage, current in stages.items():
+            expected = baseline.get(size, {}).get(stage)
+            if expected and current < expected * (1 - tolerance):
+                regressions.append((f"{size}/{stage}", current, expected))
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the verification pipeline on synthetic invoices.")
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help="comma separated invoice sizes (rows)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f"minimum repetitions per stage; the best time is kept (default: {DEFAULT_REPEAT})")
+    parser.add_argument('--min-seconds', type=float, default=MIN_MEASURE_SECONDS,
+                        help="keep repeating a stage until this much time has been measured "
+                             f"(default: {MIN_MEASURE_SECONDS}, at most {MAX_REPEAT} runs)")
+    parser.add_argument('--jeju-share', type=float, default=0.05)
+    parser.add_argument('--return-share', type=float, default=0.05)
+    parser.add_argument('--heavy-share', type=float, default=0.03)
+    parser.add_argument('--remote-share', type=float, default=0.01)
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline JSON (throughput per stage)")
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed throughput drop versus the baseline (0.25 = 25%%)")
+    parser.add_argument('--output', help="also write the report as JSON to this path")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    report = {}
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        report['rate_table'] = {'load_rate_table': run_rate_table(work_dir, args.repeat, args.min_seconds)}
+        print(f"load_rate_table: {1 / report['rate_table']['load_rate_table'] * 1000:.1f} ms")
+        for rows in sizes:
+            print(f"\n=== {rows:,} rows ===")
+            stages = run_size(rows, work_dir, args.repeat, args, args.min_seconds)
+            report[str(rows)] = stages
+            for stage, throughput in stages.items():
+                print(f"  {stage:<15} {throughput:>14,.0f} rows/s   {rows / throughput:>9.3f} s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nSaved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(report, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ Throughput regressed more than {args.tolerance:.0%} versus the baseline:")
+        for key, current, expected in regressions:
+            print(f"  {key}: {current:,.0f}/s (baseline {expected:,.0f}/s)")
+        return 1
+    print(f"\n✅ No stage regressed more than {args.tolerance:.0%} versus the baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+from verify_cost import RateTable, calculate_expected_costs
+from xlsx_stream import write_dataframe_xlsx
+
+# 벤치마크용 가상 운임표/세부내역 생성기
+
+DEFAULT_BRACKETS = [
+    # (limit kg, 전국, 제주)
+    (1, 3100, 6100),
+    (3, 3600, 6600),
+    (5, 4100, 7100),
+    (10, 5600, 8600),
+    (15, 6600, 9600),
+    (20, 7600, 10600),
+    (25, 8600, 11600),
+    (30, 9600, 12600),
+]
+
+NATIONAL_ADDRESSES = [
+    '서울특별시 강남구 테헤란로', '서울특별시 중구 세종대로', '부산광역시 해운대구 센텀중앙로',
+    '대구광역시 수성구 동대구로', '대전광역시 유성구 대학로', '광주광역시 북구 첨단과기로',
+    '경기도 수원시 영통구 광교로', '경기도 성남시 분당구 판교로', '충청북도 청주시 흥덕구 오송읍',
+    '경상남도 창원시 성산구 중앙대로', '강원특별자치도 춘천시 강원대학길', '인천광역시 연수구 송도과학로',
+]
+JEJU_ADDRESSES = ['제주특별자치도 제주시 첨단로', '제주특별자치도 서귀포시 중앙로', '제주 제주시 연동']
+REMOTE_ADDRESSES = ['인천광역시 옹진군 백령면 진촌리', '경상북도 울릉군 울릉읍 도동리', '전라남도 신안군 흑산면 예리',
+                    '제주특별자치도 제주시 우도면 연평리']
+LOGISTICS_CENTER_ADDRESS = '인천광역시 중구 공항동로 물류센터'
+
+def make_rate_table(brackets=DEFAULT_BRACKETS):
+    return RateTable([b[0] for b in brackets], [b[1] for b in brackets], [b[2] for b in brackets])
+
+def write_rate_table_xlsx(path, brackets=DEFAULT_BRACKETS, remote_surcharge=RateTable.REMOTE_SURCHARGE):
+    """Writes a rate workbook in the 운송요금_운임표.xlsx layout load_rate_table expects."""
+    rows = [['택배 운임표', None, None, None], ['구분', '무게,세변의 합', '운임', None], [None, None, '전국', '제주']]
+    for limit, national, jeju in brackets:
+        rows.append([None, f"{limit}kg / {limit * 10 + 50}cm", national, jeju])
+    if remote_surcharge is not None:
+        rows.append(['도서산간', '추가 운임', remote_surcharge[0], remote_surcharge[1]])
+    pd.DataFrame(rows).to_excel(path, header=False, index=False)
+    return path
+
+def make_invoice(rows, jeju_share=0.05, return_share=0.05, heavy_share=0.03, mismatch_share=0.02,
+                 rate_table=None, seed=0, remote_share=0.01):
+    """Builds a 세부내역-style invoice DataFrame.
+
+    jeju_share: receivers in 제주, remote_share: receivers in 도서산간 areas,
+    return_share: parcels returned to the
+    Incheon logistics center (region taken from the sender), heavy_share:
+    parcels over the largest bracket, mismatch_share: rows whose 발송금액 is
+    deliberately off from the rate table.
+    """
+    rng = np.random.default_rng(seed)
+    rate_table = rate_table or make_rate_table()
+
+    receivers = rng.choice(NATIONAL_ADDRESSES, rows).astype(object)
+    senders = np.full(rows, '', dtype=object)
+
+    kind = rng.random(rows)
+    jeju = kind < jeju_share
+    returns = (kind >= jeju_share) & (kind < jeju_share + return_share)
+    receivers[jeju] = rng.choice(JEJU_ADDRESSES, int(jeju.sum()))
+    remote = (kind >= jeju_share + return_share) & (kind < jeju_share + return_share + remote_share)
+    receivers[returns] = LOGISTICS_CENTER_ADDRESS
+    receivers[remote] = rng.choice(REMOTE_ADDRESSES, int(remote.sum()))
+    return_senders = np.concatenate([NATIONAL_ADDRESSES, JEJU_ADDRESSES])
+    senders[returns] = rng.choice(return_senders, int(returns.sum()))
+
+    weights = np.round(rng.uniform(0.1, rate_table.max_limit, rows), 1)
+    heavy = rng.random(rows) < heavy_share
+    weights[heavy] = np.round(rng.uniform(rate_table.max_limit + 0.1, rate_table.max_limit + 40, int(heavy.sum())), 1)
+
+    expected, _, _ = calculate_expected_costs(weights, receivers, rate_table, sender_addresses=senders)
+    actual = expected.copy()
+    mismatch = rng.random(rows) < mismatch_share
+    actual[mismatch] += rng.choice([-1000, 500, 1000, 3000], int(mismatch.sum()))
+
+    return pd.DataFrame({
+        '운송장번호': np.arange(rows, dtype=np.int64) + 600000000000,
+        '수취주소': receivers,
+        '발송주소': senders,
+        '무게': weights,
+        '규격': rng.choice(['극소', '소', '중', '대'], rows),
+        '발송금액': actual,
+    })
+
+def write_invoice_xlsx(path, df):
+    write_dataframe_xlsx(df, path)
+    return path
@@ -1,7 +1,8 @@
-import pandas as pd
+from excel_loader import sniff_workbook
 
 data_file = 'data/(incheon)ilayngilyangLogis(2025.10).xlsx'
 
 print(f"Loading {data_file}...")
-xls = pd.ExcelFile(data_file)
-print(f"Sheet names: {xls.sheet_names}")
+info = sniff_workbook(data_file)
+print(f"Sheet names: {list(info.sheet_names)}")
+print(f"Header ({info.sheet}): {list(info.header)}")
@@ -0,0 +1,149 @@
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse
+import os
+import sys
+
+# 통합 명령줄 진입점: python cli.py verify|inspect|analyze ...
+# pandas/numpy/openpyxl 은 해당 하위 명령이 실제로 필요할 때만 import 해서
+# --help 나 작은 파일 확인은 바로 끝나도록 함 (시작 시간은 --timings 로 확인)
+STARTUP_TARGET_SECONDS = 1.0
+
+def _startup_seconds():
+    return time.perf_counter() - _STARTED
+
+def _report_startup(args, stage):
+    seconds = _startup_seconds()
+    if args.timings or seconds > args.startup_target:
+        flag = "" if seconds <= args.startup_target else f"  (over target {args.startup_target:.2f} s)"
+        print(f"⏱️ startup ({stage}): {seconds:.3f} s{flag}", file=sys.stderr)
+    return seconds
+
+def build_verify_parser(prog='cli.py verify'):
+    """Options of the verify command (shared with verify_cost.py).
+
+    Defaults that live in pandas-backed modules (data folder, SQLite paths,
+    run log) are None here and filled in by verify_cost.parse_args, so
+    'verify --help' and option errors never import pandas.
+    """
+    from invoice_io import OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT, DEFAULT_CHUNK_SIZE
+    from entity_folders import RATE_FILE_NAME
+    parser = argparse.ArgumentParser(prog=prog, description="Verify delivery invoices against the rate table.")
+    parser.add_argument('--data-dir', default=None,
+                        help="folder with the invoice files, xlsx/csv/parquet "
+                             "(default: 택배 folder of the OneDrive base, env: DELIVERY_VERIFIER_DATA_DIR)")
+    parser.add_argument('--rate-file', default=None,
+                        help=f"rate workbook (default: {RATE_FILE_NAME} in the data folder)")
+    parser.add_argument('--results-dir', default=None,
+                        help="folder the verified_* results are written to (default: results)")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default=DEFAULT_OUTPUT_FORMAT,
+                        help=f"format of the verified results (default: {DEFAULT_OUTPUT_FORMAT})")
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help="number of worker processes (0 = one per CPU core)")
+    parser.add_argument('--stream', action='store_true',
+                        help="bounded-memory streaming mode for very large workbooks")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"rows per chunk in streaming mode (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only re-price rows that are new or changed since the last run (keyed by 운송장번호)")
+    parser.add_argument('--ledger', default=None,
+                        help="SQLite ledger used by --incremental (default: verification_ledger.sqlite)")
+    parser.add_argument('--warehouse', default=None,
+                        help="SQLite results warehouse every run is recorded in (default: results_warehouse.sqlite)")
+    parser.add_argument('--no-warehouse', action='store_true',
+                        help="do not record results in the warehouse")
+    parser.add_argument('--waybill-index', default=None,
+                        help="SQLite waybill index used to flag waybills billed in more than one file "
+                             "(default: waybill_index.sqlite)")
+    parser.add_argument('--no-waybill-index', action='store_true',
+                        help="do not check or update the waybill index")
+    parser.add_argument('--entity', default='',
+                        help="entity (법인) the files belong to, e.g. TFSK")
+    parser.add_argument('--service', default=None,
+                        help="service the files belong to (default: name of the data folder)")
+    parser.add_argument('--run-log', default=None,
+                        help="JSONL file the per-stage timings of every run are appended to (default: run_log.jsonl)")
+    parser.add_argument('--profile', action='store_true',
+                        help="profile each file with cProfile and log the top functions")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="measure per-stage peak memory with tracemalloc (slower)")
+    return parser
+
+def run_verify(args):
+    # 옵션을 먼저 확인 (--help 나 잘못된 옵션이면 pandas 를 불러오기 전에 끝남)
+    build_verify_parser().parse_args(args.options)
+    import verify_cost
+    seconds = _report_startup(args, 'verify')
+    return verify_cost.main(args.options, startup_seconds=seconds)
+
+def run_analyze(args):
+    import analyze_mismatches
+    _report_startup(args, 'analyze')
+    return analyze_mismatches.main(args.options)
+
+def _inspect_targets(paths):
+    from invoice_io import is_invoice_file
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for name in sorted(os.listdir(path)):
+            if is_invoice_file(name):
+                yield os.path.join(path, name)
+
+def run_inspect(args):
+    # 시트 목록/헤더는 xlsx zip 에서 바로 읽으므로 pandas 를 불러오지 않음 (csv/parquet 는 헤더만 읽음)
+    from invoice_io import sniff_invoice, read_invoice
+    _report_startup(args, 'inspect')
+    failed = 0
+    for path in _inspect_targets(args.paths):
+        print(f"== {path}")
+        try:
+            info = sniff_invoice(path)
+        except Exception as e:
+            print(f"  Error: {e}")
+            failed += 1
+            continue
+        if info.sheet is not None:
+            print(f"  Sheets: {list(info.sheet_names)} (using {info.sheet})")
+        print(f"  Columns: {list(info.header)}")
+        print(f"  Fingerprint: {info.fingerprint}, missing: {info.missing or '-'}")
+        if args.rows:
+            df, _ = read_invoice(path, nrows=args.rows)
+            print(df.to_string())
+    return 1 if failed else 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description="Delivery cost verifier command line.")
+    parser.add_argument('--timings', action='store_true', help="print import/startup time to stderr")
+    parser.add_argument('--startup-target', type=float, default=STARTUP_TARGET_SECONDS,
+                        help=f"warn when startup takes longer than this many seconds (default: {STARTUP_TARGET_SECONDS})")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    verify = commands.add_parser('verify', add_help=False,
+                                 help="verify every invoice in a data folder (options: verify --help)")
+    verify.set_defaults(handler=run_verify, passthrough=True)
+
+    inspect = commands.add_parser('inspect', help="show sheets, header and missing columns without loading pandas")
+    inspect.add_argument('paths', nargs='+', help="invoice files (xlsx/csv/parquet) or folders of them")
+    inspect.add_argument('--rows', type=int, default=0, help="also print the first N data rows (loads pandas)")
+    inspect.set_defaults(handler=run_inspect, passthrough=False)
+
+    analyze = commands.add_parser('analyze', add_help=False,
+                                  help="query the results warehouse (options: analyze --help)")
+    analyze.set_defaults(handler=run_analyze, passthrough=True)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    # verify/analyze 의 옵션은 각 스크립트의 parse_args 가 그대로 해석
+    args, options = parser.parse_known_args(argv)
+    if options and not args.passthrough:
+        parser.error(f"unrecognized arguments: {' '.join(options)}")
+    args.options = options
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
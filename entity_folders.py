@@ -0,0 +1,44 @@
+import os
+from datetime import datetime
+
+# 서비스/법인별 input·output·verified 폴더 구조 (app.py 와 folder_watcher.py 가 공유)
+# 다른 PC/계정에서는 환경 변수 DELIVERY_VERIFIER_BASE_DIR 로 최상위 폴더를 지정
+DEFAULT_BASE_DIR = r'C:\Users\yunh1\OneDrive - Thermo Fisher Scientific\비용 검증 프로그램'
+BASE_DIR = os.environ.get('DELIVERY_VERIFIER_BASE_DIR') or DEFAULT_BASE_DIR
+SERVICE_OPTIONS = ["택배", "직배송", "퀵서비스"]
+ENTITY_OPTIONS = ["TFSS", "TFSK", "FSK"]
+RATE_FILE_NAME = '운송요금_운임표.xlsx'
+
+def ensure_entity_folder_structure(data_dir, entities):
+    structure = {}
+    for entity in entities:
+        entity_root = os.path.join(data_dir, entity)
+        input_dir = os.path.join(entity_root, "input")
+        output_dir = os.path.join(entity_root, "output")
+        verified_dir = os.path.join(entity_root, "verified")
+
+        os.makedirs(input_dir, exist_ok=True)
+        os.makedirs(output_dir, exist_ok=True)
+        os.makedirs(verified_dir, exist_ok=True)
+
+        structure[entity] = {
+            "root": entity_root,
+            "input": input_dir,
+            "output": output_dir,
+            "verified": verified_dir,
+        }
+    return structure
+
+def build_unique_target_path(directory, filename):
+    target_path = os.path.join(directory, filename)
+    if not os.path.exists(target_path):
+        return target_path
+
+    name, ext = os.path.splitext(filename)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    candidate = os.path.join(directory, f"{name}_{timestamp}{ext}")
+    suffix = 1
+    while os.path.exists(candidate):
+        candidate = os.path.join(directory, f"{name}_{timestamp}_{suffix}{ext}")
+        suffix += 1
+    return candidate
@@ -0,0 +1,267 @@
+import io
+import mmap
+import os
+import posixpath
+import re
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from contextlib import contextmanager
+from invoice_schema import header_fingerprint, resolve_columns, missing_columns
+
+# 엑셀 파일을 한 번만 읽어 메모리에서 파싱 (임시 파일 복사 없이, OneDrive 잠금 시 재시도)
+# pandas 는 실제로 시트를 읽을 때만 import (시트/헤더 확인은 표준 라이브러리만 사용)
+DETAIL_SHEET = '세부내역'
+LOCK_RETRIES = 5
+LOCK_RETRY_DELAY = 0.5
+SNIFF_CACHE_SIZE = 1024
+
+def _with_lock_retry(func, path, retries=LOCK_RETRIES, delay=LOCK_RETRY_DELAY):
+    # 동기화/다른 프로그램이 잠시 잡고 있는 파일은 간격을 늘려가며 다시 시도
+    for attempt in range(retries + 1):
+        try:
+            return func(path)
+        except PermissionError:
+            if attempt == retries:
+                raise
+            time.sleep(delay * (2 ** attempt))
+
+class _MappedFile(io.RawIOBase):
+    """Seekable read-only file object over an mmap (zipfile needs seekable(), which mmap lacks before 3.13)."""
+
+    def __init__(self, mapped):
+        self._mapped = mapped
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._mapped.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._mapped.seek(offset, whence)
+        return self._mapped.tell()
+
+    def tell(self):
+        return self._mapped.tell()
+
+def read_file_bytes(path, retries=LOCK_RETRIES, delay=LOCK_RETRY_DELAY):
+    """Reads the whole file in one call, retrying while it is locked."""
+    def read(p):
+        with open(p, 'rb') as f:
+            return f.read()
+    return _with_lock_retry(read, path, retries, delay)
+
+@contextmanager
+def open_excel_source(path, retries=LOCK_RETRIES, delay=LOCK_RETRY_DELAY):
+    """Yields a seekable in-memory view of path for pd.ExcelFile/openpyxl.
+
+    The file is memory-mapped read-only where the platform allows it and read
+    into a BytesIO otherwise (empty files, network drives, cloud placeholders).
+    The mapping is released when the block exits so the file can be moved.
+    """
+    def open_mapped(p):
+        f = open(p, 'rb')
+        try:
+            return f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            f.close()
+            return None, None
+
+    f, mapped = _with_lock_retry(open_mapped, path, retries, delay)
+    if mapped is None:
+        yield io.BytesIO(read_file_bytes(path, retries, delay))
+        return
+    try:
+        yield _MappedFile(mapped)
+    finally:
+        mapped.close()
+        f.close()
+
+def pick_sheet_name(sheet_names, preferred=DETAIL_SHEET):
+    """Prefers the '세부내역' sheet, otherwise the first sheet."""
+    return preferred if preferred in sheet_names else sheet_names[0]
+
+def read_invoice_frame(path, preferred_sheet=DETAIL_SHEET, strip_columns=True, **read_kwargs):
+    """Reads the 세부내역 sheet (or the first sheet) of path from memory.
+
+    The sheet is chosen from the sniffed workbook manifest, so only that sheet
+    is parsed. Returns (df, sheet_used). Extra keyword arguments go to pd.read_excel.
+    """
+    import pandas as pd
+    try:
+        sheet = pick_sheet_name(sniff_workbook(path).sheet_names, preferred_sheet)
+    except Exception:
+        # 확인용 파싱이 못 읽는 워크북도 pandas 는 읽을 수 있으므로 전체 시트 목록으로 다시 시도
+        sheet = None
+    with open_excel_source(path) as source:
+        if sheet is None:
+            with pd.ExcelFile(source) as xls:
+                sheet = pick_sheet_name(xls.sheet_names, preferred_sheet)
+                df = pd.read_excel(xls, sheet_name=sheet, **read_kwargs)
+        else:
+            df = pd.read_excel(source, sheet_name=sheet, **read_kwargs)
+    if strip_columns:
+        df.columns = df.columns.str.strip()
+    return df, sheet
+
+def header_names(header_row):
+    """Builds column names the same way pd.read_excel does (Unnamed: i, duplicates as name.1)."""
+    names = []
+    seen = {}
+    for index, value in enumerate(header_row):
+        name = f"Unnamed: {index}" if value is None else str(value).strip()
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+# === 빠른 워크북 확인 (xlsx zip 에서 시트 목록과 헤더 행만 읽음) ===
+_NS_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_NS_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_CELL_REF = re.compile(r'([A-Z]+)')
+
+_SNIFF_CACHE = {}
+
+class WorkbookInfo(namedtuple('WorkbookInfo', 'path sheet_names sheet header fingerprint')):
+    """Sheet list and header row of one workbook, read without parsing any data rows."""
+
+    @property
+    def has_detail_sheet(self):
+        return DETAIL_SHEET in self.sheet_names
+
+    @property
+    def columns(self):
+        return resolve_columns(self.header, self.fingerprint)
+
+    @property
+    def missing(self):
+        return missing_columns(self.header, self.columns)
+
+def _column_index(cell_ref):
+    letters = _CELL_REF.match(cell_ref).group(1)
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter) - 64)
+    return index - 1
+
+def _text_of(element):
+    # 서식 있는 텍스트(<r><t>)는 이어 붙이고, 윗주(<rPh>)는 제외
+    parts = []
+    for child in element:
+        if child.tag == _NS_MAIN + 't':
+            parts.append(child.text or '')
+        elif child.tag == _NS_MAIN + 'r':
+            parts.extend(t.text or '' for t in child.iter(_NS_MAIN + 't'))
+    return ''.join(parts)
+
+def _workbook_parts(archive):
+    """Returns [(sheet name, zip member)] in workbook order and the shared strings member."""
+    rels = {}
+    shared_strings = None
+    with archive.open('xl/_rels/workbook.xml.rels') as f:
+        for rel in ET.parse(f).getroot().iter(_NS_PKG_REL + 'Relationship'):
+            target = rel.get('Target')
+            target = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+            rels[rel.get('Id')] = target
+            if rel.get('Type', '').endswith('/sharedStrings'):
+                shared_strings = target
+    with archive.open('xl/workbook.xml') as f:
+        sheets = [(sheet.get('name'), rels[sheet.get(_NS_REL + 'id')])
+                  for sheet in ET.parse(f).getroot().iter(_NS_MAIN + 'sheet')]
+    return sheets, shared_strings
+
+def _first_row_cells(archive, member):
+    """Returns [(column index, type, raw value or inline text)] of the first non-empty row."""
+    with archive.open(member) as f:
+        for _, element in ET.iterparse(f):
+            if element.tag != _NS_MAIN + 'row':
+                continue
+            cells = []
+            column = -1
+            for cell in element.iter(_NS_MAIN + 'c'):
+                # r 속성은 생략될 수 있음 (그때는 바로 앞 셀의 다음 열)
+                ref = cell.get('r')
+                column = _column_index(ref) if ref else column + 1
+                kind = cell.get('t', 'n')
+                if kind == 'inlineStr':
+                    inline = cell.find(_NS_MAIN + 'is')
+                    value = _text_of(inline) if inline is not None else None
+                else:
+                    v = cell.find(_NS_MAIN + 'v')
+                    value = v.text if v is not None else None
+                if value is not None:
+                    cells.append((column, kind, value))
+            if cells:
+                return cells
+            element.clear()
+    return []
+
+def _shared_strings(archive, member, wanted):
+    # 헤더에 필요한 인덱스까지만 읽고 중단 (전체 공유 문자열 표를 파싱하지 않음)
+    found = {}
+    if not wanted or member is None or member not in archive.namelist():
+        return found
+    last = max(wanted)
+    index = 0
+    with archive.open(member) as f:
+        for _, element in ET.iterparse(f):
+            if element.tag != _NS_MAIN + 'si':
+                continue
+            if index in wanted:
+                found[index] = _text_of(element)
+            if index >= last:
+                break
+            index += 1
+            element.clear()
+    return found
+
+def _read_header(archive, member, shared_strings):
+    cells = _first_row_cells(archive, member)
+    strings = _shared_strings(archive, shared_strings, {int(v) for _, kind, v in cells if kind == 's'})
+    values = {}
+    for index, kind, value in cells:
+        if kind == 's':
+            value = strings.get(int(value))
+        elif kind == 'n':
+            number = float(value)
+            value = int(number) if number.is_integer() else number
+        elif kind == 'b':
+            value = value == '1'
+        values[index] = value
+    width = max(values) + 1 if values else 0
+    return header_names([values.get(i) for i in range(width)])
+
+def sniff_workbook(path, preferred_sheet=DETAIL_SHEET):
+    """Reads the sheet list and the header row of the invoice sheet straight from the xlsx zip.
+
+    Results are cached per (path, size, mtime), so repeated listings cost a stat call.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, preferred_sheet)
+    info = _SNIFF_CACHE.get(key)
+    if info is not None:
+        return info
+
+    with open_excel_source(path) as source:
+        with zipfile.ZipFile(source) as archive:
+            sheets, shared_strings = _workbook_parts(archive)
+            sheet_names = tuple(name for name, _ in sheets)
+            sheet = pick_sheet_name(sheet_names, preferred_sheet)
+            header = _read_header(archive, dict(sheets)[sheet], shared_strings)
+
+    info = WorkbookInfo(path, sheet_names, sheet, tuple(header), header_fingerprint(header))
+    if len(_SNIFF_CACHE) >= SNIFF_CACHE_SIZE:
+        _SNIFF_CACHE.clear()
+    _SNIFF_CACHE[key] = info
+    return info
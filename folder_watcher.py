@@ -0,0 +1,269 @@
+import argparse
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from entity_folders import (BASE_DIR, SERVICE_OPTIONS, ENTITY_OPTIONS,
+                            ensure_entity_folder_structure, build_unique_target_path)
+from verify_cost import perform_verification, shared_waybill_index, DUPLICATE_STATUS, MISMATCH_STATUS
+from tariffs import TARIFFS
+from verification_ledger import VerificationLedger, LEDGER_PATH
+from results_warehouse import ResultsWarehouse, WAREHOUSE_PATH
+from waybill_index import WAYBILL_INDEX_PATH
+from run_metrics import RunTimer, append_run_log, frame_bytes_per_row, RUN_LOG_PATH
+from invoice_io import (OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT, is_invoice_file, is_complete_invoice,
+                        read_invoice, sniff_invoice, write_invoice_frame, verified_file_name)
+from invoice_cache import store_cached_frame
+
+# 서비스/법인별 input 폴더를 감시하다가 동기화가 끝난 새 송장 파일(xlsx/csv/parquet)을 자동으로 검증
+# 검증 결과는 verified/verified_<파일명>, 원본은 output/ 으로 이동 (app.py 와 동일)
+# 예) python folder_watcher.py --jobs 2
+#     python folder_watcher.py --once          (현재 있는 파일만 처리하고 종료)
+
+DEFAULT_POLL_SECONDS = 5
+DEFAULT_SETTLE_SECONDS = 10
+
+# OneDrive 온라인 전용(아직 내려받지 않은) 파일 특성 (Windows)
+_FILE_ATTRIBUTE_OFFLINE = 0x1000
+_FILE_ATTRIBUTE_RECALL_ON_DATA_ACCESS = 0x400000
+
+def _signature(path):
+    """(size, mtime) of path, or None while it is missing or still a cloud-only placeholder."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if getattr(st, 'st_file_attributes', 0) & (_FILE_ATTRIBUTE_OFFLINE | _FILE_ATTRIBUTE_RECALL_ON_DATA_ACCESS):
+        return None
+    return (st.st_size, st.st_mtime)
+
+# === 작업 프로세스 ===
+def verify_input_file(task):
+    """Verifies one input file and moves it like the app does. Returns a summary dict."""
+    file_path, paths = task['file_path'], task['paths']
+    filename = os.path.basename(file_path)
+    timer = RunTimer(filename, mode='watcher', entity=task['entity'], service=task['service'])
+    summary = {'file_path': file_path, 'rows': 0, 'mismatches': 0, 'verified_path': None, 'error': None}
+    try:
+        # 감시 프로세스가 컴파일한 운임표를 그대로 사용 (작업자는 운임표 엑셀을 다시 읽지 않음)
+        rate_map = task['tariff']
+        with timer.stage('read') as stage:
+            df, _ = read_invoice(file_path)
+            stage['rows'] = len(df)
+
+        ledger = VerificationLedger(task['ledger_path']) if task.get('ledger_path') else None
+        # 운송장 색인은 작업 프로세스마다 한 번만 열어 재사용 (프로세스 종료 시 닫힘)
+        waybill_index = shared_waybill_index(task.get('waybill_index_path'))
+        try:
+            with timer.stage('verify', rows=len(df)):
+                final_df, error_msg = perform_verification(df, rate_map, task['entity'], ledger,
+                                                           waybill_index, task['service'], filename)
+        finally:
+            if ledger is not None:
+                ledger.close()
+        if error_msg:
+            summary['error'] = error_msg
+            return summary
+        summary['rows'] = len(final_df)
+        summary['mismatches'] = int((final_df['결과'] == MISMATCH_STATUS).sum())
+        summary['duplicates'] = int((final_df['결과'] == DUPLICATE_STATUS).sum())
+        summary['bytes_per_row'] = frame_bytes_per_row(final_df)
+
+        verified_name = verified_file_name(filename, task.get('output_format') or DEFAULT_OUTPUT_FORMAT)
+        verified_target_path = build_unique_target_path(paths['verified'], verified_name)
+        output_target_path = build_unique_target_path(paths['output'], filename)
+        with timer.stage('write', rows=len(final_df)):
+            write_invoice_frame(final_df, verified_target_path)
+        with timer.stage('move'):
+            shutil.move(file_path, output_target_path)
+        summary['verified_path'] = verified_target_path
+
+        # 이력 보기에서 바로 쓸 수 있도록 검증 결과를 캐시에 저장
+        with timer.stage('cache', rows=len(final_df)):
+            try:
+                store_cached_frame(verified_target_path, final_df, task['rate_mtime'], f"verified|{task['entity']}")
+            except Exception:
+                pass
+        if task.get('warehouse_path'):
+            with timer.stage('warehouse', rows=len(final_df)):
+                try:
+                    with ResultsWarehouse(task['warehouse_path']) as warehouse:
+                        warehouse.record_run(final_df, task['entity'], task['service'], filename,
+                                             weight_limits=rate_map.limits)
+                except Exception as e:
+                    print(f"  - Warning: results warehouse unavailable: {e}")
+    except Exception as e:
+        summary['error'] = str(e)
+    finally:
+        if task.get('run_log_path'):
+            append_run_log(timer.finish(**{k: v for k, v in summary.items() if k != 'file_path'}), task['run_log_path'])
+    return summary
+
+# === 감시 루프 ===
+class FolderWatcher:
+    """Polls every service/entity input folder and hands settled files to a worker pool."""
+
+    def __init__(self, base_dir=BASE_DIR, services=SERVICE_OPTIONS, entities=ENTITY_OPTIONS,
+                 settle_seconds=DEFAULT_SETTLE_SECONDS, jobs=1, ledger_path=None,
+                 warehouse_path=WAREHOUSE_PATH, run_log_path=RUN_LOG_PATH, waybill_index_path=WAYBILL_INDEX_PATH,
+                 output_format=DEFAULT_OUTPUT_FORMAT):
+        self.base_dir = base_dir
+        self.services = list(services)
+        self.entities = list(entities)
+        self.settle_seconds = settle_seconds
+        self.jobs = jobs
+        self.options = {'ledger_path': ledger_path, 'warehouse_path': warehouse_path, 'run_log_path': run_log_path,
+                        'waybill_index_path': waybill_index_path, 'output_format': output_format}
+        self.seen = {}        # path -> (signature, 처음 이 상태를 본 시각)
+        self.failed = {}      # path -> 실패 당시 signature (파일이 바뀌면 다시 시도)
+        self.in_flight = {}   # future -> path
+        self.locked = set()   # 안정화됐지만 아직 잠겨 있거나 불완전한 파일
+        self._missing_rate_files = set()
+
+    def _service_tasks(self, service, now):
+        data_dir = os.path.join(self.base_dir, service)
+        rate_file = TARIFFS.rate_file(service, data_dir)
+        if not os.path.exists(rate_file):
+            if service not in self._missing_rate_files:
+                print(f"[{service}] 운임표 없음, 건너뜀: {rate_file}")
+                self._missing_rate_files.add(service)
+            return []
+        self._missing_rate_files.discard(service)
+        rate_mtime = os.path.getmtime(rate_file)
+        tariff = None
+
+        tasks = []
+        busy = set(self.in_flight.values())
+        folder_map = ensure_entity_folder_structure(data_dir, self.entities)
+        for entity, paths in folder_map.items():
+            for filename in sorted(os.listdir(paths['input'])):
+                path = os.path.join(paths['input'], filename)
+                if not is_invoice_file(filename) or path in busy:
+                    continue
+                signature = _signature(path)
+                if signature is None or self.failed.get(path) == signature:
+                    continue
+                previous = self.seen.get(path)
+                if previous is None or previous[0] != signature:
+                    # 새 파일이거나 아직 쓰는 중 -> 크기/수정시각이 안정될 때까지 대기
+                    self.seen[path] = (signature, now)
+                    continue
+                if now - previous[1] < self.settle_seconds:
+                    continue
+                if not is_complete_invoice(path, now):
+                    self.locked.add(path)
+                    continue
+                self.locked.discard(path)
+                # 헤더만 먼저 확인해서 필수 컬럼이 없는 파일은 작업자로 보내지 않음
+                try:
+                    missing = sniff_invoice(path).missing
+                except Exception as e:
+                    # 빈 CSV / 깨진 파일은 이 파일만 실패로 표시하고 감시는 계속
+                    print(f"❌ {path}: 헤더를 읽을 수 없음 ({e})")
+                    self.failed[path] = signature
+                    continue
+                if missing:
+                    print(f"❌ {path}: 필수 컬럼 누락 ({', '.join(missing)})")
+                    self.failed[path] = signature
+                    continue
+                self.failed.pop(path, None)
+                if tariff is None:
+                    tariff = TARIFFS.get(service, rate_file)
+                tasks.append(dict(self.options, file_path=path, paths=paths, entity=entity, service=service,
+                                  tariff=tariff, rate_mtime=rate_mtime))
+        return tasks
+
+    def scan(self, now=None):
+        """Returns verification tasks for files whose size and mtime have been stable for settle_seconds."""
+        now = time.time() if now is None else now
+        tasks = []
+        for service in self.services:
+            tasks.extend(self._service_tasks(service, now))
+        # 사라진 파일 정리
+        self.seen = {p: v for p, v in self.seen.items() if os.path.exists(p)}
+        self.failed = {p: v for p, v in self.failed.items() if os.path.exists(p)}
+        self.locked = {p for p in self.locked if p in self.seen}
+        return tasks
+
+    def _collect(self, block=False):
+        for future in list(self.in_flight):
+            if not block and not future.done():
+                continue
+            path = self.in_flight.pop(future)
+            try:
+                summary = future.result()
+            except Exception as e:
+                summary = {'file_path': path, 'error': str(e)}
+            if summary['error']:
+                print(f"❌ {path}: {summary['error']}")
+                signature = _signature(path)
+                if signature is not None:
+                    self.failed[path] = signature
+            else:
+                duplicates = f", 중복 청구 {summary['duplicates']}건" if summary.get('duplicates') else ""
+                print(f"✅ {path}: {summary['rows']}행, 불일치 {summary['mismatches']}건{duplicates} -> {summary['verified_path']}")
+            self.seen.pop(path, None)
+
+    def run(self, poll_seconds=DEFAULT_POLL_SECONDS, once=False):
+        print(f"Watching {self.base_dir} ({', '.join(self.services)} / {', '.join(self.entities)}), "
+              f"{self.jobs} worker(s), settle {self.settle_seconds}s")
+        with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+            try:
+                while True:
+                    self._collect()
+                    for task in self.scan():
+                        print(f"🔍 검증 시작: {task['file_path']}")
+                        self.in_flight[pool.submit(verify_input_file, task)] = task['file_path']
+                    if once and not self.in_flight and not self._pending():
+                        break
+                    time.sleep(poll_seconds)
+            except KeyboardInterrupt:
+                print("Stopping; waiting for running verifications to finish...")
+            self._collect(block=True)
+
+    def _pending(self):
+        # --once: 아직 안정화 대기 중인 파일이 있으면 계속 감시 (잠긴/불완전한 파일은 다음 실행에서 처리)
+        return any(path not in self.failed and path not in self.locked for path in self.seen)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Watch the entity input folders and verify new invoices automatically.")
+    parser.add_argument('--base-dir', default=BASE_DIR, help="top folder containing one folder per service")
+    parser.add_argument('--services', default=','.join(SERVICE_OPTIONS), help="comma separated services to watch")
+    parser.add_argument('--entities', default=','.join(ENTITY_OPTIONS), help="comma separated entities to watch")
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help="verification worker processes (0 = one per CPU core)")
+    parser.add_argument('--poll', type=float, default=DEFAULT_POLL_SECONDS, help="seconds between folder scans")
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="seconds a file's size and mtime must stay unchanged before it is verified")
+    parser.add_argument('--once', action='store_true', help="verify the files currently present, then exit")
+    parser.add_argument('--incremental', action='store_true', help="reuse results from the verification ledger")
+    parser.add_argument('--ledger', default=LEDGER_PATH, help="verification ledger (SQLite) path")
+    parser.add_argument('--warehouse', default=WAREHOUSE_PATH, help="results warehouse (SQLite) path")
+    parser.add_argument('--no-warehouse', action='store_true', help="do not record results in the warehouse")
+    parser.add_argument('--run-log', default=RUN_LOG_PATH, help="per-run timing log (JSON lines)")
+    parser.add_argument('--waybill-index', default=WAYBILL_INDEX_PATH, help="waybill index (SQLite) used to flag duplicates")
+    parser.add_argument('--no-waybill-index', action='store_true', help="do not check or update the waybill index")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default=DEFAULT_OUTPUT_FORMAT,
+                        help=f"format of the files written to verified/ (default: {DEFAULT_OUTPUT_FORMAT})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    watcher = FolderWatcher(
+        base_dir=args.base_dir,
+        services=[s.strip() for s in args.services.split(',') if s.strip()],
+        entities=[e.strip() for e in args.entities.split(',') if e.strip()],
+        settle_seconds=args.settle,
+        jobs=args.jobs if args.jobs > 0 else (os.cpu_count() or 1),
+        ledger_path=args.ledger if args.incremental else None,
+        warehouse_path=None if args.no_warehouse else args.warehouse,
+        run_log_path=args.run_log,
+        waybill_index_path=None if args.no_waybill_index else args.waybill_index,
+        output_format=args.output_format,
+    )
+    watcher.run(poll_seconds=args.poll, once=args.once)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,5 @@
 import os
-import pandas as pd
+from excel_loader import sniff_workbook
 
 DATA_DIR = 'data'
 
@@ -10,17 +10,15 @@ def inspect_header():
                 file_path = os.path.join(root, file)
                 print(f"Inspecting: {file_path}")
                 try:
-                    xls = pd.ExcelFile(file_path)
-                    print(f"Sheet Names: {xls.sheet_names}")
+                    # 시트 목록과 헤더 행만 xlsx 에서 바로 읽음
+                    info = sniff_workbook(file_path)
+                    print(f"Sheet Names: {list(info.sheet_names)}")
+                    if info.has_detail_sheet:
+                        print(f"Targeting sheet: {info.sheet}")
                     
-                    target_sheet = 0
-                    if '세부내역' in xls.sheet_names:
-                        target_sheet = '세부내역'
-                        print(f"Targeting sheet: {target_sheet}")
-                    
-                    df = pd.read_excel(file_path, sheet_name=target_sheet, header=0, nrows=5)
-                    print(f"--- Top 5 rows of {file} ({target_sheet}) ---")
-                    print("Columns:", list(df.columns))
+                    print(f"--- Header of {file} ({info.sheet}) ---")
+                    print("Columns:", list(info.header))
+                    print(f"Fingerprint: {info.fingerprint}, missing: {info.missing or '-'}")
                     return
                 except Exception as e:
                     print(f"Error reading {file}: {e}")
@@ -1,9 +1,11 @@
 import pandas as pd
+from excel_loader import open_excel_source
 
 data_file = 'data/(incheon)ilayngilyangLogis(2025.9).xlsx'
 
 print(f"Loading {data_file}...")
 # Read first 5 rows
-df = pd.read_excel(data_file, nrows=5)
+with open_excel_source(data_file) as source:
+    df = pd.read_excel(source, nrows=5)
 print(df.columns.tolist())
 print(df.head().to_string())
@@ -0,0 +1,86 @@
+import hashlib
+import os
+from invoice_io import read_invoice, write_invoice_frame
+
+# 파싱/검증된 DataFrame을 디스크에 캐싱하여 같은 파일을 다시 열 때 openpyxl 파싱을 건너뜀
+# 캐시는 Parquet 로 저장 (verified 결과와 같은 입출력 경로, 공유 폴더의 파일을 unpickle 하지 않음)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.invoice_cache')
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+CACHE_VERSION = 2
+CACHE_SUFFIX = '.parquet'
+_OLD_CACHE_SUFFIX = '.pkl'
+
+def _file_signature(file_path):
+    stat = os.stat(file_path)
+    return f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+def cache_key(file_path, rate_mtime=0, tag=''):
+    """Key from (path, size, mtime) of the source file plus the rate-table mtime and a caller tag."""
+    raw = f"v{CACHE_VERSION}|{_file_signature(file_path)}|{rate_mtime}|{tag}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def _cache_path(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}{CACHE_SUFFIX}")
+
+def load_cached_frame(file_path, rate_mtime=0, tag='', cache_dir=CACHE_DIR):
+    """Returns the cached DataFrame for file_path, or None on a miss."""
+    try:
+        path = _cache_path(cache_key(file_path, rate_mtime, tag), cache_dir)
+    except OSError:
+        return None
+    if not os.path.exists(path):
+        return None
+    try:
+        df, _ = read_invoice(path, strip_columns=False)
+    except Exception:
+        # 깨진 캐시 파일은 삭제하고 미스로 처리
+        _remove_quietly(path)
+        return None
+    # 최근 사용 시각 갱신 (LRU 정리 기준)
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+    return df
+
+def store_cached_frame(file_path, df, rate_mtime=0, tag='', cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Stores df for file_path and evicts least recently used entries beyond max_bytes."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(cache_key(file_path, rate_mtime, tag), cache_dir)
+    tmp_path = f"{path}.tmp"
+    write_invoice_frame(df, tmp_path, output_format='parquet')
+    os.replace(tmp_path, path)
+    evict_cache(cache_dir, max_bytes)
+    return path
+
+def evict_cache(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Deletes the least recently used cache files until the total size fits max_bytes."""
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.endswith(_OLD_CACHE_SUFFIX):
+            # 이전 버전의 pickle 캐시는 읽지 않으므로 정리
+            _remove_quietly(path)
+            continue
+        if not name.endswith(CACHE_SUFFIX):
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove_quietly(path)
+        total -= size
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
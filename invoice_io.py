@@ -0,0 +1,291 @@
+import io
+import os
+import time
+from excel_loader import DETAIL_SHEET, WorkbookInfo, read_file_bytes, read_invoice_frame, sniff_workbook
+from invoice_schema import header_fingerprint
+
+# 송장 입출력 형식: xlsx (기본), csv (택배사 내보내기), parquet (내부 보관용)
+# 형식은 확장자로 구분 - csv/parquet 는 시트가 없으므로 시트 이름 대신 None
+# pandas/pyarrow/openpyxl 은 실제로 읽고 쓸 때만 import
+INVOICE_FORMATS = {'.xlsx': 'xlsx', '.csv': 'csv', '.parquet': 'parquet'}
+OUTPUT_FORMATS = ('xlsx', 'parquet', 'csv')
+DEFAULT_OUTPUT_FORMAT = 'xlsx'
+DEFAULT_CHUNK_SIZE = 50000
+
+# csv 인코딩 판별: 앞부분이 UTF-8 로 읽히면 utf-8(-sig), 아니면 cp949 (한글 Windows 엑셀 기본값)
+CSV_SAMPLE_BYTES = 1 << 20
+CSV_OUTPUT_ENCODING = 'utf-8-sig'  # 엑셀에서 바로 열어도 한글이 깨지지 않도록 BOM 포함
+_PARQUET_MAGIC = b'PAR1'
+# csv 는 끝을 표시하는 구조가 없으므로 비어 있지 않고 이 시간 동안 크기/수정시각이 그대로여야 완료로 봄
+CSV_QUIET_SECONDS = 30
+# 스트리밍 출력은 '<경로>.tmp' 에 쓰고 끝까지 성공했을 때만 제 이름으로 바꿈 (중간 실패 시 잘린 결과 파일이 남지 않도록)
+PARTIAL_SUFFIX = '.tmp'
+
+def invoice_format(path):
+    """'xlsx', 'csv' or 'parquet' by file extension, or None for anything else."""
+    return INVOICE_FORMATS.get(os.path.splitext(path)[1].lower())
+
+def is_invoice_file(filename):
+    """True for xlsx/csv/parquet files that are not Office lock files ('~$...')."""
+    name = os.path.basename(filename)
+    return invoice_format(name) is not None and not name.startswith('~$')
+
+def verified_file_name(filename, output_format=DEFAULT_OUTPUT_FORMAT):
+    """'verified_<name>' with the extension of output_format."""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return f"verified_{stem}.{output_format}"
+
+def is_complete_invoice(path, now=None):
+    """True once the file can be opened and looks fully written.
+
+    xlsx needs an intact zip directory and parquet its footer; a CSV has no
+    trailer, so it must be non-empty and unchanged for CSV_QUIET_SECONDS.
+    """
+    fmt = invoice_format(path)
+    try:
+        if fmt == 'csv':
+            stat = os.stat(path)
+            now = time.time() if now is None else now
+            if stat.st_size == 0 or now - stat.st_mtime < CSV_QUIET_SECONDS:
+                return False
+        with open(path, 'rb') as f:
+            if fmt == 'xlsx':
+                import zipfile
+                return zipfile.is_zipfile(f)
+            if fmt == 'parquet':
+                head = f.read(4)
+                f.seek(-4, os.SEEK_END)
+                return head == _PARQUET_MAGIC and f.read(4) == _PARQUET_MAGIC
+            return True
+    except OSError:
+        return False
+
+def partial_path(file_path):
+    """Temporary path a streaming writer fills before it is renamed to file_path."""
+    return f"{file_path}{PARTIAL_SUFFIX}"
+
+def discard_partial(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Parquet 파일을 읽고 쓰려면 pyarrow 가 필요합니다 (pip install pyarrow).") from e
+    return pyarrow
+
+def detect_csv_encoding(data):
+    """Returns 'utf-8-sig' when the sample bytes decode as UTF-8 (BOM optional), otherwise 'cp949'."""
+    sample = data[:CSV_SAMPLE_BYTES]
+    try:
+        sample.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # 표본 끝에서 잘린 다바이트 문자는 UTF-8 로 봄
+        if not (len(sample) == CSV_SAMPLE_BYTES and e.reason == 'unexpected end of data'):
+            return 'cp949'
+    return 'utf-8-sig'
+
+def _csv_sample(path):
+    with open(path, 'rb') as f:
+        return f.read(CSV_SAMPLE_BYTES)
+
+def _parquet_safe(df):
+    """df with its object columns (e.g. 규격 holding both 1 and 'A') cast to str so pyarrow can write them.
+
+    Numeric columns keep their dtype and empty values stay null.
+    """
+    cast = {}
+    for column in df.columns[df.dtypes == object]:
+        values = df[column]
+        cast[column] = values.astype(str).where(values.notna(), None)
+    if not cast:
+        return df
+    df = df.copy(deep=False)
+    for column, values in cast.items():
+        df[column] = values
+    return df
+
+def _strip(df):
+    df.columns = [str(column).strip() for column in df.columns]
+    return df
+
+def read_invoice(path, preferred_sheet=DETAIL_SHEET, strip_columns=True, nrows=None):
+    """Reads an xlsx/csv/parquet invoice; returns (df, sheet_used) with sheet_used None for csv/parquet."""
+    fmt = invoice_format(path)
+    read_kwargs = {} if nrows is None else {'nrows': nrows}
+    if fmt not in ('csv', 'parquet'):
+        return read_invoice_frame(path, preferred_sheet, strip_columns=strip_columns, **read_kwargs)
+
+    import pandas as pd
+    if fmt == 'csv':
+        # 파일을 한 번만 읽어 메모리에서 파싱 (잠겨 있으면 재시도)
+        data = read_file_bytes(path)
+        df = pd.read_csv(io.BytesIO(data), encoding=detect_csv_encoding(data), **read_kwargs)
+    else:
+        _require_pyarrow()
+        df = pd.read_parquet(path)
+        if nrows is not None:
+            df = df.head(nrows)
+    return (_strip(df) if strip_columns else df), None
+
+def sniff_invoice(path, preferred_sheet=DETAIL_SHEET):
+    """Header of any invoice format as a WorkbookInfo (sheet_names empty for csv/parquet)."""
+    fmt = invoice_format(path)
+    if fmt == 'csv':
+        import pandas as pd
+        header = pd.read_csv(path, encoding=detect_csv_encoding(_csv_sample(path)), nrows=0).columns
+    elif fmt == 'parquet':
+        header = _require_pyarrow().parquet.read_schema(path).names
+    else:
+        return sniff_workbook(path, preferred_sheet)
+    header = tuple(str(name).strip() for name in header)
+    return WorkbookInfo(path, (), None, header, header_fingerprint(header))
+
+def iter_invoice_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields the invoice as DataFrames of at most chunk_size rows (only one chunk in memory)."""
+    fmt = invoice_format(path)
+    if fmt == 'csv':
+        import pandas as pd
+        with pd.read_csv(path, encoding=detect_csv_encoding(_csv_sample(path)), chunksize=chunk_size) as reader:
+            for chunk in reader:
+                yield _strip(chunk)
+    elif fmt == 'parquet':
+        pq = _require_pyarrow().parquet
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield _strip(batch.to_pandas())
+    else:
+        from xlsx_stream import iter_sheet_chunks
+        yield from iter_sheet_chunks(path, chunk_size=chunk_size)
+
+class StreamingCsvWriter:
+    """Appends DataFrame chunks to a UTF-8 (BOM) CSV file; the header is written with the first chunk.
+
+    file_path only appears once close() succeeds; a failed run leaves no file behind.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.partial_path = partial_path(file_path)
+        self.file = open(self.partial_path, 'w', encoding=CSV_OUTPUT_ENCODING, newline='')
+        self.columns = None
+        self.rows = 0
+
+    def write(self, df):
+        df.to_csv(self.file, header=self.columns is None, index=False)
+        if self.columns is None:
+            self.columns = list(df.columns)
+        self.rows += len(df)
+
+    def close(self):
+        self.file.close()
+        os.replace(self.partial_path, self.file_path)
+
+    def discard(self):
+        self.file.close()
+        discard_partial(self.partial_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+class StreamingParquetWriter:
+    """Appends DataFrame chunks as row groups of one Parquet file; the schema comes from the first chunk.
+
+    Like StreamingCsvWriter, file_path only appears once close() succeeds.
+    """
+
+    def __init__(self, file_path):
+        self.pa = _require_pyarrow()
+        self.file_path = file_path
+        self.partial_path = partial_path(file_path)
+        self.writer = None
+        self.schema = None
+        self.columns = None
+        self.rows = 0
+
+    def _schema_for(self, table):
+        # 청크마다 범주 수/빈 컬럼이 달라도 같은 스키마로 쓰도록 사전 인덱스와 null 타입을 넓혀 둠
+        pa = self.pa
+        fields = []
+        for field in table.schema:
+            if pa.types.is_dictionary(field.type):
+                field = field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+            elif pa.types.is_null(field.type):
+                field = field.with_type(pa.string())
+            fields.append(field)
+        return pa.schema(fields, metadata=table.schema.metadata)
+
+    def write(self, df):
+        df = _parquet_safe(df)
+        if self.writer is None:
+            self.schema = self._schema_for(self.pa.Table.from_pandas(df, preserve_index=False))
+            self.writer = self.pa.parquet.ParquetWriter(self.partial_path, self.schema)
+            self.columns = list(df.columns)
+        self.writer.write_table(self.pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+        self.rows += len(df)
+
+    def close(self):
+        if self.writer is None:
+            self.pa.parquet.write_table(self.pa.table({}), self.partial_path)
+        else:
+            self.writer.close()
+        os.replace(self.partial_path, self.file_path)
+
+    def discard(self):
+        if self.writer is not None:
+            self.writer.close()
+        discard_partial(self.partial_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+def open_invoice_writer(file_path, output_format=None):
+    """Chunk writer for file_path; the format defaults to the file extension."""
+    fmt = output_format or invoice_format(file_path) or DEFAULT_OUTPUT_FORMAT
+    if fmt == 'csv':
+        return StreamingCsvWriter(file_path)
+    if fmt == 'parquet':
+        return StreamingParquetWriter(file_path)
+    from xlsx_stream import StreamingXlsxWriter
+    return StreamingXlsxWriter(file_path)
+
+def write_invoice_frame(df, target, output_format=None):
+    """Writes a verified frame as xlsx/csv/parquet (by output_format or the target extension)."""
+    fmt = output_format or invoice_format(target) or DEFAULT_OUTPUT_FORMAT
+    if fmt == 'csv':
+        df.to_csv(target, index=False, encoding=CSV_OUTPUT_ENCODING)
+    elif fmt == 'parquet':
+        _require_pyarrow()
+        _parquet_safe(df).to_parquet(target, index=False)
+    else:
+        from xlsx_stream import write_dataframe_xlsx
+        write_dataframe_xlsx(df, target)
+    return target
+
+def stream_verify_file(source_path, target_path, verify_chunk, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Reads source_path chunk by chunk, applies verify_chunk(df) -> df and writes target_path.
+
+    Input and output formats are independent (e.g. a cp949 CSV verified into Parquet).
+    Returns the number of rows written.
+    """
+    with open_invoice_writer(target_path) as writer:
+        for chunk in iter_invoice_chunks(source_path, chunk_size=chunk_size):
+            writer.write(verify_chunk(chunk))
+        return writer.rows
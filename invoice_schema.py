@@ -0,0 +1,49 @@
+import hashlib
+
+# 송장 엑셀의 헤더를 검증에 필요한 컬럼으로 매핑
+# 같은 헤더 구성(fingerprint)은 한 번만 해석하고 결과를 재사용
+
+REQUIRED_COLUMNS = {'weight': '무게', 'address': '수취주소', 'actual_cost': '발송금액'}
+
+_MAPPING_CACHE = {}
+
+def header_fingerprint(columns):
+    """Stable short hash of a header layout (exact names, whitespace included, and order)."""
+    # _resolve 는 원래 이름을 그대로 돌려주므로 공백만 다른 헤더도 다른 fingerprint 로 구분
+    joined = '\x1f'.join(c if isinstance(c, str) else repr(c) for c in columns)
+    return hashlib.sha1(joined.encode('utf-8')).hexdigest()[:16]
+
+def _resolve(columns):
+    mapping = {'weight': '무게', 'address': '수취주소', 'actual_cost': '발송금액', 'sender_address': None}
+    for col in columns:
+        if not isinstance(col, str):
+            continue
+        if '발송' in col and '주소' in col:
+            mapping['sender_address'] = col
+        elif '수취' in col and '주소' in col:
+            mapping['address'] = col
+        elif '무게' in col:
+            mapping['weight'] = col
+        elif '발송' in col and '금액' in col:
+            mapping['actual_cost'] = col
+    return mapping
+
+def resolve_columns(columns, fingerprint=None):
+    """Maps invoice headers to the columns verification needs.
+
+    Returns a dict with 'weight', 'address', 'actual_cost' (defaulting to the
+    standard names) and 'sender_address' (None when absent). Mappings are
+    cached per header fingerprint.
+    """
+    columns = list(columns)
+    fingerprint = fingerprint or header_fingerprint(columns)
+    mapping = _MAPPING_CACHE.get(fingerprint)
+    if mapping is None:
+        mapping = _MAPPING_CACHE[fingerprint] = _resolve(columns)
+    return dict(mapping)
+
+def missing_columns(columns, mapping=None):
+    """Required columns (by standard name) that the header does not provide."""
+    mapping = mapping or resolve_columns(columns)
+    present = set(columns)
+    return [name for key, name in REQUIRED_COLUMNS.items() if mapping[key] not in present]
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+from run_metrics import frame_bytes_per_row
+from verify_cost import DUPLICATE_STATUS, MISMATCH_STATUS
+
+# 검증 결과 화면용 페이지 단위 조회 (필터 마스크/요약 집계를 한 번만 계산하고 재사용)
+PAGE_SIZE_OPTIONS = (100, 500, 1000, 5000)
+HIDDEN_COLUMNS = ('수취주소_원본', '발송주소_원본')
+
+class ResultView:
+    """Precomputed filter masks and summary counts for one verified frame.
+
+    Built once per result; every rerun only combines cached boolean masks and
+    slices the requested page, so nothing scales with the full frame except
+    the first build.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.total_count = len(df)
+        status = df['결과'].to_numpy() if '결과' in df.columns else np.full(len(df), '', dtype=object)
+        self.mismatch_mask = status == MISMATCH_STATUS
+        self.mismatch_count = int(self.mismatch_mask.sum())
+        self.duplicate_mask = status == DUPLICATE_STATUS
+        self.duplicate_count = int(self.duplicate_mask.sum())
+        self.match_count = self.total_count - self.mismatch_count - self.duplicate_count
+        self.match_rate = (self.match_count / self.total_count) * 100 if self.total_count > 0 else 0
+        self.columns = [c for c in df.columns if c not in HIDDEN_COLUMNS]
+        self.bytes_per_row = frame_bytes_per_row(df)
+
+        # 지역구분/법인별 값 코드 (필터 시 문자열 비교 없이 코드로 마스크 생성)
+        self._codes = {}
+        self.options = {}
+        for column in ('지역구분', '법인'):
+            if column in df.columns:
+                codes, uniques = pd.factorize(df[column])
+                self._codes[column] = codes
+                self.options[column] = [str(u) for u in uniques]
+        self.region_counts = self._counts('지역구분')
+        self._selections = {}
+
+    def _counts(self, column):
+        if column not in self._codes:
+            return {}
+        codes = self._codes[column]
+        valid = codes >= 0
+        totals = np.bincount(codes[valid], minlength=len(self.options[column]))
+        mismatches = np.bincount(codes[valid & self.mismatch_mask], minlength=len(self.options[column]))
+        return {name: (int(t), int(m)) for name, t, m in zip(self.options[column], totals, mismatches)}
+
+    def _value_mask(self, column, values):
+        wanted = [i for i, name in enumerate(self.options.get(column, [])) if name in values]
+        return np.isin(self._codes[column], wanted)
+
+    def select(self, mismatch_only=False, regions=None, entities=None, duplicates_only=False):
+        """Returns the row positions matching the filters (cached per filter combination)."""
+        key = (mismatch_only, tuple(sorted(regions or ())), tuple(sorted(entities or ())), duplicates_only)
+        positions = self._selections.get(key)
+        if positions is None:
+            mask = self.mismatch_mask.copy() if mismatch_only else np.ones(self.total_count, dtype=bool)
+            if duplicates_only:
+                mask &= self.duplicate_mask
+            if regions and '지역구분' in self._codes:
+                mask &= self._value_mask('지역구분', regions)
+            if entities and '법인' in self._codes:
+                mask &= self._value_mask('법인', entities)
+            positions = np.flatnonzero(mask)
+            self._selections[key] = positions
+        return positions
+
+    def page(self, positions, page_number, page_size, columns=None):
+        """Returns the rows of one 1-based page as a small DataFrame."""
+        start = (page_number - 1) * page_size
+        return self.df.iloc[positions[start:start + page_size]][columns or self.columns]
+
+def page_count(row_count, page_size):
+    return max(1, -(-row_count // page_size))
@@ -0,0 +1,311 @@
+import os
+import re
+import sqlite3
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from invoice_schema import resolve_columns
+
+# 모든 검증 결과를 한 곳에 모아두는 로컬 SQLite 저장소 (월/법인/서비스 교차 조회용)
+WAREHOUSE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results_warehouse.sqlite')
+
+# 운임표 구간을 모를 때 쓰는 기본 무게 구간 (택배 운임표 기준, kg)
+# 실행마다 사용한 구간을 runs.weight_limits 에 저장하고, 모르면 같은 서비스의 마지막 구간을 이어서 사용
+DEFAULT_WEIGHT_LIMITS = (5, 10, 20, 30)
+CUBE_DIMENSIONS = ('entity', 'service', 'month', 'region', 'weight_bracket', 'remark')
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS runs ("
+    " run_id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " entity TEXT NOT NULL,"
+    " service TEXT NOT NULL,"
+    " month TEXT NOT NULL,"
+    " source_file TEXT NOT NULL,"
+    " row_count INTEGER NOT NULL DEFAULT 0,"
+    " mismatch_count INTEGER NOT NULL DEFAULT 0,"
+    " created_at TEXT NOT NULL,"
+    " weight_limits TEXT)",
+    "CREATE TABLE IF NOT EXISTS verified_rows ("
+    " run_id INTEGER NOT NULL REFERENCES runs(run_id),"
+    " entity TEXT NOT NULL,"
+    " service TEXT NOT NULL,"
+    " month TEXT NOT NULL,"
+    " waybill TEXT,"
+    " address TEXT,"
+    " weight REAL,"
+    " actual_cost REAL,"
+    " expected_cost INTEGER,"
+    " diff REAL,"
+    " region TEXT,"
+    " remark TEXT,"
+    " status TEXT)",
+    "CREATE INDEX IF NOT EXISTS idx_rows_key ON verified_rows(entity, service, month, waybill)",
+    "CREATE INDEX IF NOT EXISTS idx_rows_waybill ON verified_rows(waybill)",
+    "CREATE INDEX IF NOT EXISTS idx_rows_mismatch ON verified_rows(status, region, entity, month)",
+    "CREATE INDEX IF NOT EXISTS idx_rows_run ON verified_rows(run_id)",
+    "CREATE INDEX IF NOT EXISTS idx_runs_file ON runs(entity, service, source_file)",
+    # 실행별 집계 큐브: 검증할 때마다 갱신되고, 요약 화면은 이 표만 읽음
+    "CREATE TABLE IF NOT EXISTS summary_cube ("
+    " run_id INTEGER NOT NULL REFERENCES runs(run_id),"
+    " entity TEXT NOT NULL,"
+    " service TEXT NOT NULL,"
+    " month TEXT NOT NULL,"
+    " region TEXT NOT NULL,"
+    " weight_bracket TEXT NOT NULL,"
+    " remark TEXT NOT NULL,"
+    " row_count INTEGER NOT NULL,"
+    " mismatch_count INTEGER NOT NULL,"
+    " diff_sum REAL NOT NULL,"
+    " PRIMARY KEY (run_id, region, weight_bracket, remark))",
+    "CREATE INDEX IF NOT EXISTS idx_cube_key ON summary_cube(entity, service, month)",
+]
+
+def infer_month(filename, default=None):
+    """Extracts 'YYYY-MM' from names like '...(2025.10).xlsx'; falls back to default or the current month."""
+    match = re.search(r'(20\d{2})\s*[.\-_년 ]\s*(\d{1,2})(?!\d)', os.path.basename(filename))
+    if match and 1 <= int(match.group(2)) <= 12:
+        return f"{match.group(1)}-{int(match.group(2)):02d}"
+    return default or datetime.now().strftime('%Y-%m')
+
+def weight_bracket_labels(weights, limits=DEFAULT_WEIGHT_LIMITS):
+    """Labels each weight with its rate bracket ('~5kg', '5~10kg', ..., '30kg 초과'); NaN -> '무게 없음'."""
+    limits = list(limits)
+    names = [f"~{limits[0]}kg"] + [f"{low}~{high}kg" for low, high in zip(limits, limits[1:])]
+    names += [f"{limits[-1]}kg 초과", "무게 없음"]
+    weights = pd.to_numeric(pd.Series(weights).reset_index(drop=True), errors='coerce').to_numpy(dtype=float)
+    # RateTable 과 같은 규칙 (구간 상한 포함)
+    index = np.searchsorted(np.asarray(limits, dtype=float), weights, side='left')
+    index[np.isnan(weights)] = len(names) - 1
+    return np.asarray(names, dtype=object)[index]
+
+def _format_limits(limits):
+    return ','.join(f"{limit:g}" for limit in limits)
+
+def _parse_limits(text):
+    if not text:
+        return None
+    return tuple(int(value) if float(value).is_integer() else float(value) for value in text.split(','))
+
+def _column(df, name):
+    if name and name in df.columns:
+        return df[name].reset_index(drop=True)
+    return pd.Series([None] * len(df), dtype=object)
+
+def _text(series):
+    return [None if pd.isna(v) else str(v) for v in series]
+
+def _waybill_text(series):
+    # 엑셀에서 실수로 읽힌 운송장번호(123.0)는 정수 문자열로 저장
+    return [None if pd.isna(v) else (str(int(v)) if isinstance(v, float) and v.is_integer() else str(v))
+            for v in series]
+
+def _number(series):
+    values = pd.to_numeric(series, errors='coerce').astype(float).to_numpy()
+    return [None if np.isnan(v) else float(v) for v in values]
+
+def _cube_rows(regions, weights, remarks, diffs, mismatch_mask, weight_limits):
+    """Aggregates one batch of rows into (region, bracket, remark, rows, mismatches, diff_sum) cells."""
+    frame = pd.DataFrame({
+        'region': _text(regions),
+        'bracket': weight_bracket_labels(weights, weight_limits),
+        'remark': _text(remarks),
+        'mismatch': np.asarray(mismatch_mask, dtype=np.int64),
+        'diff': pd.to_numeric(pd.Series(diffs).reset_index(drop=True), errors='coerce').to_numpy(dtype=float),
+    })
+    frame[['region', 'remark']] = frame[['region', 'remark']].fillna('')
+    grouped = frame.groupby(['region', 'bracket', 'remark'], sort=False).agg(
+        rows=('mismatch', 'size'), mismatches=('mismatch', 'sum'), diff_sum=('diff', 'sum'))
+    return [(region, bracket, remark, int(rows), int(mismatches), float(diff_sum))
+            for (region, bracket, remark), rows, mismatches, diff_sum
+            in zip(grouped.index, grouped['rows'], grouped['mismatches'], grouped['diff_sum'])]
+
+class ResultsWarehouse:
+    """Bulk-inserts verified rows keyed by entity, service, month and waybill."""
+
+    def __init__(self, path=WAREHOUSE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            self.conn.execute(statement)
+        if 'weight_limits' not in [row[1] for row in self.conn.execute("PRAGMA table_info(runs)")]:
+            self.conn.execute("ALTER TABLE runs ADD COLUMN weight_limits TEXT")
+        self.conn.commit()
+        self._backfill_cube()
+
+    def latest_weight_limits(self, service):
+        """Bracket limits of the most recent run of service that recorded them, or None."""
+        row = self.conn.execute(
+            "SELECT weight_limits FROM runs WHERE service = ? AND weight_limits IS NOT NULL"
+            " ORDER BY run_id DESC LIMIT 1", (service,)).fetchone()
+        return _parse_limits(row[0]) if row else None
+
+    def _run_weight_limits(self, limits_text, service):
+        return _parse_limits(limits_text) or self.latest_weight_limits(service) or DEFAULT_WEIGHT_LIMITS
+
+    def begin_run(self, entity, service, source_file, month=None, weight_limits=None):
+        """Starts a run; earlier runs of the same file for the same entity/service are replaced.
+
+        weight_limits are the rate-table bracket limits used to label rows in
+        the summary cube; they are stored with the run. Without them the
+        limits of the service's latest run are reused (DEFAULT_WEIGHT_LIMITS
+        when there is none), so bracket labels stay aligned across runs.
+        """
+        source_file = os.path.basename(source_file)
+        month = month or infer_month(source_file)
+        limits = tuple(weight_limits or self.latest_weight_limits(service) or DEFAULT_WEIGHT_LIMITS)
+        with self.conn:
+            old_runs = [r[0] for r in self.conn.execute(
+                "SELECT run_id FROM runs WHERE entity = ? AND service = ? AND source_file = ?",
+                (entity, service, source_file))]
+            for run_id in old_runs:
+                self.conn.execute("DELETE FROM verified_rows WHERE run_id = ?", (run_id,))
+                self.conn.execute("DELETE FROM summary_cube WHERE run_id = ?", (run_id,))
+                self.conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+            cur = self.conn.execute(
+                "INSERT INTO runs (entity, service, month, source_file, created_at, weight_limits)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (entity, service, month, source_file, datetime.now().isoformat(timespec='seconds'),
+                 _format_limits(limits)))
+        return cur.lastrowid
+
+    def add_rows(self, run_id, df):
+        """Appends the verified rows of df (one file or one streaming chunk) to run_id."""
+        entity, service, month, limits_text = self.conn.execute(
+            "SELECT entity, service, month, weight_limits FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        # 상태 문자열은 verify_cost 에서 가져옴 (verify_cost 가 이 모듈을 import 하므로 사용하는 곳에서 import)
+        from verify_cost import MISMATCH_STATUS
+        columns = resolve_columns(df.columns)
+        status = _column(df, '결과')
+        records = zip(
+            _waybill_text(_column(df, '운송장번호')),
+            _text(_column(df, columns['address'])),
+            _number(_column(df, columns['weight'])),
+            _number(_column(df, columns['actual_cost'])),
+            _number(_column(df, '예상운임')),
+            _number(_column(df, '차액')),
+            _text(_column(df, '지역구분')),
+            _text(_column(df, '비고')),
+            _text(status),
+        )
+        mismatch_mask = (status == MISMATCH_STATUS).to_numpy()
+        cube = _cube_rows(_column(df, '지역구분'), _column(df, columns['weight']), _column(df, '비고'),
+                          _column(df, '차액'), mismatch_mask, self._run_weight_limits(limits_text, service))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO verified_rows VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((run_id, entity, service, month) + record for record in records))
+            self.conn.execute(
+                "UPDATE runs SET row_count = row_count + ?, mismatch_count = mismatch_count + ? WHERE run_id = ?",
+                (len(df), int(mismatch_mask.sum()), run_id))
+            self._add_to_cube(run_id, entity, service, month, cube)
+
+    def _add_to_cube(self, run_id, entity, service, month, cube):
+        # 스트리밍 청크처럼 같은 실행에 여러 번 들어오면 기존 칸에 더함
+        self.conn.executemany(
+            "INSERT INTO summary_cube VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(run_id, region, weight_bracket, remark) DO UPDATE SET"
+            " row_count = row_count + excluded.row_count,"
+            " mismatch_count = mismatch_count + excluded.mismatch_count,"
+            " diff_sum = diff_sum + excluded.diff_sum",
+            ((run_id, entity, service, month) + cell for cell in cube))
+
+    def _backfill_cube(self):
+        """Builds cube cells for runs recorded before the cube existed.
+
+        Rows are bracketed with the run's stored limits, else those of the
+        service's latest run, else DEFAULT_WEIGHT_LIMITS.
+        """
+        from verify_cost import MISMATCH_STATUS
+        missing = self.conn.execute(
+            "SELECT run_id, entity, service, month, weight_limits FROM runs"
+            " WHERE row_count > 0 AND run_id NOT IN (SELECT DISTINCT run_id FROM summary_cube)").fetchall()
+        for run_id, entity, service, month, limits_text in missing:
+            rows = pd.read_sql_query(
+                "SELECT region, weight, remark, diff, status FROM verified_rows WHERE run_id = ?",
+                self.conn, params=(run_id,))
+            cube = _cube_rows(rows['region'], rows['weight'], rows['remark'], rows['diff'],
+                              (rows['status'] == MISMATCH_STATUS).to_numpy(),
+                              self._run_weight_limits(limits_text, service))
+            with self.conn:
+                self._add_to_cube(run_id, entity, service, month, cube)
+
+    def record_run(self, df, entity, service, source_file, month=None, weight_limits=None):
+        """Stores a whole verified frame as one run and returns its run_id."""
+        run_id = self.begin_run(entity, service, source_file, month, weight_limits)
+        self.add_rows(run_id, df)
+        return run_id
+
+    def summary(self, by=('entity', 'service', 'month'), entity=None, service=None,
+                month_from=None, month_to=None):
+        """Row/mismatch counts and summed 차액 grouped by any CUBE_DIMENSIONS, read from the cube only."""
+        by = [c for c in by if c in CUBE_DIMENSIONS]
+        clauses, params = [], []
+        for column, value in (('entity', entity), ('service', service)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if month_from:
+            clauses.append("month >= ?")
+            params.append(month_from)
+        if month_to:
+            clauses.append("month <= ?")
+            params.append(month_to)
+
+        select = ", ".join(by + ["SUM(row_count) AS rows", "SUM(mismatch_count) AS mismatches",
+                                 "SUM(diff_sum) AS diff_sum"])
+        sql = f"SELECT {select} FROM summary_cube"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if by:
+            sql += f" GROUP BY {', '.join(by)} ORDER BY {', '.join(by)}"
+        summary = pd.read_sql_query(sql, self.conn, params=params)
+        summary[['rows', 'mismatches']] = summary[['rows', 'mismatches']].fillna(0).astype(np.int64)
+        summary['diff_sum'] = summary['diff_sum'].fillna(0)
+        return summary
+
+    def query_rows(self, entity=None, service=None, month_from=None, month_to=None,
+                   region=None, remark=None, waybill=None, mismatches_only=True, limit=None):
+        """Returns matching rows as a DataFrame. region/remark match by substring."""
+        from verify_cost import MISMATCH_STATUS
+        clauses, params = [], []
+        if mismatches_only:
+            clauses.append("status = ?")
+            params.append(MISMATCH_STATUS)
+        for column, value in (('entity', entity), ('service', service), ('waybill', waybill)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if month_from:
+            clauses.append("month >= ?")
+            params.append(month_from)
+        if month_to:
+            clauses.append("month <= ?")
+            params.append(month_to)
+        for column, value in (('region', region), ('remark', remark)):
+            if value:
+                clauses.append(f"{column} LIKE ?")
+                params.append(f"%{value}%")
+
+        sql = ("SELECT r.entity, r.service, r.month, u.source_file, r.waybill, r.address, r.weight,"
+               " r.actual_cost, r.expected_cost, r.diff, r.region, r.remark, r.status"
+               " FROM verified_rows r JOIN runs u ON u.run_id = r.run_id")
+        if clauses:
+            sql += " WHERE " + " AND ".join(f"r.{c}" for c in clauses)
+        sql += " ORDER BY r.month, r.entity, r.waybill"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def runs(self):
+        return pd.read_sql_query("SELECT * FROM runs ORDER BY month, entity, source_file", self.conn)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,162 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# 검증 실행의 단계별 소요 시간/처리량/메모리를 기록하는 계측 도구
+RUN_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run_log.jsonl')
+PROFILE_TOP_N = 15
+
+def _peak_rss_mb():
+    """Process high-water RSS in MB (peak working set on Windows), or None when it cannot be read.
+
+    This is the peak over the whole process lifetime so far, not of one stage;
+    per-stage peaks need trace_memory=True.
+    """
+    if sys.platform == 'win32':
+        return _peak_working_set_mb()
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _peak_working_set_mb():
+    # Windows 에는 resource 모듈이 없으므로 GetProcessMemoryInfo 의 PeakWorkingSetSize 를 사용
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    try:
+        kernel32 = ctypes.WinDLL('kernel32')
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        get_info = kernel32.K32GetProcessMemoryInfo
+        get_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+        get_info.restype = wintypes.BOOL
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        if not get_info(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return None
+    except (AttributeError, OSError):
+        return None
+    return counters.PeakWorkingSetSize / (1024 * 1024)
+
+class RunTimer:
+    """Records wall time, rows/sec and peak memory for each stage of one verification run.
+
+    Without trace_memory each stage records peak_rss_mb, the process-lifetime
+    RSS high-water mark at the end of the stage (it never goes down, so it is
+    not a per-stage figure). trace_memory=True uses tracemalloc for a real
+    per-stage peak (peak_mb) of Python allocations; profile=True wraps the
+    whole run in cProfile.
+    """
+
+    def __init__(self, name, profile=False, trace_memory=False, **context):
+        self.name = name
+        self.context = context
+        self.stages = []
+        self.profile_text = None
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self._profiler = cProfile.Profile() if profile else None
+        self._trace_memory = trace_memory and not tracemalloc.is_tracing()
+        if self._trace_memory:
+            tracemalloc.start()
+        if self._profiler is not None:
+            self._profiler.enable()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Times the enclosed block; rows can also be filled in later via the yielded dict."""
+        record = {'stage': name, 'rows': rows}
+        if self._trace_memory:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - started
+            record['seconds'] = round(seconds, 4)
+            if record['rows'] and seconds > 0:
+                record['rows_per_sec'] = round(record['rows'] / seconds, 1)
+            if self._trace_memory:
+                record['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            else:
+                peak = _peak_rss_mb()
+                if peak is not None:
+                    record['peak_rss_mb'] = round(peak, 1)
+            self.stages.append(record)
+
+    def add_stage(self, name, seconds, rows=None):
+        """Records a stage that was timed elsewhere (e.g. accumulated over streaming chunks)."""
+        record = {'stage': name, 'rows': rows, 'seconds': round(seconds, 4)}
+        if rows and seconds > 0:
+            record['rows_per_sec'] = round(rows / seconds, 1)
+        self.stages.append(record)
+
+    def finish(self, **extra):
+        """Stops profiling/tracing and returns the run record."""
+        if self._profiler is not None:
+            self._profiler.disable()
+            buffer = io.StringIO()
+            pstats.Stats(self._profiler, stream=buffer).sort_stats('cumulative').print_stats(PROFILE_TOP_N)
+            self.profile_text = buffer.getvalue()
+            self._profiler = None
+        if self._trace_memory:
+            tracemalloc.stop()
+            self._trace_memory = False
+
+        record = {
+            'run': self.name,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'total_seconds': round(time.perf_counter() - self._started, 4),
+            'stages': self.stages,
+        }
+        record.update(self.context)
+        record.update(extra)
+        if self.profile_text:
+            record['profile'] = self.profile_text
+        return record
+
+def append_run_log(record, path=RUN_LOG_PATH):
+    """Appends one run record as a JSON line; logging failures never break a run."""
+    try:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+    except OSError as e:
+        print(f"  - Warning: could not write run log {path}: {e}")
+
+def frame_bytes_per_row(df):
+    """Deep in-memory size of a DataFrame per row (object strings included)."""
+    if not len(df):
+        return 0.0
+    return round(float(df.memory_usage(deep=True).sum()) / len(df), 1)
+
+def format_stages(record):
+    lines = []
+    for stage in record['stages']:
+        line = f"    {stage['stage']:<16} {stage['seconds']:>8.3f} s"
+        if stage.get('rows_per_sec'):
+            line += f"  {stage['rows_per_sec']:>12,.0f} rows/s"
+        if stage.get('peak_mb') is not None:
+            line += f"  stage peak {stage['peak_mb']:,.1f} MB"
+        elif stage.get('peak_rss_mb') is not None:
+            line += f"  process peak RSS {stage['peak_rss_mb']:,.1f} MB"
+        lines.append(line)
+    if record.get('bytes_per_row'):
+        lines.append(f"    result frame     {record['bytes_per_row']:>8,.1f} bytes/row")
+    return '\n'.join(lines)
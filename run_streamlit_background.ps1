@@ -5,7 +5,7 @@ $ScriptDir = Split-Path -Parent $MyInvocation.MyCommand.Path
 Set-Location $ScriptDir
 
 $VenvPython = Join-Path $ScriptDir ".venv\Scripts\python.exe"
-$RequiredPackages = @("pandas", "openpyxl", "streamlit")
+$RequiredPackages = @("pandas", "openpyxl", "streamlit", "pyarrow")
 $PidFile = Join-Path $ScriptDir ".streamlit_background.pid"
 $StdoutLog = Join-Path $ScriptDir "streamlit_background.out.log"
 $StderrLog = Join-Path $ScriptDir "streamlit_background.err.log"
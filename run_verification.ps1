@@ -5,7 +5,7 @@ $ScriptDir = Split-Path -Parent $MyInvocation.MyCommand.Path
 Set-Location $ScriptDir
 
 $VenvPython = Join-Path $ScriptDir ".venv\Scripts\python.exe"
-$RequiredPackages = @("pandas", "openpyxl", "streamlit")
+$RequiredPackages = @("pandas", "openpyxl", "streamlit", "pyarrow")
 
 if (-not (Test-Path $VenvPython)) {
     Write-Output "[X] Virtual environment not found: .venv\Scripts\python.exe"
@@ -54,7 +54,7 @@ if ($MissingPackages.Count -gt 0) {
 }
 
 Write-Output "[INFO] Running cost verification..."
-& $VenvPython "verify_cost.py"
+& $VenvPython "verify_cost.py" @args
 $ExitCode = $LASTEXITCODE
 
 if ($ExitCode -eq 0) {
@@ -0,0 +1,398 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from excel_loader import open_excel_source
+from entity_folders import RATE_FILE_NAME
+
+# 서비스별(택배/직배송/퀵서비스) 운임표를 한 번만 파싱해 컴파일된 형태로 공유
+# 컴파일 결과(RateTable)는 불변이고 pickle 크기가 작아 작업 프로세스에 그대로 넘길 수 있음
+
+DEFAULT_SERVICE = '택배'
+REGIONS = ('전국', '제주')
+# 컴파일된 운임표 사이드카 (JSON) - 운임표 엑셀이 바뀌지 않았으면 엑셀 파싱 없이 바로 사용
+SIDECAR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.tariff_cache')
+SIDECAR_VERSION = 4
+
+class RateTable:
+    """Compiled rate brackets with array-backed bisect/searchsorted lookups.
+
+    Region index 0 is 전국 and 1 is 제주. Iterating, indexing and len() still
+    behave like the old sorted list of {'limit','national','jeju'} dicts.
+    도서산간 parcels pay remote_surcharge (per region) on top of the bracket price;
+    when it is None they are only labelled and priced like any other parcel.
+    Instances are treated as immutable once compiled (arrays are read-only)
+    and pickle to their brackets and surcharge rule only.
+    """
+    __slots__ = ('limits', 'prices', 'max_limit', 'surcharge_base', 'surcharge_unit', 'surcharge_chunk_kg',
+                 'remote_surcharge', '_limits_array', '_price_array', '_dense_scale', '_dense_index', '_version')
+
+    # Per 5kg chunk above the largest bracket (전국, 제주)
+    SURCHARGE_UNIT_5KG = (2000, 3000)
+    SURCHARGE_CHUNK_KG = 5
+    # 도서산간 추가 운임 (전국, 제주) - 운임표에 '도서산간' 행이 있을 때만 부과
+    REMOTE_SURCHARGE = None
+
+    def __init__(self, limits, national, jeju, surcharge_unit=SURCHARGE_UNIT_5KG,
+                 surcharge_chunk_kg=SURCHARGE_CHUNK_KG, remote_surcharge=REMOTE_SURCHARGE):
+        if not limits:
+            raise ValueError("Rate table has no weight brackets.")
+        self.limits = tuple(limits)
+        self.prices = (tuple(national), tuple(jeju))
+        self.max_limit = self.limits[-1]
+        self.surcharge_base = (self.prices[0][-1], self.prices[1][-1])
+        self.surcharge_unit = tuple(surcharge_unit)
+        self.surcharge_chunk_kg = surcharge_chunk_kg
+        self.remote_surcharge = tuple(remote_surcharge) if remote_surcharge is not None else None
+        self._limits_array = _read_only(np.array(self.limits, dtype=float))
+        self._price_array = _read_only(np.array(self.prices, dtype=np.int64))
+        self._dense_scale = None
+        self._dense_index = None
+        self._version = None
+
+    @classmethod
+    def from_brackets(cls, brackets, **surcharge):
+        brackets = sorted(brackets, key=lambda x: x['limit'])
+        return cls([b['limit'] for b in brackets],
+                   [b['national'] for b in brackets],
+                   [b['jeju'] for b in brackets], **surcharge)
+
+    def __reduce__(self):
+        return (_restore_rate_table, (self.limits, self.prices, self.surcharge_unit,
+                                      self.surcharge_chunk_kg, self._dense_scale, self.remote_surcharge))
+
+    def __len__(self):
+        return len(self.limits)
+
+    def __getitem__(self, index):
+        return {'limit': self.limits[index], 'national': self.prices[0][index], 'jeju': self.prices[1][index]}
+
+    def __iter__(self):
+        for index in range(len(self.limits)):
+            yield self[index]
+
+    @property
+    def version(self):
+        """Content fingerprint; changes whenever a limit, price or surcharge rule changes."""
+        if self._version is None:
+            raw = repr((self.limits, self.prices, self.surcharge_unit, self.surcharge_chunk_kg,
+                        self.remote_surcharge))
+            self._version = hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+        return self._version
+
+    def __repr__(self):
+        return f"RateTable({len(self)} brackets, max {self.max_limit}kg)"
+
+    def build_dense(self, step=0.1):
+        """Precomputes the bracket index for every weight on a `step` kg grid up to max_limit."""
+        scale = int(round(1 / step))
+        grid = np.arange(int(math.ceil(self.max_limit * scale)) + 1) / scale
+        self._dense_scale = scale
+        self._dense_index = _read_only(np.searchsorted(self._limits_array, grid, side='left'))
+        return self
+
+    def lookup(self, weight, is_jeju, is_remote=False):
+        """Returns (cost, remark) for a single parcel."""
+        region = 1 if is_jeju else 0
+        cost, remark = self._bracket_cost(weight, region)
+        if is_remote and self.remote_surcharge is not None:
+            extra = self.remote_surcharge[region]
+            cost += extra
+            remark = f"Remote (+{extra})" if remark == "Normal" else f"{remark}, Remote (+{extra})"
+        return cost, remark
+
+    def _bracket_cost(self, weight, region):
+        # NaN weights never fall into a bracket
+        index = bisect_left(self.limits, weight) if weight == weight else len(self.limits)
+        if index < len(self.limits):
+            return self.prices[region][index], "Normal"
+
+        extra_weight = weight - self.max_limit
+        if extra_weight > 0:
+            extra_units = math.ceil(extra_weight / self.surcharge_chunk_kg)
+            surcharge = extra_units * self.surcharge_unit[region]
+            return self.surcharge_base[region] + surcharge, f"Surcharge (+{surcharge})"
+        return self.surcharge_base[region], "MaxBracket"
+
+    def bracket_indices(self, weights):
+        """Bracket index per weight (len(self) when above the largest bracket or NaN)."""
+        if self._dense_index is None:
+            return np.searchsorted(self._limits_array, weights, side='left')
+
+        grid = np.rint(weights * self._dense_scale)
+        on_grid = (grid / self._dense_scale == weights) & (grid >= 0) & (grid < len(self._dense_index))
+        index = np.empty(len(weights), dtype=np.intp)
+        index[on_grid] = self._dense_index[grid[on_grid].astype(np.intp)]
+        index[~on_grid] = np.searchsorted(self._limits_array, weights[~on_grid], side='left')
+        return index
+
+    def lookup_many(self, weights, is_jeju, is_remote=None):
+        """Vectorized lookup; returns (costs, remarks) arrays."""
+        weights = np.asarray(weights, dtype=float)
+        region = np.asarray(is_jeju, dtype=bool).astype(np.intp)
+
+        index = self.bracket_indices(weights)
+        in_bracket = index < len(self.limits)
+        costs = self._price_array[region, np.minimum(index, len(self.limits) - 1)]
+        remarks = np.full(len(weights), "Normal", dtype=object)
+
+        over = ~in_bracket
+        if over.any():
+            extra_weight = weights[over] - self.max_limit
+            charged = extra_weight > 0
+            unit = np.asarray(self.surcharge_unit, dtype=np.int64)[region[over]]
+            extra_units = np.ceil(np.where(charged, extra_weight, 0) / self.surcharge_chunk_kg).astype(np.int64)
+            surcharge = extra_units * unit
+
+            costs[over] = costs[over] + surcharge
+            surcharge_labels = ("Surcharge (+" + pd.Series(surcharge).astype(str) + ")").to_numpy(dtype=object)
+            remarks[over] = np.where(charged, surcharge_labels, "MaxBracket")
+
+        remote = np.zeros(len(weights), dtype=bool) if is_remote is None else np.asarray(is_remote, dtype=bool)
+        if self.remote_surcharge is not None and remote.any():
+            extra = np.asarray(self.remote_surcharge, dtype=np.int64)[region[remote]]
+            costs[remote] = costs[remote] + extra
+            remote_labels = ("Remote (+" + pd.Series(extra).astype(str) + ")").to_numpy(dtype=object)
+            base = remarks[remote]
+            remarks[remote] = np.where(base == "Normal", remote_labels, base + ", " + remote_labels)
+        return costs, remarks
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+def _restore_rate_table(limits, prices, surcharge_unit, surcharge_chunk_kg, dense_scale,
+                        remote_surcharge=RateTable.REMOTE_SURCHARGE):
+    table = RateTable(limits, prices[0], prices[1], surcharge_unit, surcharge_chunk_kg, remote_surcharge)
+    if dense_scale:
+        table.build_dense(1 / dense_scale)
+    return table
+
+def compile_rate_table(rate_map):
+    """Returns rate_map as a RateTable, compiling a list of bracket dicts if needed."""
+    if isinstance(rate_map, RateTable):
+        return rate_map
+    return RateTable.from_brackets(rate_map)
+
+# === 운임표 형식 (파서 등록) ===
+# remote_surcharge 는 운임표에 '도서산간' 추가 운임 행이 없을 때 쓰는 값 (None 이면 추가 운임 없음)
+TariffSpec = namedtuple('TariffSpec', 'service file_name format surcharge_unit surcharge_chunk_kg remote_surcharge',
+                        defaults=(RateTable.REMOTE_SURCHARGE,))
+
+_TARIFF_FORMATS = {}
+
+def register_tariff_format(name):
+    """Registers parser(file_path, spec) -> RateTable for a rate workbook layout."""
+    def decorator(parser):
+        _TARIFF_FORMATS[name] = parser
+        return parser
+    return decorator
+
+def _region_columns(df):
+    # 운임 아래 행의 '전국'/'제주' 라벨로 지역 컬럼을 찾음 (없으면 기존 위치 사용)
+    for _, row in df.head(5).iterrows():
+        labels = {str(value).strip(): column for column, value in row.items() if isinstance(value, str)}
+        if all(region in labels for region in REGIONS):
+            return [labels[region] for region in REGIONS]
+    return ['운임', 'Unnamed: 3']
+
+@register_tariff_format('weight_bracket')
+def parse_weight_bracket_table(file_path, spec=None):
+    """Parses a '무게,세변의 합' bracket sheet with 전국/제주 price columns.
+
+    A row labelled '도서산간' (in the 구분 or 무게 column) gives the 도서산간
+    surcharge per region; without it spec.remote_surcharge (None by default,
+    i.e. no surcharge) is used.
+    """
+    # Load with header at row 1 (0-indexed)
+    with open_excel_source(file_path) as source:
+        df = pd.read_excel(source, header=1)
+
+    weight_column = next((c for c in df.columns if '무게' in str(c)), '무게,세변의 합')
+    national_column, jeju_column = _region_columns(df)
+
+    # Extract rows with weight info, e.g. "5kg / 80cm" -> 5
+    rate_map = []
+    remote_surcharge = None
+    for label, weight_value, national, jeju in zip(df[df.columns[0]], df[weight_column],
+                                                   df[national_column], df[jeju_column]):
+        weight_str = str(weight_value)
+        if '도서산간' in f"{label}{weight_str}":
+            try:
+                remote_surcharge = (int(national), int(jeju))
+            except (ValueError, TypeError):
+                pass
+            continue
+        if 'kg' not in weight_str:
+            continue
+        try:
+            rate_map.append({
+                'limit': int(weight_str.split('kg')[0].strip()),
+                'national': int(national),
+                'jeju': int(jeju),
+            })
+        except (ValueError, IndexError):
+            continue
+
+    surcharge = {}
+    if spec is not None:
+        surcharge = {'surcharge_unit': spec.surcharge_unit, 'surcharge_chunk_kg': spec.surcharge_chunk_kg,
+                     'remote_surcharge': spec.remote_surcharge}
+    if remote_surcharge is not None:
+        surcharge['remote_surcharge'] = remote_surcharge
+    table = RateTable.from_brackets(rate_map, **surcharge).build_dense()
+    _warn_without_remote_surcharge(table, file_path)
+    return table
+
+def _warn_without_remote_surcharge(table, file_path):
+    if table.remote_surcharge is None:
+        print(f"⚠️ 운임표에 '도서산간' 행이 없어 도서산간은 지역만 표시하고 추가 운임은 계산하지 않습니다: "
+              f"{os.path.basename(str(file_path))}")
+
+SERVICE_TARIFFS = {
+    service: TariffSpec(service, RATE_FILE_NAME, 'weight_bracket',
+                        RateTable.SURCHARGE_UNIT_5KG, RateTable.SURCHARGE_CHUNK_KG, RateTable.REMOTE_SURCHARGE)
+    for service in ('택배', '직배송', '퀵서비스')
+}
+
+def load_rate_table(file_path, service=DEFAULT_SERVICE):
+    """Parses and compiles one rate workbook (no caching; see TariffRegistry.get)."""
+    spec = SERVICE_TARIFFS.get(service) or SERVICE_TARIFFS[DEFAULT_SERVICE]
+    return _TARIFF_FORMATS[spec.format](file_path, spec)
+
+# === 사이드카 (파싱된 구간을 작은 JSON 으로 저장, 다음 실행부터 엑셀 파싱 생략) ===
+def _file_sha1(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def _sidecar_path(service, file_path, sidecar_dir):
+    name = hashlib.sha1(f"{service}|{os.path.abspath(file_path)}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(sidecar_dir, f"{name}.json")
+
+def _spec_fields(spec):
+    return {'format': spec.format, 'surcharge_unit': list(spec.surcharge_unit),
+            'surcharge_chunk_kg': spec.surcharge_chunk_kg, 'remote_surcharge': _optional_list(spec.remote_surcharge)}
+
+def _optional_list(values):
+    return None if values is None else list(values)
+
+def _table_from_sidecar(data, spec):
+    """Rebuilds the RateTable from sidecar data, or None when it is stale or malformed."""
+    if data.get('sidecar_version') != SIDECAR_VERSION or data.get('spec') != _spec_fields(spec):
+        return None
+    table = RateTable(data['limits'], data['national'], data['jeju'], data['spec']['surcharge_unit'],
+                      data['spec']['surcharge_chunk_kg'], data['remote_surcharge']).build_dense()
+    # 내용 지문이 다르면 손상된 사이드카로 보고 다시 빌드
+    if table.version != data.get('table_version'):
+        return None
+    return table
+
+def load_tariff_sidecar(service, file_path, spec, sidecar_dir=SIDECAR_DIR):
+    """Returns the compiled table saved for file_path, or None when the workbook changed.
+
+    A matching size and mtime is trusted as is. When only the mtime moved
+    (OneDrive re-sync, copy), the workbook hash decides and the sidecar is re-stamped.
+    """
+    path = _sidecar_path(service, file_path, sidecar_dir)
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        stat = os.stat(file_path)
+        source = data['source']
+        table = _table_from_sidecar(data, spec)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if table is None or source.get('size') != stat.st_size:
+        return None
+    if source.get('mtime_ns') != stat.st_mtime_ns:
+        if source.get('sha1') != _file_sha1(file_path):
+            return None
+        _write_sidecar(path, dict(data, source=dict(source, mtime_ns=stat.st_mtime_ns)))
+    return table
+
+def store_tariff_sidecar(service, file_path, spec, table, sidecar_dir=SIDECAR_DIR):
+    """Saves the compiled brackets of file_path; failures only cost the next parse."""
+    try:
+        stat = os.stat(file_path)
+        data = {
+            'sidecar_version': SIDECAR_VERSION,
+            'service': service,
+            'source': {'path': os.path.abspath(file_path), 'size': stat.st_size,
+                       'mtime_ns': stat.st_mtime_ns, 'sha1': _file_sha1(file_path)},
+            'spec': _spec_fields(spec),
+            'table_version': table.version,
+            'limits': list(table.limits),
+            'national': list(table.prices[0]),
+            'jeju': list(table.prices[1]),
+            'remote_surcharge': _optional_list(table.remote_surcharge),
+        }
+        os.makedirs(sidecar_dir, exist_ok=True)
+        _write_sidecar(_sidecar_path(service, file_path, sidecar_dir), data)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"⚠️ 운임표 사이드카 저장 실패: {e}")
+
+def _write_sidecar(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+class TariffRegistry:
+    """Process-wide cache of compiled tariffs keyed by service and rate file version.
+
+    A rate workbook is parsed again only when its size or mtime changes;
+    every caller in the process (Streamlit sessions, CLI, job threads) gets
+    the same compiled RateTable, and pool workers receive it pickled.
+    Across processes the compiled brackets come from a JSON sidecar, so a
+    fresh start parses the workbook only after it has changed.
+    """
+
+    def __init__(self, specs=None, sidecar_dir=SIDECAR_DIR):
+        self._specs = dict(SERVICE_TARIFFS if specs is None else specs)
+        self._compiled = {}
+        self._lock = threading.Lock()
+        self.sidecar_dir = sidecar_dir
+
+    def register_service(self, spec):
+        with self._lock:
+            self._specs[spec.service] = spec
+            self._compiled = {k: v for k, v in self._compiled.items() if k[0] != spec.service}
+
+    def spec(self, service):
+        return self._specs.get(service) or self._specs[DEFAULT_SERVICE]
+
+    def rate_file(self, service, data_dir):
+        return os.path.join(data_dir, self.spec(service).file_name)
+
+    def get(self, service, file_path):
+        """Compiled tariff for service from file_path; raises FileNotFoundError when missing."""
+        stat = os.stat(file_path)
+        path = os.path.abspath(file_path)
+        key = (service, path, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            table = self._compiled.get(key)
+            if table is None:
+                table = self._load(service, file_path)
+                # 같은 서비스/파일의 이전 버전은 버림
+                self._compiled = {k: v for k, v in self._compiled.items() if k[:2] != (service, path)}
+                self._compiled[key] = table
+            return table
+
+    def _load(self, service, file_path):
+        spec = self.spec(service)
+        if self.sidecar_dir:
+            table = load_tariff_sidecar(service, file_path, spec, self.sidecar_dir)
+            if table is not None:
+                _warn_without_remote_surcharge(table, file_path)
+                return table
+        table = _TARIFF_FORMATS[spec.format](file_path, spec)
+        if self.sidecar_dir:
+            store_tariff_sidecar(service, file_path, spec, table, self.sidecar_dir)
+        return table
+
+TARIFFS = TariffRegistry()
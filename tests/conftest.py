@@ -0,0 +1,7 @@
+import os
+import sys
+
+# 모듈이 저장소 최상위에 있으므로 tests 에서도 그대로 import 할 수 있게 경로 추가
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,80 @@
+import re
+
+import numpy as np
+import pytest
+
+import address_classifier
+from address_classifier import (JEJU_KEYWORDS, JEJU_POSTAL_PREFIXES, REMOTE_AREAS, REMOTE_POSTAL_PREFIXES,
+                                classify_address, classify_addresses, normalize_address)
+from benchmarks.synthetic import JEJU_ADDRESSES, LOGISTICS_CENTER_ADDRESS, NATIONAL_ADDRESSES, REMOTE_ADDRESSES
+
+def _postal(text, prefixes):
+    return any(len(code) == 5 and code.startswith(prefixes) for code in re.findall(r'(?:^|[(\[])(\d+)', text))
+
+def reference_classify(address):
+    """Plain substring/regex version of the rules the automaton compiles."""
+    text = normalize_address(address)
+    is_center = '인천' in text and '중구' in text
+    is_jeju = any(keyword in text for keyword in JEJU_KEYWORDS) or _postal(text, JEJU_POSTAL_PREFIXES)
+    is_remote = any(area in text for area in REMOTE_AREAS) or _postal(text, REMOTE_POSTAL_PREFIXES)
+    return is_center, is_jeju, is_remote
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    address_classifier.clear_address_cache()
+    yield
+    address_classifier.clear_address_cache()
+
+@pytest.mark.parametrize('address, expected', [
+    ('서울특별시 강남구 테헤란로 1', (False, False, False)),
+    ('제주특별자치도 제주시 첨단로', (False, True, False)),
+    ('서귀포시 중앙로 10', (False, True, False)),
+    ('인천광역시 중구 공항동로 물류센터', (True, False, False)),
+    ('인천광역시 옹진군 백령면', (False, False, True)),
+    ('제주시 우도면 연평리', (False, True, True)),
+    ('전라남도 완도군 노화읍', (False, False, True)),
+    ('(63123) 어딘가 1', (False, True, False)),
+    ('[40210] 어딘가 1', (False, False, True)),
+    ('23100 어딘가', (False, False, True)),
+    # 우편번호가 아닌 괄호 속 숫자
+    ('서울 강남구 테헤란로 1 (402호)', (False, False, False)),
+    ('서울 어딘가 (231동 1102호)', (False, False, False)),
+    ('서울 어딘가 (5880번지)', (False, False, False)),
+    ('서울 영등포구 여의대로 (63빌딩)', (False, False, False)),
+    ('서울 어딘가 (631234)', (False, False, False)),
+    (None, (False, False, False)),
+])
+def test_known_addresses(address, expected):
+    assert classify_address(address) == expected
+    assert reference_classify(address) == expected
+
+def test_automaton_matches_reference_on_generated_addresses():
+    rng = np.random.default_rng(11)
+    parts = (NATIONAL_ADDRESSES + JEJU_ADDRESSES + REMOTE_ADDRESSES + [LOGISTICS_CENTER_ADDRESS]
+             + ['(', '[', ')', ' ', '63', '123', '4', '231', '402', '5880', '0', '호', '동', '제', '주', '군'])
+    addresses = [''.join(rng.choice(parts, rng.integers(0, 7))) for _ in range(3000)]
+
+    is_jeju, is_return, is_remote = classify_addresses(addresses)
+    assert not is_return.any()
+    for i, address in enumerate(addresses):
+        expected = reference_classify(address)
+        assert classify_address(address) == expected, address
+        assert (bool(is_jeju[i]), bool(is_remote[i])) == expected[1:], address
+
+def test_returns_use_the_sender_region():
+    is_jeju, is_return, is_remote = classify_addresses(
+        [LOGISTICS_CENTER_ADDRESS, LOGISTICS_CENTER_ADDRESS, LOGISTICS_CENTER_ADDRESS, '서울'],
+        ['제주 제주시 연동', '  ', '경상북도 울릉군 울릉읍', '제주'])
+    assert is_return.tolist() == [True, False, True, False]
+    assert is_jeju.tolist() == [True, False, False, False]
+    assert is_remote.tolist() == [False, False, True, False]
+
+def test_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(address_classifier, 'ADDRESS_CACHE_SIZE', 3)
+    classify_addresses(['a', 'b', 'c'])
+    classify_address('a')
+    classify_address('d')
+
+    assert list(address_classifier._cache) == ['c', 'a', 'd']
+    info = address_classifier.address_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 4, 3)
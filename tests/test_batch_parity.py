@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_invoice, make_rate_table, write_invoice_xlsx
+from invoice_io import read_invoice
+from verify_cost import process_files
+
+@pytest.fixture(scope='module')
+def rate_table():
+    return make_rate_table()
+
+@pytest.fixture(scope='module')
+def invoice_paths(tmp_path_factory, rate_table):
+    folder = tmp_path_factory.mktemp('invoices')
+    return [write_invoice_xlsx(str(folder / f"invoice(2025.{month:02d}).xlsx"),
+                               make_invoice(1500, rate_table=rate_table, seed=month, mismatch_share=0.05))
+            for month in (1, 2, 3)]
+
+def _results(summaries):
+    return [read_invoice(summary['result_file'])[0] for summary in summaries]
+
+def _counts(summaries):
+    return [(s['file'], s['rows'], s['mismatches'], s['error']) for s in summaries]
+
+def test_process_pool_matches_sequential(tmp_path, rate_table, invoice_paths):
+    sequential = process_files(invoice_paths, rate_table, jobs=1, results_dir=str(tmp_path / 'sequential'))
+    pooled = process_files(invoice_paths, rate_table, jobs=2, results_dir=str(tmp_path / 'pooled'))
+
+    assert _counts(pooled) == _counts(sequential)
+    assert all(s['error'] is None and s['mismatches'] > 0 for s in pooled)
+    for expected, actual in zip(_results(sequential), _results(pooled)):
+        pd.testing.assert_frame_equal(actual, expected)
+
+@pytest.mark.parametrize('chunk_size', [500, 1000000])
+def test_streaming_matches_in_memory(tmp_path, rate_table, invoice_paths, chunk_size):
+    in_memory = process_files(invoice_paths[:1], rate_table, results_dir=str(tmp_path / 'memory'))
+    streamed = process_files(invoice_paths[:1], rate_table, chunk_size=chunk_size,
+                             results_dir=str(tmp_path / 'stream'))
+
+    assert _counts(streamed) == _counts(in_memory)
+    pd.testing.assert_frame_equal(_results(streamed)[0], _results(in_memory)[0])
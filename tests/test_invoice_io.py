@@ -0,0 +1,133 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_invoice, make_rate_table, write_invoice_xlsx
+from invoice_io import (CSV_QUIET_SECONDS, is_complete_invoice, iter_invoice_chunks, open_invoice_writer,
+                        read_invoice, sniff_invoice, verified_file_name, write_invoice_frame)
+from verify_cost import process_file
+
+pytest.importorskip('pyarrow')
+
+def _plain(df):
+    # parquet 는 범주형 컬럼을 그대로 보존하므로 값만 비교
+    return df.apply(lambda column: column.astype(object) if isinstance(column.dtype, pd.CategoricalDtype) else column)
+
+@pytest.fixture(scope='module')
+def invoice():
+    return make_invoice(400, seed=5)
+
+@pytest.mark.parametrize('encoding', ['utf-8-sig', 'cp949'])
+def test_csv_round_trip(tmp_path, invoice, encoding):
+    path = str(tmp_path / 'invoice.csv')
+    invoice.to_csv(path, index=False, encoding=encoding)
+
+    df, sheet = read_invoice(path)
+    assert sheet is None
+    # csv 에서는 빈 발송주소가 NaN 으로 읽힘
+    pd.testing.assert_frame_equal(df.fillna({'발송주소': ''}), invoice, check_dtype=False)
+    assert sniff_invoice(path).missing == []
+    chunks = list(iter_invoice_chunks(path, chunk_size=150))
+    assert [len(chunk) for chunk in chunks] == [150, 150, 100]
+
+def test_parquet_round_trip_with_mixed_object_column(tmp_path, invoice):
+    df = invoice.copy()
+    df['규격'] = [1 if i % 3 == 0 else ('A' if i % 3 == 1 else None) for i in range(len(df))]
+    path = write_invoice_frame(df, str(tmp_path / 'mixed.parquet'))
+
+    back, _ = read_invoice(path)
+    assert back['규격'].iloc[:2].tolist() == ['1', 'A']
+    assert back['규격'].isna().iloc[2]
+    pd.testing.assert_frame_equal(back.drop(columns='규격'), df.drop(columns='규격'), check_dtype=False)
+    # 입력 프레임은 바뀌지 않음
+    assert df['규격'].iloc[0] == 1
+
+def test_streaming_parquet_writer_keeps_one_schema(tmp_path):
+    path = str(tmp_path / 'chunks.parquet')
+    with open_invoice_writer(path) as writer:
+        writer.write(pd.DataFrame({'규격': [1, 'B'], '메모': [None, None], 'n': [1, 2]}))
+        writer.write(pd.DataFrame({'규격': ['A', None], '메모': ['x', None], 'n': [3, 4]}))
+
+    back, _ = read_invoice(path)
+    assert back['n'].tolist() == [1, 2, 3, 4]
+    assert back['규격'].iloc[:3].tolist() == ['1', 'B', 'A']
+    assert back['메모'].iloc[2] == 'x'
+
+@pytest.mark.parametrize('input_suffix, output_format', [('.csv', 'parquet'), ('.parquet', 'csv'), ('.xlsx', 'parquet')])
+def test_verified_output_matches_xlsx_pipeline(tmp_path, input_suffix, output_format):
+    rate_table = make_rate_table()
+    invoice = make_invoice(300, rate_table=rate_table, mismatch_share=0.1, seed=9)
+    reference = process_file(write_invoice_xlsx(str(tmp_path / 'ref.xlsx'), invoice), rate_table,
+                             results_dir=str(tmp_path / 'ref'))
+
+    source = str(tmp_path / f"invoice{input_suffix}")
+    write_invoice_frame(invoice, source)
+    summary = process_file(source, rate_table, results_dir=str(tmp_path / 'out'), output_format=output_format)
+
+    assert summary['result_file'].endswith(verified_file_name(source, output_format))
+    assert (summary['rows'], summary['mismatches']) == (reference['rows'], reference['mismatches'])
+    expected, _ = read_invoice(reference['result_file'])
+    actual, _ = read_invoice(summary['result_file'])
+    pd.testing.assert_frame_equal(_plain(actual).fillna({'발송주소': ''}), _plain(expected).fillna({'발송주소': ''}),
+                                  check_dtype=False)
+
+def test_csv_is_complete_only_after_it_stopped_changing(tmp_path):
+    path = str(tmp_path / 'incoming.csv')
+    open(path, 'w', encoding='utf-8').close()
+    assert not is_complete_invoice(path, now=time.time() + CSV_QUIET_SECONDS + 1)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('운송장번호,무게\n1,2\n')
+    assert not is_complete_invoice(path)
+    assert is_complete_invoice(path, now=os.path.getmtime(path) + CSV_QUIET_SECONDS)
+
+def test_parquet_without_footer_is_incomplete(tmp_path, invoice):
+    path = write_invoice_frame(invoice, str(tmp_path / 'full.parquet'))
+    assert is_complete_invoice(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    truncated = str(tmp_path / 'partial.parquet')
+    with open(truncated, 'wb') as f:
+        f.write(data[:len(data) // 2])
+    assert not is_complete_invoice(truncated)
+
+@pytest.mark.parametrize('output_format', ['csv', 'parquet', 'xlsx'])
+def test_failed_streaming_run_leaves_no_result_file(tmp_path, monkeypatch, output_format):
+    import verify_cost
+    from verify_cost import process_file_streaming
+
+    rate_table = make_rate_table()
+    source = write_invoice_xlsx(str(tmp_path / 'a.xlsx'), make_invoice(700, rate_table=rate_table, seed=11))
+    verify_frame = verify_cost.verify_frame
+    calls = []
+    def failing_verify_frame(chunk, *args):
+        calls.append(len(chunk))
+        if len(calls) == 2:
+            raise RuntimeError('chunk 2 failed')
+        return verify_frame(chunk, *args)
+    monkeypatch.setattr(verify_cost, 'verify_frame', failing_verify_frame)
+
+    results_dir = tmp_path / 'results'
+    summary = process_file_streaming(source, rate_table, chunk_size=300, results_dir=str(results_dir),
+                                     output_format=output_format)
+    assert summary['error'] == 'chunk 2 failed'
+    assert os.listdir(results_dir) == []
+
+def test_xlsx_cells_without_reference_are_read(tmp_path, invoice):
+    import re
+    import zipfile
+
+    path = write_invoice_xlsx(str(tmp_path / 'full.xlsx'), invoice.head(20))
+    bare = str(tmp_path / 'bare.xlsx')
+    # 일부 내보내기 도구처럼 <c> 의 r 속성을 생략
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(bare, 'w') as target:
+        for item in source.infolist():
+            data = source.read(item)
+            if item.filename.startswith('xl/worksheets/'):
+                data = re.sub(rb'(<c[^>]*?) r="[A-Z]+\d+"', rb'\1', data)
+            target.writestr(item, data)
+
+    assert sniff_invoice(bare).header == sniff_invoice(path).header
+    pd.testing.assert_frame_equal(read_invoice(bare)[0], read_invoice(path)[0])
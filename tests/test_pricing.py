@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import make_invoice, make_rate_table
+from verify_cost import calculate_expected_cost, calculate_expected_costs
+
+@pytest.fixture(scope='module')
+def rate_table():
+    return make_rate_table()
+
+def test_vectorized_pricing_matches_scalar(rate_table):
+    invoice = make_invoice(3000, jeju_share=0.1, return_share=0.1, heavy_share=0.1, remote_share=0.05,
+                           rate_table=rate_table, seed=7)
+    expected, regions, remarks = calculate_expected_costs(
+        invoice['무게'], invoice['수취주소'], rate_table, sender_addresses=invoice['발송주소'])
+
+    for i, (weight, address, sender) in enumerate(zip(invoice['무게'], invoice['수취주소'], invoice['발송주소'])):
+        cost, region, remark = calculate_expected_cost(weight, address, rate_table, sender_address=sender or None)
+        assert (expected[i], regions[i], remarks[i]) == (cost, region, remark), (weight, address, sender)
+
+@pytest.mark.parametrize('weight, address, sender', [
+    (1, '서울특별시 강남구 테헤란로', None),
+    (30, '제주특별자치도 제주시 첨단로', None),
+    (30.1, '서울특별시 중구 세종대로', None),
+    (42, '제주 제주시 연동', None),
+    (3, '경상북도 울릉군 울릉읍 도동리', None),
+    (55, '제주특별자치도 제주시 우도면 연평리', None),
+    (5, '인천광역시 중구 공항동로 물류센터', '제주특별자치도 서귀포시 중앙로'),
+    (5, '인천광역시 중구 공항동로 물류센터', ''),
+])
+def test_edge_rows_match_scalar(rate_table, weight, address, sender):
+    expected, regions, remarks = calculate_expected_costs([weight], [address], rate_table, sender_addresses=[sender])
+    cost, region, remark = calculate_expected_cost(weight, address, rate_table, sender_address=sender or None)
+    assert (expected[0], regions[0], remarks[0]) == (cost, region, remark)
+
+def test_pricing_returns_aligned_arrays(rate_table):
+    expected, regions, remarks = calculate_expected_costs(np.array([1.0, 2.0]), ['서울', '제주'], rate_table)
+    assert len(expected) == len(regions) == len(remarks) == 2
+    assert list(regions) == ['전국', '제주']
+
+def test_workbook_without_remote_row_keeps_expected_costs(tmp_path, capsys):
+    from benchmarks.synthetic import write_rate_table_xlsx
+    from tariffs import load_rate_table
+
+    table = load_rate_table(write_rate_table_xlsx(str(tmp_path / 'rates.xlsx')))
+    assert table.remote_surcharge is None
+    assert '도서산간' in capsys.readouterr().out
+
+    addresses = ['경상북도 울릉군 울릉읍 도동리', '서울특별시 강남구 테헤란로', '제주특별자치도 제주시 우도면 연평리']
+    expected, regions, remarks = calculate_expected_costs([3, 3, 3], addresses, table)
+    assert list(regions) == ['도서산간', '전국', '제주 도서산간']
+    assert expected[0] == expected[1] == table.lookup(3, False)[0]
+    assert expected[2] == table.lookup(3, True)[0]
+    assert list(remarks) == ['Normal'] * 3
+
+def test_workbook_remote_row_sets_surcharge(tmp_path):
+    from benchmarks.synthetic import write_rate_table_xlsx
+    from tariffs import load_rate_table
+
+    table = load_rate_table(write_rate_table_xlsx(str(tmp_path / 'rates.xlsx'), remote_surcharge=(2500, 4000)))
+    assert table.remote_surcharge == (2500, 4000)
+    base = table.lookup(3, False)[0]
+    assert table.lookup(3, False, is_remote=True) == (base + 2500, "Remote (+2500)")
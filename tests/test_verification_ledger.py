@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import address_classifier
+from benchmarks.synthetic import make_invoice, make_rate_table
+from tariffs import RateTable
+from verification_ledger import VerificationLedger
+from verify_cost import calculate_expected_costs, calculate_expected_costs_incremental
+
+@pytest.fixture
+def ledger(tmp_path):
+    with VerificationLedger(str(tmp_path / 'ledger.sqlite')) as ledger:
+        yield ledger
+
+@pytest.fixture(scope='module')
+def invoice():
+    return make_invoice(800, jeju_share=0.1, return_share=0.1, remote_share=0.05, seed=3)
+
+def _price(invoice, rate_table, ledger):
+    return calculate_expected_costs_incremental(invoice['운송장번호'], invoice['무게'], invoice['수취주소'],
+                                                rate_table, ledger, sender_addresses=invoice['발송주소'])
+
+def test_second_run_reuses_every_row(ledger, invoice):
+    rate_table = make_rate_table()
+    first = _price(invoice, rate_table, ledger)
+    second = _price(invoice, rate_table, ledger)
+
+    assert first[3] == 0
+    assert second[3] == len(invoice)
+    expected, regions, remarks = calculate_expected_costs(invoice['무게'], invoice['수취주소'], rate_table,
+                                                          sender_addresses=invoice['발송주소'])
+    for got in (first, second):
+        np.testing.assert_array_equal(got[0], expected)
+        assert list(got[1]) == list(regions)
+        assert list(got[2]) == list(remarks)
+
+def test_changed_rows_are_repriced(ledger, invoice):
+    rate_table = make_rate_table()
+    _price(invoice, rate_table, ledger)
+    changed = invoice.copy()
+    changed.loc[:9, '무게'] = changed.loc[:9, '무게'] + 10
+
+    expected, _, _, reused = _price(changed, rate_table, ledger)
+    assert reused == len(invoice) - 10
+    np.testing.assert_array_equal(expected, calculate_expected_costs(
+        changed['무게'], changed['수취주소'], rate_table, sender_addresses=changed['발송주소'])[0])
+
+def test_new_rate_table_is_not_reused(ledger, invoice):
+    rate_table = make_rate_table()
+    _price(invoice, rate_table, ledger)
+    cheaper = RateTable(rate_table.limits, [p - 100 for p in rate_table.prices[0]], rate_table.prices[1])
+
+    expected, _, _, reused = _price(invoice, cheaper, ledger)
+    assert reused == 0
+    np.testing.assert_array_equal(expected, calculate_expected_costs(
+        invoice['무게'], invoice['수취주소'], cheaper, sender_addresses=invoice['발송주소'])[0])
+
+def test_classifier_rule_change_is_not_reused(ledger, invoice, monkeypatch):
+    rate_table = make_rate_table()
+    _price(invoice, rate_table, ledger)
+    monkeypatch.setattr(address_classifier, '_RULES_VERSION', 'changed-rules')
+
+    assert _price(invoice, rate_table, ledger)[3] == 0
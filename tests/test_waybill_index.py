@@ -0,0 +1,99 @@
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_invoice, make_rate_table, write_invoice_xlsx
+from verify_cost import DUPLICATE_STATUS, perform_verification, process_files
+from waybill_index import WaybillIndex, normalize_waybills, source_key
+
+@pytest.fixture
+def index_path(tmp_path):
+    return str(tmp_path / 'waybill_index.sqlite')
+
+def test_normalize_waybills():
+    assert normalize_waybills([123.0, ' 456 ', '', None, float('nan'), 'A-1']) == ['123', '456', None, None, None, 'A-1']
+
+def test_source_key_ignores_folder_extension_and_verified_prefix():
+    assert source_key('/x/input/a(2025.10).xlsx') == source_key('verified_a(2025.10).parquet') == 'a(2025.10)'
+    assert source_key('verified_a(2025.10)_20251103_142501.xlsx') == 'a(2025.10)'
+    assert source_key('verified_a(2025.10)_20251103_142501_2.csv') == 'a(2025.10)'
+
+def test_flags_waybills_billed_in_another_file(index_path):
+    with WaybillIndex(index_path) as index:
+        assert not index.check_and_add(['1', '2', '3'], 'TFSK', '택배', 'a(2025.10).xlsx').any()
+        assert index.check_and_add(['3', '4'], 'TFSK', '택배', 'b(2025.11).xlsx').tolist() == [True, False]
+        # 다른 법인에서 청구된 운송장도 중복
+        assert index.check_and_add([4, None], 'FSK', '택배', 'c(2025.11).csv').tolist() == [True, False]
+        assert [row[0] for row in index.sources('3')] == ['TFSK', 'TFSK']
+
+def test_same_file_is_not_a_duplicate_of_itself(index_path):
+    with WaybillIndex(index_path) as index:
+        index.check_and_add(['1', '2'], 'TFSK', '택배', 'a(2025.10).xlsx')
+        assert not index.check_and_add(['1', '2'], 'TFSK', '택배', 'a(2025.10).xlsx').any()
+        assert not index.check_and_add(['1', '2'], 'TFSK', '택배', 'verified_a(2025.10).parquet').any()
+
+def test_second_connection_sees_new_waybills(index_path):
+    first, second = WaybillIndex(index_path), WaybillIndex(index_path)
+    try:
+        first.check_and_add(['1'], 'TFSK', '택배', 'a.xlsx')  # second 의 블룸 필터는 이 시점 이전 상태
+        second.check_and_add(['9'], 'TFSK', '택배', 'z.xlsx')
+        first.check_and_add(['2'], 'TFSK', '택배', 'b.xlsx')
+        assert second.check_and_add(['1', '2', '3'], 'TFSK', '택배', 'c.xlsx').tolist() == [True, True, False]
+    finally:
+        first.close()
+        second.close()
+
+def test_bloom_filter_is_saved_only_when_it_changed(index_path):
+    with WaybillIndex(index_path) as index:
+        index.check_and_add(['1', '2'], 'TFSK', '택배', 'a.xlsx')
+    saved = os.path.getmtime(f"{index_path}.bloom")
+    os.utime(f"{index_path}.bloom", (saved - 100, saved - 100))
+
+    with WaybillIndex(index_path) as index:
+        assert index.check_and_add(['1'], 'TFSK', '택배', 'b.xlsx').tolist() == [True]
+    assert os.path.getmtime(f"{index_path}.bloom") == saved - 100
+
+def test_saved_bloom_filter_grows_past_its_capacity(index_path, monkeypatch):
+    import waybill_index
+    monkeypatch.setattr(waybill_index, 'BLOOM_CAPACITY', 8)
+    with WaybillIndex(index_path) as index:
+        index.check_and_add([str(i) for i in range(5)], 'TFSK', '택배', 'a.xlsx')
+        assert index._bloom.capacity == 8
+
+    with WaybillIndex(index_path) as index:
+        duplicates = index.check_and_add([str(i) for i in range(40)], 'TFSK', '택배', 'b.xlsx')
+        assert duplicates.tolist() == [True] * 5 + [False] * 35
+        assert index._bloom.capacity >= 2 * 45
+        assert index._bloom.count == 40
+
+    # 더 크게 만든 필터가 저장되어 다음 연결에서 그대로 쓰임
+    with WaybillIndex(index_path) as index:
+        assert index.check_and_add(['39', 'new'], 'TFSK', '택배', 'c.xlsx').tolist() == [True, False]
+        assert index._bloom.capacity >= 2 * 45
+
+def test_perform_verification_marks_duplicates(index_path):
+    rate_table = make_rate_table()
+    invoice = make_invoice(200, rate_table=rate_table, mismatch_share=0.2)
+    with WaybillIndex(index_path) as index:
+        first, _ = perform_verification(invoice.copy(), rate_table, 'TFSK', waybill_index=index,
+                                        service='택배', source_file='a(2025.10).xlsx')
+        second, _ = perform_verification(pd.concat([invoice.head(50), invoice.head(50)]).reset_index(drop=True),
+                                         rate_table, 'TFSK', waybill_index=index, service='택배',
+                                         source_file='b(2025.11).xlsx')
+
+    assert not (first['결과'] == DUPLICATE_STATUS).any()
+    assert (second['결과'] == DUPLICATE_STATUS).all()
+
+def test_batch_summary_counts_mismatches_by_status(tmp_path, index_path):
+    rate_table = make_rate_table()
+    invoice = make_invoice(300, rate_table=rate_table, mismatch_share=0.2)
+    paths = [write_invoice_xlsx(str(tmp_path / name), invoice) for name in ('a(2025.10).xlsx', 'b(2025.11).xlsx')]
+
+    first, second = process_files(paths, rate_table, results_dir=str(tmp_path / 'results'),
+                                  waybill_index_path=index_path)
+    assert first['mismatches'] > 0
+    # 두 번째 파일은 모두 중복 청구이므로 불일치로 세지 않음
+    assert second['mismatches'] == 0
+    # 배치가 끝나면 색인이 닫히고 블룸 필터가 저장됨
+    assert os.path.exists(f"{index_path}.bloom")
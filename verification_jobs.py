@@ -0,0 +1,415 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from entity_folders import build_unique_target_path
+from verify_cost import perform_verification, DUPLICATE_STATUS, MISMATCH_STATUS
+from verification_ledger import VerificationLedger
+from waybill_index import WaybillIndex
+from results_warehouse import ResultsWarehouse
+from run_metrics import RunTimer, append_run_log, frame_bytes_per_row
+from invoice_io import DEFAULT_OUTPUT_FORMAT, read_invoice, write_invoice_frame, stream_verify_file, verified_file_name
+from invoice_cache import store_cached_frame
+from batch_pipeline import PipelineStage, run_pipeline, DEFAULT_QUEUE_SIZE
+
+# Streamlit 화면과 분리된 백그라운드 검증 작업 (서버 프로세스 하나가 작업 풀을 소유)
+# 세션은 작업 ID만 들고 있다가 리런마다 진행 상황을 조회함
+DEFAULT_JOB_WORKERS = 2
+MAX_FINISHED_JOBS = 50
+# 일괄 처리 파이프라인 단계별 스레드 수 (읽기/이동은 OneDrive I/O, 검증은 CPU)
+READER_WORKERS = 1
+PRICING_WORKERS = 1
+WRITER_WORKERS = 1
+
+class VerificationJob:
+    """One multi-file verification batch; mirrors the app's former in-request loop.
+
+    All state a page needs (progress, messages, last result, run records) is
+    kept on the job, so it survives browser refreshes and other reruns.
+    Files go through read -> price -> write/move stages connected by bounded
+    queues, so reading the next file overlaps with pricing the current one.
+    """
+
+    def __init__(self, files, entity, service, folders, rate_map, rate_mtime,
+                 use_streaming=False, use_incremental=False, use_profiling=False, use_waybill_index=True,
+                 output_format=DEFAULT_OUTPUT_FORMAT, reader_workers=READER_WORKERS, pricing_workers=PRICING_WORKERS,
+                 writer_workers=WRITER_WORKERS, queue_size=DEFAULT_QUEUE_SIZE):
+        self.id = uuid.uuid4().hex[:12]
+        self.files = list(files)
+        self.entity = entity
+        self.service = service
+        self.folders = folders
+        self.rate_map = rate_map
+        self.rate_mtime = rate_mtime
+        self.use_streaming = use_streaming
+        self.use_incremental = use_incremental
+        self.use_profiling = use_profiling
+        self.use_waybill_index = use_waybill_index
+        self.output_format = output_format
+        self.reader_workers = reader_workers
+        self.pricing_workers = pricing_workers
+        self.writer_workers = writer_workers
+        self.queue_size = queue_size
+
+        self.status = 'queued'
+        self.current_file = None
+        self.files_done = 0
+        self.rows_done = 0
+        self.success_count = 0
+        self.fail_count = 0
+        self.moved_count = 0
+        self.messages = []      # (level, text) - level 은 st.info/st.error/st.warning 이름
+        self.previews = []      # (파일명, 요약, 상위 5행)
+        self.perf_records = []
+        self.duplicate_count = 0
+        self.result = None      # 마지막 성공 파일: (final_df, 표시 이름, verified 경로) - 화면에 넘긴 뒤에는 frame 을 버림
+        self.created_at = datetime.now()
+        self.started = None
+        self.finished = None
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._sizes = {f: self._file_size(f) for f in self.files}
+        self._bytes_total = sum(self._sizes.values())
+        self._bytes_done = 0
+
+    def _file_size(self, filename):
+        try:
+            return os.path.getsize(os.path.join(self.folders['input'], filename))
+        except OSError:
+            return 0
+
+    def log(self, level, text):
+        with self._lock:
+            self.messages.append((level, text))
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
+
+    def take_result(self):
+        """Returns the last result and keeps only its name and verified path on the job.
+
+        Finished jobs stay listed for reconnecting pages, so the full frame
+        is not held once a page has it; later callers get final_df None.
+        """
+        with self._lock:
+            result = self.result
+            if result is not None:
+                self.result = (None,) + result[1:]
+            return result
+
+    def progress(self):
+        """Snapshot for the page: files done, rows/sec and an ETA weighted by file size."""
+        with self._lock:
+            elapsed = ((self.finished or time.perf_counter()) - self.started) if self.started else 0.0
+            eta = None
+            if self.started and not self.is_finished and self._bytes_done > 0:
+                eta = elapsed * (self._bytes_total - self._bytes_done) / self._bytes_done
+            return {
+                'status': self.status,
+                'files_done': self.files_done,
+                'files_total': len(self.files),
+                'current_file': self.current_file,
+                'rows_done': self.rows_done,
+                'rows_per_sec': self.rows_done / elapsed if elapsed > 0 else 0.0,
+                'elapsed_seconds': elapsed,
+                'eta_seconds': eta,
+                'fraction': self.files_done / len(self.files) if self.files else 1.0,
+            }
+
+    def run(self):
+        self.started = time.perf_counter()
+        self.status = 'running'
+        try:
+            if self.use_streaming or self.use_profiling:
+                # 스트리밍은 자체적으로 청크 단위 처리, 프로파일링은 한 스레드에서만 측정 가능 → 순차 실행
+                self._run_sequential()
+            else:
+                self._run_pipelined()
+            self.status = 'done'
+        except Exception as e:
+            self.log('error', f"❌ 작업 중단: {e}")
+            self.status = 'failed'
+        finally:
+            with self._lock:
+                self.current_file = None
+                self.finished = time.perf_counter()
+
+    def _run_sequential(self):
+        try:
+            for filename in self.files:
+                with self._lock:
+                    self.current_file = filename
+                if self.use_streaming:
+                    self._stream_one(filename)
+                    continue
+                item = self._read_stage(filename)
+                item = item and self._price_stage(item)
+                if item:
+                    self._write_stage(item)
+        finally:
+            self._close_thread_ledger()
+            self._close_thread_index()
+
+    def _run_pipelined(self):
+        # 파일 N+1 읽기와 파일 N 검증, 파일 N-1 저장/이동이 동시에 진행됨
+        run_pipeline(self.files, [
+            PipelineStage('read', self._read_stage, self.reader_workers),
+            PipelineStage('price', self._price_stage, self.pricing_workers, on_exit=self._close_thread_connections),
+            PipelineStage('write', self._write_stage, self.writer_workers),
+        ], queue_size=self.queue_size)
+
+    # 증분 원장(SQLite)은 스레드마다 따로 연결 (sqlite3 연결은 만든 스레드에서만 사용 가능)
+    def _thread_ledger(self):
+        if not self.use_incremental:
+            return None
+        ledger = getattr(self._local, 'ledger', None)
+        if ledger is None:
+            ledger = self._local.ledger = VerificationLedger()
+        return ledger
+
+    def _close_thread_ledger(self):
+        ledger = getattr(self._local, 'ledger', None)
+        if ledger is not None:
+            ledger.close()
+            self._local.ledger = None
+
+    # 운송장 색인도 같은 이유로 스레드별 연결 (색인을 열 수 없으면 중복 검사 없이 진행)
+    def _thread_index(self):
+        if not self.use_waybill_index:
+            return None
+        index = getattr(self._local, 'waybill_index', None)
+        if index is None:
+            try:
+                index = self._local.waybill_index = WaybillIndex()
+            except Exception as e:
+                self.log('warning', f"⚠️ 운송장 색인 사용 불가: {e}")
+                self.use_waybill_index = False
+        return index
+
+    def _close_thread_index(self):
+        index = getattr(self._local, 'waybill_index', None)
+        if index is not None:
+            index.close()
+            self._local.waybill_index = None
+
+    def _close_thread_connections(self):
+        self._close_thread_ledger()
+        self._close_thread_index()
+
+    def _new_timer(self, filename):
+        # 단계별 소요 시간 계측 (선택 시 cProfile/tracemalloc 포함)
+        return RunTimer(filename, profile=self.use_profiling, trace_memory=self.use_profiling,
+                        mode='streamlit', entity=self.entity, service=self.service, job=self.id)
+
+    def _file_finished(self, item):
+        perf_record = item['timer'].finish(**item['stats'])
+        append_run_log(perf_record)
+        with self._lock:
+            self.perf_records.append(perf_record)
+            self.files_done += 1
+            self._bytes_done += self._sizes[item['filename']]
+
+    def _file_failed(self, item, message, error):
+        self.log('error', message)
+        item['stats']['error'] = error
+        with self._lock:
+            self.fail_count += 1
+        self._file_finished(item)
+
+    def _read_stage(self, filename):
+        item = {
+            'filename': filename,
+            'path': os.path.join(self.folders['input'], filename),
+            'timer': self._new_timer(filename),
+            'stats': {'rows': 0, 'mismatches': 0, 'error': None},
+        }
+        try:
+            # [잠금 방지] 원본을 한 번만 메모리로 읽어 파싱 (임시 파일 복사 없음, 잠겨 있으면 재시도)
+            with item['timer'].stage('read') as stage:
+                df, _ = read_invoice(item['path'])
+                stage['rows'] = len(df)
+        except Exception as e:
+            self._file_failed(item, f"❌ 파일 읽기 실패: {e}", f"read failed: {e}")
+            return None
+
+        try:
+            # [디버깅] 파일 정보 및 데이터 확인
+            file_mtime = datetime.fromtimestamp(os.path.getmtime(item['path'])).strftime('%Y-%m-%d %H:%M:%S')
+            self.log('info', f"📂 **파일 읽기 성공**: `{filename}`\n\n🕒 **마지막 수정 시간**: {file_mtime}")
+            summary = f"총 {len(df)}행, '발송금액' 합계: {df['발송금액'].sum() if '발송금액' in df.columns else 'N/A'}"
+        except Exception as e:
+            self._file_failed(item, f"❌ [{filename}] 처리 중 오류: {e}", str(e))
+            return None
+        with self._lock:
+            self.previews.append((filename, summary, df.head()))
+        item['df'] = df
+        return item
+
+    def _price_stage(self, item):
+        filename = item['filename']
+        with self._lock:
+            self.current_file = filename
+        try:
+            # === 검증 로직 수행 ===
+            with item['timer'].stage('verify', rows=len(item['df'])):
+                final_df, error_msg = perform_verification(item.pop('df'), self.rate_map, self.entity,
+                                                           self._thread_ledger(), self._thread_index(),
+                                                           self.service, filename)
+        except Exception as e:
+            self._file_failed(item, f"❌ [{filename}] 처리 중 오류: {e}", str(e))
+            return None
+        if error_msg:
+            self._file_failed(item, f"❌ [{filename}] {error_msg}", error_msg)
+            return None
+
+        duplicates = int((final_df['결과'] == DUPLICATE_STATUS).sum())
+        item['stats'].update(rows=len(final_df), mismatches=int((final_df['결과'] == MISMATCH_STATUS).sum()),
+                             duplicates=duplicates, bytes_per_row=frame_bytes_per_row(final_df))
+        if duplicates:
+            self.log('warning', f"⚠️ [{filename}] 다른 파일에서 이미 청구된 운송장 {duplicates}건")
+        item['final_df'] = final_df
+        item['display_name'] = f"[{self.entity}] {filename} (최근 처리됨)"
+        with self._lock:
+            self.success_count += 1
+            self.duplicate_count += duplicates
+            self.rows_done += len(final_df)
+            self.result = (final_df, item['display_name'], None)
+        return item
+
+    def _write_stage(self, item):
+        filename = item['filename']
+        final_df = item['final_df']
+        timer = item['timer']
+        # === 파일 이동 로직 (Verified 폴더) ===
+        try:
+            verified_target_path = build_unique_target_path(self.folders['verified'],
+                                                            verified_file_name(filename, self.output_format))
+            output_target_path = build_unique_target_path(self.folders['output'], filename)
+            with timer.stage('write', rows=len(final_df)):
+                write_invoice_frame(final_df, verified_target_path)
+            with self._lock:
+                self.result = (final_df, item['display_name'], verified_target_path)
+            with timer.stage('move'):
+                shutil.move(item['path'], output_target_path)
+            with self._lock:
+                self.moved_count += 1
+            # 이력 보기에서 바로 쓸 수 있도록 검증 결과를 캐시에 저장
+            with timer.stage('cache', rows=len(final_df)):
+                try:
+                    store_cached_frame(verified_target_path, final_df, self.rate_mtime, f"verified|{self.entity}")
+                except Exception:
+                    pass
+            with timer.stage('warehouse', rows=len(final_df)):
+                self._record_in_warehouse(final_df, filename)
+        except Exception as e:
+            self._file_failed(item, f"파일 저장 또는 이동 실패: {e}", f"save/move failed: {e}")
+            return None
+        self._file_finished(item)
+        return None
+
+    def _stream_one(self, filename):
+        item = {
+            'filename': filename,
+            'path': os.path.join(self.folders['input'], filename),
+            'timer': self._new_timer(filename),
+            'stats': {'rows': 0, 'mismatches': 0, 'error': None},
+        }
+        try:
+            self._stream_file(filename, item['path'], self._thread_ledger(), item['timer'], item['stats'])
+        except Exception as e:
+            self._file_failed(item, f"❌ [{filename}] 처리 중 오류: {e}", str(e))
+            return
+        self._file_finished(item)
+
+    def _stream_file(self, filename, file_path, ledger, timer, file_stats):
+        # 대용량 파일은 청크 단위로 읽고 써서 메모리 사용량을 일정하게 유지
+        verified_target_path = build_unique_target_path(self.folders['verified'],
+                                                        verified_file_name(filename, self.output_format))
+        output_target_path = build_unique_target_path(self.folders['output'], filename)
+        stream_stats = {'mismatches': 0}
+        warehouse, run_id = self._open_warehouse_run(filename)
+
+        def verify_chunk(chunk):
+            verified_chunk, chunk_error = perform_verification(chunk, self.rate_map, self.entity, ledger,
+                                                               self._thread_index(), self.service, filename)
+            if chunk_error:
+                raise ValueError(chunk_error)
+            stream_stats['mismatches'] += int((verified_chunk['결과'] == MISMATCH_STATUS).sum())
+            if warehouse is not None:
+                warehouse.add_rows(run_id, verified_chunk)
+            with self._lock:
+                self.rows_done += len(verified_chunk)
+            return verified_chunk
+
+        try:
+            with timer.stage('stream') as stage:
+                row_count = stream_verify_file(file_path, verified_target_path, verify_chunk)
+                stage['rows'] = row_count
+        finally:
+            if warehouse is not None:
+                warehouse.close()
+        with timer.stage('move'):
+            shutil.move(file_path, output_target_path)
+        file_stats.update(rows=row_count, mismatches=stream_stats['mismatches'])
+        with self._lock:
+            self.success_count += 1
+            self.moved_count += 1
+        self.log('info', f"📄 [{filename}] 스트리밍 검증 완료: {row_count}행, 불일치 {stream_stats['mismatches']}건")
+
+    # 결과 저장소(SQLite) 기록 - 실패해도 검증 자체는 계속 진행하고 경고만 남김
+    def _open_warehouse_run(self, filename):
+        try:
+            warehouse = ResultsWarehouse()
+            return warehouse, warehouse.begin_run(self.entity, self.service, filename,
+                                                  weight_limits=self.rate_map.limits)
+        except Exception as e:
+            self.log('warning', f"⚠️ 결과 저장소 기록 실패: {e}")
+            return None, None
+
+    def _record_in_warehouse(self, final_df, filename):
+        warehouse, run_id = self._open_warehouse_run(filename)
+        if warehouse is None:
+            return
+        try:
+            warehouse.add_rows(run_id, final_df)
+        except Exception as e:
+            self.log('warning', f"⚠️ 결과 저장소 기록 실패: {e}")
+        finally:
+            warehouse.close()
+
+class JobManager:
+    """Server-wide thread pool running VerificationJobs; sessions look jobs up by id."""
+
+    def __init__(self, max_workers=DEFAULT_JOB_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='verify-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job):
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        job.future = self._pool.submit(job.run)
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_jobs(self, service=None, entity=None):
+        """Running or queued jobs, oldest first; optionally only those of one service/entity."""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if not job.is_finished
+                    and (service is None or job.service == service) and (entity is None or job.entity == entity)]
+        return sorted(jobs, key=lambda job: job.created_at)
+
+    def _prune(self):
+        finished = sorted((j for j in self._jobs.values() if j.is_finished), key=lambda j: j.created_at)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
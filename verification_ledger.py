@@ -0,0 +1,78 @@
+import os
+import sqlite3
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# 운송장 단위 검증 결과 원장 (증분 검증용)
+LEDGER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'verification_ledger.sqlite')
+
+def row_keys(waybills, weights, addresses, sender_addresses=None):
+    """Hashes (운송장번호, 무게, 수취주소, 발송주소) per row into a signed 64-bit key.
+
+    A row whose key is already in the ledger for the same rate-table version
+    (and address classification rules) does not need to be priced again.
+    """
+    frame = pd.DataFrame({
+        'waybill': pd.Series(waybills, dtype=object).reset_index(drop=True),
+        'weight': pd.to_numeric(pd.Series(weights).reset_index(drop=True), errors='coerce'),
+        'address': pd.Series(addresses, dtype=object).reset_index(drop=True),
+    })
+    if sender_addresses is not None:
+        frame['sender'] = pd.Series(sender_addresses, dtype=object).reset_index(drop=True)
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy().view(np.int64)
+
+class VerificationLedger:
+    """SQLite-backed map of row key -> (예상운임, 지역구분, 비고) per rate-table/classifier version."""
+
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ledger ("
+            " row_key INTEGER PRIMARY KEY,"
+            " waybill TEXT,"
+            " rate_version TEXT NOT NULL,"
+            " expected INTEGER NOT NULL,"
+            " region TEXT NOT NULL,"
+            " remark TEXT NOT NULL,"
+            " updated_at TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_ledger_waybill ON ledger(waybill)")
+        self.conn.commit()
+
+    def lookup(self, keys, rate_version):
+        """Returns a DataFrame aligned with keys; rows not in the ledger have NaN expected."""
+        cur = self.conn.cursor()
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_keys (row_key INTEGER PRIMARY KEY)")
+        cur.execute("DELETE FROM lookup_keys")
+        cur.executemany("INSERT OR IGNORE INTO lookup_keys VALUES (?)", ((int(k),) for k in keys))
+        rows = cur.execute(
+            "SELECT l.row_key, l.expected, l.region, l.remark FROM ledger l"
+            " JOIN lookup_keys k ON k.row_key = l.row_key WHERE l.rate_version = ?",
+            (rate_version,)
+        ).fetchall()
+        # 읽기 트랜잭션을 바로 끝내야 다른 프로세스의 기록과 충돌하지 않음
+        self.conn.commit()
+        found = pd.DataFrame(rows, columns=['row_key', 'expected', 'region', 'remark']).set_index('row_key')
+        return found.reindex(pd.Index(keys, name='row_key'))
+
+    def record(self, keys, waybills, rate_version, expected, regions, remarks):
+        now = datetime.now().isoformat(timespec='seconds')
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO ledger VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((int(k), None if pd.isna(w) else str(w), rate_version, int(e), str(r), str(m), now)
+             for k, w, e, r, m in zip(keys, waybills, expected, regions, remarks))
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -1,200 +1,569 @@
 import pandas as pd
 import numpy as np
 import os
-import math
+import threading
+import time
+from multiprocessing.util import Finalize
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from excel_loader import DETAIL_SHEET
+from xlsx_stream import DEFAULT_CHUNK_SIZE
+from invoice_io import (DEFAULT_OUTPUT_FORMAT, is_invoice_file, read_invoice,
+                        write_invoice_frame, stream_verify_file, verified_file_name)
+from invoice_schema import resolve_columns, missing_columns
+from verification_ledger import VerificationLedger, row_keys, LEDGER_PATH
+from results_warehouse import ResultsWarehouse, WAREHOUSE_PATH, infer_month
+from waybill_index import WaybillIndex, WAYBILL_INDEX_PATH
+from run_metrics import RunTimer, append_run_log, format_stages, frame_bytes_per_row, RUN_LOG_PATH
+from address_classifier import (classify_address, classify_addresses, classifier_version, region_label, region_labels,
+                                address_cache_info)
+from tariffs import RateTable, compile_rate_table, load_rate_table, TARIFFS
+from entity_folders import BASE_DIR, RATE_FILE_NAME
 
 # === 설정 ===
 # 사용자 요청에 따라 데이터 경로 변경 (2025-02-19)
-DATA_DIR = r'C:\Users\yunh1\OneDrive - Thermo Fisher Scientific\비용 검증 프로그램\택배'
-RESULTS_DIR = 'results' # (사용 안함)
-RATE_FILE = os.path.join(DATA_DIR, '운송요금_운임표.xlsx')
+# 기본값은 <BASE_DIR>\택배, 환경 변수 DELIVERY_VERIFIER_DATA_DIR 또는 --data-dir 로 변경
+DATA_DIR = os.environ.get('DELIVERY_VERIFIER_DATA_DIR') or os.path.join(BASE_DIR, '택배')
+RESULTS_DIR = 'results'
+RATE_FILE = os.path.join(DATA_DIR, RATE_FILE_NAME)
 
 DEBUG_LOG = False
 
+# 결과 컬럼 저장 형식: 라벨(법인/지역구분/결과/비고)은 category, 금액은 정수
+MATCH_STATUS = "✅ 일치"
+MISMATCH_STATUS = "❌ 불일치"
+# 다른 파일(다른 월/법인)에서 이미 청구된 운송장 - 금액 일치 여부보다 우선
+DUPLICATE_STATUS = "⚠️ 중복 청구"
+RESULT_STATUSES = (MATCH_STATUS, MISMATCH_STATUS, DUPLICATE_STATUS)
+
 def _debug(message):
     if DEBUG_LOG:
         print(message)
 
-def load_rate_table(file_path=RATE_FILE):
-    """Parses the rate table to extract bracket limits and prices."""
-    # Load with header at row 1 (0-indexed)
-    df = pd.read_excel(file_path, header=1)
-    
-    # Extract relevant rows (those with weight info)
-    # Looking for rows where '무게,세변의 합' is not null and contains 'kg'
-    rate_map = []
-    
-    for index, row in df.iterrows():
-        weight_str = str(row['무게,세변의 합'])
-        if 'kg' in weight_str:
-            # Extract weight limit (e.g., "5kg / 80cm" -> 5)
-            try:
-                limit = int(weight_str.split('kg')[0].strip())
-                national_price = int(row['운임'])
-                jeju_price = int(row['Unnamed: 3'])
-                rate_map.append({
-                    'limit': limit,
-                    'national': national_price,
-                    'jeju': jeju_price
-                })
-            except (ValueError, IndexError):
-                continue
-                
-    return sorted(rate_map, key=lambda x: x['limit'])
-
 def calculate_expected_cost(weight, address, rate_map, sender_address=None):
     """Calculates expected cost based on weight and address.
     
     If address (receiver) is a logistics center (Incheon Jung-gu),
     use sender_address to determine if it's Jeju/Remote.
     """
-    # 1. Determine Region
-    target_address = str(address)
+    # 1. Determine Region (cached per distinct address)
+    is_center, is_jeju, is_remote = classify_address(address)
     region_source = "Receiver"
     
     # Check if receiver is logistics center (Incheon Jung-gu)
-    # Remove spaces for robust matching
-    target_addr_clean = target_address.replace(' ', '')
-    if '인천' in target_addr_clean and '중구' in target_addr_clean and sender_address:
-        _debug(f"DEBUG: Logistics Center Detected. Receiver: {target_address}, Sender: {sender_address}")
-        target_address = str(sender_address)
+    if is_center and sender_address:
+        _debug(f"DEBUG: Logistics Center Detected. Receiver: {address}, Sender: {sender_address}")
+        _, is_jeju, is_remote = classify_address(sender_address)
         region_source = "Sender (Return)"
-    else:
-        if '인천' in target_address:
-            _debug(f"DEBUG: Incheon detected but criteria not met. Addr: {target_address}, Sender: {bool(sender_address)}")
+    elif DEBUG_LOG and '인천' in str(address):
+        _debug(f"DEBUG: Incheon detected but criteria not met. Addr: {address}, Sender: {bool(sender_address)}")
 
-    is_jeju = '제주' in target_address
-    region_type = '제주' if is_jeju else '전국'
+    region_type = region_label(is_jeju, is_remote, region_source == "Sender (Return)")
     if region_source == "Sender (Return)":
-        region_type += " (반품)"
         _debug(f"DEBUG: Region set to Return. Type: {region_type}")
     
-    # 2. Base Cost Calculation
-    base_cost = 0
-    
-    # Find the applicable bracket
-    applicable_bracket = None
-    for bracket in rate_map:
-        if weight <= bracket['limit']:
-            applicable_bracket = bracket
-            break
-            
-    # If explicitly found in brackets (<= 30kg usually)
-    if applicable_bracket:
-        base_cost = applicable_bracket['jeju'] if is_jeju else applicable_bracket['national']
-        return base_cost, region_type, "Normal"
-        
-    # 3. Surcharge Calculation (> 30kg)
-    # Use the largest bracket as base (should be 30kg)
-    max_bracket = rate_map[-1]
-    base_cost = max_bracket['jeju'] if is_jeju else max_bracket['national']
-    
-    extra_weight = weight - max_bracket['limit']
-    if extra_weight > 0:
-        # Per 5kg chunk
-        unit_5kg = 2000 if not is_jeju else 3000
-        extra_units = math.ceil(extra_weight / 5)
-        surcharge = extra_units * unit_5kg
-        total_cost = base_cost + surcharge
-        return total_cost, region_type, f"Surcharge (+{surcharge})"
+    # 2. Base Cost Calculation (bisect on the compiled brackets)
+    # 3. Surcharge Calculation (> 30kg, 도서산간) is handled by the rate table as well
+    cost, remark = compile_rate_table(rate_map).lookup(weight, is_jeju, is_remote)
+    return cost, region_type, remark
+
+def calculate_expected_costs(weights, addresses, rate_map, sender_addresses=None):
+    """Vectorized calculate_expected_cost for whole columns.
+
+    Returns (expected_costs, region_types, remarks) as NumPy arrays aligned
+    with the input rows. Sender addresses that are missing or blank are
+    ignored, the same way perform_verification filters them per row.
+    """
+    weights = pd.to_numeric(pd.Series(weights).reset_index(drop=True), errors='coerce').to_numpy(dtype=float)
+
+    # 1. Determine Region (each distinct address is classified once)
+    if addresses is None:
+        addresses = [None] * len(weights)
+    is_jeju, is_return, is_remote = classify_addresses(addresses, sender_addresses)
+    region_types = region_labels(is_jeju, is_remote, is_return)
+
+    # 2. Base Cost + 3. Surcharge Calculation (도서산간 추가 운임 포함)
+    expected, remarks = compile_rate_table(rate_map).lookup_many(weights, is_jeju, is_remote)
+
+    return expected, region_types, remarks
+
+def calculate_expected_costs_incremental(waybills, weights, addresses, rate_map, ledger, sender_addresses=None):
+    """calculate_expected_costs backed by a VerificationLedger.
+
+    Rows whose (운송장번호, 무게, 수취주소, 발송주소) were already priced with the
+    same rate-table version and address rules are taken from the ledger; only
+    new or changed rows are priced and recorded. Returns (expected, regions,
+    remarks, reused).
+    """
+    rate_table = compile_rate_table(rate_map)
+    # 운임표나 지역 판정 규칙 중 하나라도 바뀌면 다른 버전으로 취급
+    version = f"{rate_table.version}-{classifier_version()}"
+    keys = row_keys(waybills, weights, addresses, sender_addresses)
+    known = ledger.lookup(keys, version)
+    hit = known['expected'].notna().to_numpy()
+
+    expected = np.zeros(len(keys), dtype=np.int64)
+    region_types = np.empty(len(keys), dtype=object)
+    remarks = np.empty(len(keys), dtype=object)
+    expected[hit] = known['expected'].to_numpy()[hit].astype(np.int64)
+    region_types[hit] = known['region'].to_numpy()[hit]
+    remarks[hit] = known['remark'].to_numpy()[hit]
+
+    miss = ~hit
+    if miss.any():
+        def take(values):
+            return None if values is None else pd.Series(values).reset_index(drop=True)[miss]
+        new_expected, new_regions, new_remarks = calculate_expected_costs(
+            take(weights), take(addresses), rate_table, sender_addresses=take(sender_addresses))
+        expected[miss] = new_expected
+        region_types[miss] = new_regions
+        remarks[miss] = new_remarks
+        ledger.record(keys[miss], take(waybills), version, new_expected, new_regions, new_remarks)
+
+    return expected, region_types, remarks, int(hit.sum())
+
+def _file_summary(filename, rows=0, mismatches=0, result_file=None, error=None):
+    return {'file': filename, 'rows': rows, 'mismatches': mismatches,
+            'result_file': result_file, 'error': error}
+
+def find_duplicates(df, waybill_index, entity, service, source_file):
+    """Bool mask of rows whose 운송장번호 was already billed in another file (None without an index)."""
+    if waybill_index is None or '운송장번호' not in df.columns:
+        return None
+    return waybill_index.check_and_add(df['운송장번호'], entity, service, source_file,
+                                       infer_month(source_file) if source_file else None)
+
+def verify_frame(df, rate_map, ledger=None, waybill_index=None, entity='', service='', source_file=''):
+    """Adds the 예상운임/지역구분/비고/차액/결과 columns to df in place and returns it.
+
+    With a ledger and a 운송장번호 column, only new or changed rows are priced.
+    With a waybill_index, waybills already billed in another file are marked as duplicates.
+    """
+    # Verification Columns
+    weights = df['무게'] if '무게' in df.columns else pd.Series(0, index=df.index)
+    addresses = df['수취주소'] if '수취주소' in df.columns else pd.Series('', index=df.index)
+    actual_costs = df['발송금액'] if '발송금액' in df.columns else pd.Series(0, index=df.index)
+
+    if ledger is not None and '운송장번호' in df.columns:
+        expected_costs, region_types, remarks, reused = calculate_expected_costs_incremental(
+            df['운송장번호'], weights, addresses, rate_map, ledger)
+        print(f"  - Incremental: reused {reused} of {len(df)} rows from the ledger.")
+    else:
+        expected_costs, region_types, remarks = calculate_expected_costs(weights, addresses, rate_map)
+    duplicates = find_duplicates(df, waybill_index, entity, service, source_file)
+    return assign_result_columns(df, actual_costs, expected_costs, region_types, remarks, duplicates)
+
+def compact_costs(values):
+    """Returns cost values as int32 (int64 if needed) when they are all whole numbers, else as given."""
+    values = np.asarray(values)
+    if values.dtype.kind == 'f':
+        if not len(values) or not np.isfinite(values).all() or (values != np.round(values)).any():
+            return values
+    elif values.dtype.kind not in 'iu':
+        return values
+    info = np.iinfo(np.int32)
+    if len(values) and (values.min() < info.min or values.max() > info.max):
+        return values.astype(np.int64)
+    return values.astype(np.int32)
+
+def result_columns(actual_costs, expected_costs, region_types, remarks, duplicates=None):
+    """Builds the 예상운임/지역구분/비고/차액/결과 columns in their compact dtypes."""
+    diffs = np.asarray(actual_costs) - expected_costs
+    # NaN 차액도 불일치로 처리 (diff != 0)
+    codes = (diffs != 0).astype(np.int8)
+    if duplicates is not None:
+        codes[duplicates] = RESULT_STATUSES.index(DUPLICATE_STATUS)
+    statuses = pd.Categorical.from_codes(codes, categories=RESULT_STATUSES)
+    return {
+        '예상운임': compact_costs(expected_costs),
+        '지역구분': pd.Categorical(region_types),
+        '비고': pd.Categorical(remarks),
+        '차액': compact_costs(diffs),
+        '결과': statuses,
+    }
+
+def assign_result_columns(df, actual_costs, expected_costs, region_types, remarks, duplicates=None):
+    """Compares actual and expected costs and adds the result columns to df in place."""
+    for name, values in result_columns(actual_costs, expected_costs, region_types, remarks, duplicates).items():
+        df[name] = values
+    return df
+
+def perform_verification(df, rate_map, selected_entity, ledger=None, waybill_index=None, service='', source_file=''):
+    """Verifies an invoice frame the way the app and the folder watcher do.
+
+    Returns (final_df, None) with the 법인/예상운임/지역구분/차액/결과/비고 columns added,
+    or (None, error message) when a required column is missing. The columns are
+    added to df itself (no copy); labels are categorical and costs integers.
+    With a waybill_index, rows already billed in another file get the 중복 청구 result.
+    """
+    # 컬럼 매핑 (유연하게 처리)
+    columns = resolve_columns(df.columns)
+    col_weight = columns['weight']
+    col_address = columns['address']
+    col_actual_cost = columns['actual_cost']
+    col_sender_address = columns['sender_address']
+
+    # 필수 컬럼 검사
+    missing_cols = missing_columns(df.columns, columns)
+    if missing_cols:
+        return None, f"필수 컬럼 누락: {', '.join(missing_cols)} (발견된 컬럼: {list(df.columns)})"
+
+    # 로직 수행 (컬럼 단위 일괄 계산)
+    sender_addrs = df[col_sender_address] if col_sender_address else None
+    if ledger is not None and '운송장번호' in df.columns:
+        # 증분 검증: 같은 운임표로 이미 검증된 운송장은 원장에서 재사용
+        expected, region, remark, _ = calculate_expected_costs_incremental(
+            df['운송장번호'], df[col_weight], df[col_address], rate_map, ledger, sender_addresses=sender_addrs)
+    else:
+        expected, region, remark = calculate_expected_costs(df[col_weight], df[col_address], rate_map, sender_addresses=sender_addrs)
+    duplicates = find_duplicates(df, waybill_index, selected_entity, service, source_file)
+    results = result_columns(df[col_actual_cost].to_numpy(), expected, region, remark, duplicates)
+
+    # 입력 프레임에 결과 컬럼을 바로 추가 (전체 복사 없음)
+    final_df = df
+    final_df['법인'] = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8), categories=[selected_entity])
+    for name in ('예상운임', '지역구분', '차액', '결과', '비고'):
+        final_df[name] = results[name]
     
-    return base_cost, region_type, "MaxBracket"
+    return final_df, None
+
+def _open_ledger(ledger_path):
+    return VerificationLedger(ledger_path) if ledger_path else None
+
+def _close_ledger(ledger):
+    if ledger is not None:
+        ledger.close()
+
+def _open_waybill_index(waybill_index_path):
+    try:
+        return WaybillIndex(waybill_index_path) if waybill_index_path else None
+    except Exception as e:
+        print(f"  - Warning: waybill index unavailable: {e}")
+        return None
 
-def process_file(file_path, rate_map):
-    """Processes a single data file and saves the verification result."""
+# 운송장 색인은 프로세스(스레드)마다 한 번만 열어 배치 내내 재사용하고 프로세스가 끝날 때 닫음
+# (블룸 필터 파일을 파일마다가 아니라 배치가 끝날 때 한 번만 저장)
+_SHARED_WAYBILL_INDEXES = {}
+
+def shared_waybill_index(waybill_index_path):
+    """Open WaybillIndex for this process and thread, reused by every file of the batch (None without a path)."""
+    if not waybill_index_path:
+        return None
+    key = (os.path.abspath(waybill_index_path), threading.get_ident())
+    index = _SHARED_WAYBILL_INDEXES.get(key)
+    if index is None:
+        index = _open_waybill_index(waybill_index_path)
+        if index is not None:
+            _SHARED_WAYBILL_INDEXES[key] = index
+            Finalize(None, close_shared_waybill_indexes, exitpriority=0)
+    return index
+
+def close_shared_waybill_indexes():
+    """Closes the indexes opened by shared_waybill_index() in this thread (saving their Bloom filters)."""
+    for key in [key for key in _SHARED_WAYBILL_INDEXES if key[1] == threading.get_ident()]:
+        _SHARED_WAYBILL_INDEXES.pop(key).close()
+
+def _count_status(results, status):
+    return int((results == status).sum())
+
+def _open_warehouse_run(warehouse_path, entity, service, filename, rate_map=None):
+    """Opens the results warehouse and starts a run; returns (warehouse, run_id) or (None, None)."""
+    if not warehouse_path:
+        return None, None
+    try:
+        warehouse = ResultsWarehouse(warehouse_path)
+        limits = compile_rate_table(rate_map).limits if rate_map is not None else None
+        return warehouse, warehouse.begin_run(entity, service, filename, weight_limits=limits)
+    except Exception as e:
+        print(f"  - Warning: results warehouse unavailable: {e}")
+        return None, None
+
+def _add_warehouse_rows(warehouse, run_id, df):
+    if warehouse is None:
+        return
+    try:
+        warehouse.add_rows(run_id, df)
+    except Exception as e:
+        print(f"  - Warning: failed to record rows in the results warehouse: {e}")
+
+def _finish_timer(timer, summary, run_log_path, **extra):
+    """Closes the run timer, prints the stage table and appends it to the run log."""
+    record = timer.finish(rows=summary['rows'], mismatches=summary['mismatches'], error=summary['error'], **extra)
+    if timer.stages:
+        print(format_stages(record))
+    if timer.profile_text:
+        print(timer.profile_text)
+    if run_log_path:
+        append_run_log(record, run_log_path)
+    summary['timings'] = record
+    return summary
+
+def process_file(file_path, rate_map, ledger_path=None, warehouse_path=None, entity='', service='',
+                 run_log_path=None, profile=False, trace_memory=False, results_dir=None,
+                 waybill_index_path=None, output_format=DEFAULT_OUTPUT_FORMAT):
+    """Processes a single data file (xlsx, csv or parquet) and saves the verification result.
+
+    Returns a summary dict with the row and mismatch counts (or the error).
+    With ledger_path set, rows already verified against the same rate table
+    are reused from that ledger. With warehouse_path set, the verified rows
+    are also stored in the results warehouse under entity/service. Stage
+    timings are appended to run_log_path; profile/trace_memory turn on
+    cProfile and tracemalloc for the run. Results go to results_dir
+    (default: RESULTS_DIR) as output_format (xlsx, parquet or csv). With
+    waybill_index_path set, waybills already billed in another file are
+    marked as duplicates.
+    """
     filename = os.path.basename(file_path)
     print(f"Processing {filename}...")
+    timer = RunTimer(filename, profile=profile, trace_memory=trace_memory,
+                     mode='process_file', entity=entity, service=service)
     
     try:
-        # Check sheet names
-        xls = pd.ExcelFile(file_path)
-        sheet_to_use = 0
-        
-        if '세부내역' in xls.sheet_names:
-            sheet_to_use = '세부내역'
-            print(f"  - Found '세부내역' sheet. Using it.")
-        else:
-            print(f"  - '세부내역' sheet not found. Using first sheet.")
-            
-        df = pd.read_excel(file_path, sheet_name=sheet_to_use)
+        with timer.stage('read') as stage:
+            # Read the workbook once from memory and pick the sheet (csv/parquet have none)
+            df, sheet_used = read_invoice(file_path, strip_columns=False)
+            if sheet_used == DETAIL_SHEET:
+                print(f"  - Found '세부내역' sheet. Using it.")
+            elif sheet_used is not None:
+                print(f"  - '세부내역' sheet not found. Using first sheet.")
+            stage['rows'] = len(df)
         
     except Exception as e:
         print(f"Error reading {filename}: {e}")
-        return
+        return _finish_timer(timer, _file_summary(filename, error=f"read failed: {e}"), run_log_path)
 
-    # Verification Columns
-    expected_costs = []
-    region_types = []
-    remarks = []
-    diffs = []
-    statuses = []
-    
-    for index, row in df.iterrows():
-        weight = row.get('무게', 0)
-        address = row.get('수취주소', '')
-        actual_cost = row.get('발송금액', 0)
-        
-        # Calculate
-        expected, region, remark = calculate_expected_cost(weight, address, rate_map)
-        
-        # Compare
-        diff = actual_cost - expected
-        status = '✅ 일치' if diff == 0 else '❌ 불일치'
-        
-        expected_costs.append(expected)
-        region_types.append(region)
-        remarks.append(remark)
-        diffs.append(diff)
-        statuses.append(status)
-        
-    # Add columns to DataFrame
-    df['예상운임'] = expected_costs
-    df['지역구분'] = region_types
-    df['비고'] = remarks
-    df['차액'] = diffs
-    df['결과'] = statuses
-    
-    # Save Result
-    if not os.path.exists(RESULTS_DIR):
-        os.makedirs(RESULTS_DIR)
+    try:
+        with timer.stage('verify', rows=len(df)):
+            ledger = _open_ledger(ledger_path)
+            try:
+                verify_frame(df, rate_map, ledger, shared_waybill_index(waybill_index_path), entity, service, filename)
+            finally:
+                _close_ledger(ledger)
+        duplicates = _count_status(df['결과'], DUPLICATE_STATUS)
+        if duplicates:
+            print(f"  - Duplicates: {duplicates} waybills were already billed in another file.")
         
-    result_file = os.path.join(RESULTS_DIR, f"verified_{filename}")
-    df.to_excel(result_file, index=False)
+        # Save Result
+        results_dir = results_dir or RESULTS_DIR
+        os.makedirs(results_dir, exist_ok=True)
+            
+        result_file = os.path.join(results_dir, verified_file_name(filename, output_format))
+        with timer.stage('write', rows=len(df)):
+            write_invoice_frame(df, result_file, output_format)
+        print(f"Saved results to {result_file}")
+
+        warehouse, run_id = _open_warehouse_run(warehouse_path, entity, service, filename, rate_map)
+        if warehouse is not None:
+            with timer.stage('warehouse', rows=len(df)):
+                _add_warehouse_rows(warehouse, run_id, df)
+                warehouse.close()
+    except Exception as e:
+        _finish_timer(timer, _file_summary(filename, error=str(e)), run_log_path)
+        raise
+
+    summary = _file_summary(filename, rows=len(df), mismatches=_count_status(df['결과'], MISMATCH_STATUS),
+                            result_file=result_file)
+    return _finish_timer(timer, summary, run_log_path, bytes_per_row=frame_bytes_per_row(df))
+
+def process_file_streaming(file_path, rate_map, chunk_size=DEFAULT_CHUNK_SIZE, ledger_path=None,
+                           warehouse_path=None, entity='', service='',
+                           run_log_path=None, profile=False, trace_memory=False, results_dir=None,
+                           waybill_index_path=None, output_format=DEFAULT_OUTPUT_FORMAT):
+    """Streaming variant of process_file for very large workbooks.
+
+    Rows are read through openpyxl's read-only iterator (CSV/Parquet in
+    chunks) and written chunk by chunk, so memory stays flat regardless of
+    the number of rows.
+    """
+    filename = os.path.basename(file_path)
+    print(f"Processing {filename} (streaming, {chunk_size} rows per chunk)...")
+    results_dir = results_dir or RESULTS_DIR
+    os.makedirs(results_dir, exist_ok=True)
+    result_file = os.path.join(results_dir, verified_file_name(filename, output_format))
+    timer = RunTimer(filename, profile=profile, trace_memory=trace_memory,
+                     mode='process_file_streaming', entity=entity, service=service, chunk_size=chunk_size)
+
+    counts = {'mismatches': 0, 'duplicates': 0, 'verify_seconds': 0.0, 'warehouse_seconds': 0.0}
+    ledger = _open_ledger(ledger_path)
+    waybill_index = shared_waybill_index(waybill_index_path)
+    warehouse, run_id = _open_warehouse_run(warehouse_path, entity, service, filename, rate_map)
+    def verify_chunk(chunk):
+        started = time.perf_counter()
+        verify_frame(chunk, rate_map, ledger, waybill_index, entity, service, filename)
+        counts['mismatches'] += _count_status(chunk['결과'], MISMATCH_STATUS)
+        counts['duplicates'] += _count_status(chunk['결과'], DUPLICATE_STATUS)
+        counts['verify_seconds'] += time.perf_counter() - started
+        started = time.perf_counter()
+        _add_warehouse_rows(warehouse, run_id, chunk)
+        counts['warehouse_seconds'] += time.perf_counter() - started
+        return chunk
+
+    try:
+        # read/write는 청크 단위로 섞여 있으므로 전체를 'stream' 단계로 측정
+        with timer.stage('stream') as stage:
+            rows = stream_verify_file(file_path, result_file, verify_chunk, chunk_size=chunk_size)
+            stage['rows'] = rows
+    except Exception as e:
+        print(f"Error processing {filename}: {e}")
+        return _finish_timer(timer, _file_summary(filename, error=str(e)), run_log_path)
+    finally:
+        _close_ledger(ledger)
+        if warehouse is not None:
+            warehouse.close()
+
+    if counts['duplicates']:
+        print(f"  - Duplicates: {counts['duplicates']} waybills were already billed in another file.")
+    timer.add_stage('verify', counts['verify_seconds'], rows)
+    if warehouse is not None:
+        timer.add_stage('warehouse', counts['warehouse_seconds'], rows)
     print(f"Saved results to {result_file}")
+    summary = _file_summary(filename, rows=rows, mismatches=counts['mismatches'], result_file=result_file)
+    return _finish_timer(timer, summary, run_log_path)
+
+# === 병렬 처리 (--jobs) ===
+# 워커마다 한 번만 운임표를 전달받아 전역에 보관
+_WORKER_RATE_MAP = None
+
+def _init_worker(rate_map):
+    global _WORKER_RATE_MAP
+    _WORKER_RATE_MAP = rate_map
+
+def _run_file(file_path, rate_map, chunk_size=None, **options):
+    if chunk_size:
+        return process_file_streaming(file_path, rate_map, chunk_size=chunk_size, **options)
+    return process_file(file_path, rate_map, **options)
+
+def _process_file_in_worker(file_path, options):
+    try:
+        return _run_file(file_path, _WORKER_RATE_MAP, **options)
+    except Exception as e:
+        return _file_summary(os.path.basename(file_path), error=str(e))
+
+def process_files(file_paths, rate_map, jobs=1, **options):
+    """Verifies every file, in a process pool when jobs > 1. Returns summaries in input order.
+
+    options are passed through to process_file (or process_file_streaming
+    when chunk_size is set). The waybill index is opened once per process
+    and closed when the batch (or the worker) ends.
+    """
+    if jobs <= 1 or len(file_paths) <= 1:
+        summaries = []
+        try:
+            for file_path in file_paths:
+                try:
+                    summaries.append(_run_file(file_path, rate_map, **options))
+                except Exception as e:
+                    print(f"Error processing {os.path.basename(file_path)}: {e}")
+                    summaries.append(_file_summary(os.path.basename(file_path), error=str(e)))
+        finally:
+            close_shared_waybill_indexes()
+        return summaries
+
+    summaries = {}
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(rate_map,)) as pool:
+        futures = {pool.submit(_process_file_in_worker, path, options): path for path in file_paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                summaries[path] = future.result()
+            except Exception as e:
+                # 워커 프로세스 자체가 죽은 경우
+                summaries[path] = _file_summary(os.path.basename(path), error=f"worker failed: {e}")
+    return [summaries[path] for path in file_paths]
+
+def print_summary(summaries):
+    print("")
+    print("=== Summary ===")
+    total_rows = total_mismatches = failed = 0
+    for summary in summaries:
+        if summary['error']:
+            failed += 1
+            print(f"  [FAIL] {summary['file']}: {summary['error']}")
+            continue
+        total_rows += summary['rows']
+        total_mismatches += summary['mismatches']
+        print(f"  [OK]   {summary['file']}: {summary['rows']} rows, {summary['mismatches']} mismatches")
+    print(f"Files: {len(summaries)} (failed: {failed}), rows: {total_rows}, mismatches: {total_mismatches}")
+
+def parse_args(argv=None):
+    # 옵션 정의는 cli.py 와 공유 (pandas 없이 --help 가능), 무거운 모듈에 있는 기본값만 여기서 채움
+    from cli import build_verify_parser
+    args = build_verify_parser(prog=None).parse_args(argv)
+    args.data_dir = args.data_dir or DATA_DIR
+    args.results_dir = args.results_dir or RESULTS_DIR
+    args.ledger = args.ledger or LEDGER_PATH
+    args.warehouse = args.warehouse or WAREHOUSE_PATH
+    args.waybill_index = args.waybill_index or WAYBILL_INDEX_PATH
+    if args.run_log is None:
+        args.run_log = RUN_LOG_PATH
+    return args
+
+def main(argv=None, startup_seconds=None):
+    """Batch entry point; startup_seconds (import time measured by cli.py) is logged as a stage."""
+    args = parse_args(argv)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    data_dir = args.data_dir
+    service = args.service or os.path.basename(os.path.normpath(data_dir))
+    rate_file = args.rate_file or TARIFFS.rate_file(service, data_dir)
+
+    batch_timer = RunTimer('batch', mode='batch', jobs=jobs, data_dir=data_dir)
+    if startup_seconds is not None:
+        batch_timer.add_stage('startup', startup_seconds)
 
-def main():
     print("Loading rate table...")
-    if not os.path.exists(RATE_FILE):
-        print(f"Error: Rate file not found at {RATE_FILE}")
+    if not os.path.exists(rate_file):
+        print(f"Error: Rate file not found at {rate_file}")
         return
 
-    # Load Rate Table
+    # Load Rate Table (compiled once per service; workers receive the compiled table)
     try:
-        rate_map = load_rate_table(RATE_FILE)
+        with batch_timer.stage('load_rate_table'):
+            rate_map = TARIFFS.get(service, rate_file)
         print(f"Loaded {len(rate_map)} rate brackets.")
     except Exception as e:
         print(f"Error loading rate table: {e}")
         return
     
     # Process all files in data directory
-    if not os.path.exists(DATA_DIR):
-        print(f"Error: Data directory not found at {DATA_DIR}")
+    if not os.path.exists(data_dir):
+        print(f"Error: Data directory not found at {data_dir}")
         return
 
-    files = [f for f in os.listdir(DATA_DIR) if f.endswith('.xlsx')]
-    count = 0
+    files = [f for f in os.listdir(data_dir) if is_invoice_file(f)]
+    file_paths = []
     
     for filename in files:
-        file_path = os.path.join(DATA_DIR, filename)
+        file_path = os.path.join(data_dir, filename)
         
         # Skip rate table
-        if os.path.abspath(file_path) == os.path.abspath(RATE_FILE):
+        if os.path.abspath(file_path) == os.path.abspath(rate_file):
             continue
             
-        process_file(file_path, rate_map)
-        count += 1
+        file_paths.append(file_path)
+
+    if jobs > 1:
+        print(f"Processing {len(file_paths)} files with {jobs} worker processes...")
+    chunk_size = args.chunk_size if args.stream else None
+    ledger_path = args.ledger if args.incremental else None
+    warehouse_path = None if args.no_warehouse else args.warehouse
+    waybill_index_path = None if args.no_waybill_index else args.waybill_index
+    with batch_timer.stage('process_files') as stage:
+        summaries = process_files(file_paths, rate_map, jobs=jobs, chunk_size=chunk_size, ledger_path=ledger_path,
+                                  warehouse_path=warehouse_path, entity=args.entity, service=service,
+                                  run_log_path=args.run_log, profile=args.profile, trace_memory=args.trace_memory,
+                                  results_dir=args.results_dir, waybill_index_path=waybill_index_path,
+                                  output_format=args.output_format)
+        stage['rows'] = sum(summary['rows'] for summary in summaries)
         
-    print(f"Done! Processed {count} files.")
+    print(f"Done! Processed {len(summaries)} files.")
+    print_summary(summaries)
+    batch_record = batch_timer.finish(files=len(summaries), rows=stage['rows'],
+                                      mismatches=sum(summary['mismatches'] for summary in summaries))
+    print(format_stages(batch_record))
+    if args.run_log:
+        append_run_log(batch_record, args.run_log)
+    if jobs <= 1:
+        cache = address_cache_info()
+        print(f"Address cache: {cache.currsize} distinct addresses, {cache.hits} hits / {cache.misses} misses.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,274 @@
+import os
+import re
+import sqlite3
+import numpy as np
+import pandas as pd
+
+# 운송장번호 색인: 다른 파일/월/법인에서 이미 청구된 운송장을 찾아 중복 청구로 표시
+# SQLite 에 운송장 해시를 키로 저장하고, 앞단의 블룸 필터로 처음 보는 운송장은 DB 조회 없이 걸러냄
+# 행마다 기록한 세대(added)로 블룸 필터를 따라잡으므로, 필터 파일은 내용이 바뀐 경우 닫을 때만 저장
+WAYBILL_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'waybill_index.sqlite')
+BLOOM_CAPACITY = 2_000_000
+BLOOM_BITS_PER_KEY = 10
+BLOOM_HASHES = 7
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS waybills ("
+    " waybill_key INTEGER NOT NULL,"
+    " entity TEXT NOT NULL,"
+    " service TEXT NOT NULL,"
+    " source_file TEXT NOT NULL,"
+    " month TEXT,"
+    " waybill TEXT,"
+    " added INTEGER NOT NULL DEFAULT 0,"
+    " PRIMARY KEY (waybill_key, entity, service, source_file)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO meta VALUES ('generation', 0)",
+]
+
+# entity_folders.build_unique_target_path 가 이름이 겹칠 때 붙이는 '_YYYYMMDD_HHMMSS[_N]'
+_UNIQUE_SUFFIX = re.compile(r'_\d{8}_\d{6}(?:_\d+)?$')
+
+def source_key(source_file):
+    """File name used to tell invoices apart: no folder, extension, 'verified_' prefix or copy timestamp.
+
+    The same invoice keeps its key when it is re-verified from the verified
+    folder (including timestamped copies) or converted between xlsx/csv/parquet.
+    """
+    stem = os.path.splitext(os.path.basename(source_file))[0]
+    stem = stem[len('verified_'):] if stem.startswith('verified_') else stem
+    return _UNIQUE_SUFFIX.sub('', stem)
+
+def normalize_waybills(waybills):
+    """운송장번호 as text ('123.0' read from Excel becomes '123'); blanks and NaN become None."""
+    normalized = []
+    for value in pd.Series(waybills, dtype=object):
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            normalized.append(None)
+        elif isinstance(value, float) and value.is_integer():
+            normalized.append(str(int(value)))
+        else:
+            text = str(value).strip()
+            normalized.append(text or None)
+    return normalized
+
+def waybill_keys(normalized):
+    """Signed 64-bit hash per normalized waybill (deterministic across runs)."""
+    text = pd.Series([w or '' for w in normalized], dtype=object)
+    return pd.util.hash_pandas_object(text, index=False).to_numpy().view(np.int64)
+
+class BloomFilter:
+    """Fixed-size bit array answering 'definitely new' for most unseen keys.
+
+    count tracks how many distinct keys were added; past capacity the
+    false-positive rate climbs quickly and the filter should be rebuilt larger.
+    """
+
+    def __init__(self, capacity=BLOOM_CAPACITY, bits=None, count=0):
+        self.capacity = capacity
+        self.count = count
+        size = max(64, capacity * BLOOM_BITS_PER_KEY)
+        self.bits = bits if bits is not None else np.zeros((size + 7) // 8, dtype=np.uint8)
+        self.size = len(self.bits) * 8
+
+    @property
+    def full(self):
+        return self.count > self.capacity
+
+    def _positions(self, keys):
+        # 이중 해싱: 64비트 키의 상/하위 32비트로 k 개의 위치를 만듦
+        keys = np.asarray(keys, dtype=np.int64).view(np.uint64)
+        low = keys & np.uint64(0xFFFFFFFF)
+        high = (keys >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(BLOOM_HASHES, dtype=np.uint64)
+        return (low[:, None] + steps[None, :] * high[:, None]) % np.uint64(self.size)
+
+    def add(self, keys):
+        """Adds keys; returns how many of them were not in the filter yet."""
+        keys = np.unique(np.asarray(keys, dtype=np.int64))
+        new = keys[~self.might_contain(keys)]
+        if len(new):
+            positions = self._positions(new).ravel()
+            np.bitwise_or.at(self.bits, (positions >> np.uint64(3)).astype(np.intp),
+                             (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+            self.count += len(new)
+        return len(new)
+
+    def might_contain(self, keys):
+        positions = self._positions(keys)
+        hits = self.bits[(positions >> np.uint64(3)).astype(np.intp)] >> (positions & np.uint64(7)).astype(np.uint8)
+        return (hits & 1).all(axis=1)
+
+class WaybillIndex:
+    """Persistent set of (운송장 hash, entity, service, source file) shared by every verification run.
+
+    check_and_add flags waybills that were already recorded for another file
+    (another month or entity) and records the current ones. The Bloom filter
+    is a cache of the SQLite contents kept in '<path>.bloom'; when another
+    process has added waybills since, only those rows are read back.
+    Files are compared by source_key(), so re-verifying a verified_* copy
+    does not flag the invoice against itself.
+    """
+
+    def __init__(self, path=WAYBILL_INDEX_PATH, use_bloom=True):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA cache_size=-65536")
+        for statement in _SCHEMA:
+            self.conn.execute(statement)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(waybills)")]
+        if 'added' not in columns:
+            self.conn.execute("ALTER TABLE waybills ADD COLUMN added INTEGER NOT NULL DEFAULT 0")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS waybills_added ON waybills (added)")
+        self.conn.commit()
+        self.use_bloom = use_bloom
+        self._bloom = None
+        self._bloom_generation = None
+        self._bloom_dirty = False
+
+    @property
+    def bloom_path(self):
+        return f"{self.path}.bloom"
+
+    def _generation(self):
+        return self.conn.execute("SELECT value FROM meta WHERE name = 'generation'").fetchone()[0]
+
+    def _sync_bloom(self, generation):
+        if self._bloom is None:
+            loaded = self._load_bloom(generation)
+            if loaded is None:
+                self._bloom, self._bloom_generation = self._rebuild_bloom(), generation
+            else:
+                self._bloom, self._bloom_generation = loaded
+        if self._bloom_generation != generation:
+            self._catch_up(generation)
+        self._grow_bloom(generation)
+
+    def _grow_bloom(self, generation):
+        # 저장된 필터는 만든 당시 용량 그대로이므로, 운송장 수가 용량을 넘으면 더 크게 다시 만듦
+        if self._bloom.full:
+            self._rebuild_bloom()
+            self._bloom_generation = generation
+
+    def _load_bloom(self, generation):
+        try:
+            with np.load(self.bloom_path) as saved:
+                saved_generation = int(saved['generation'])
+                if saved_generation > generation:
+                    return None
+                bloom = BloomFilter(int(saved['capacity']), saved['bits'].copy(), int(saved['count']))
+                return bloom, saved_generation
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _add_to_bloom(self, keys):
+        if len(keys) and self._bloom.add(keys):
+            self._bloom_dirty = True
+
+    def _add_rows_to_bloom(self, cursor):
+        while True:
+            rows = cursor.fetchmany(500_000)
+            if not rows:
+                break
+            self._add_to_bloom(np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)))
+
+    def _catch_up(self, generation):
+        # 마지막으로 반영한 세대 이후에 다른 프로세스가 기록한 운송장만 추가
+        self._add_rows_to_bloom(self.conn.execute(
+            "SELECT waybill_key FROM waybills WHERE added > ?", (self._bloom_generation,)))
+        self._bloom_generation = generation
+
+    def _rebuild_bloom(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM waybills").fetchone()[0]
+        capacity = BLOOM_CAPACITY
+        while capacity < count * 2:
+            capacity *= 2
+        self._bloom = BloomFilter(capacity)
+        self._add_rows_to_bloom(self.conn.execute("SELECT waybill_key FROM waybills"))
+        self._bloom_dirty = True
+        return self._bloom
+
+    def _find_elsewhere(self, keys, entity, service, source_file):
+        cur = self.conn.cursor()
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_waybills (waybill_key INTEGER PRIMARY KEY)")
+        cur.execute("DELETE FROM lookup_waybills")
+        cur.executemany("INSERT OR IGNORE INTO lookup_waybills VALUES (?)", ((int(k),) for k in keys))
+        rows = cur.execute(
+            "SELECT DISTINCT w.waybill_key FROM waybills w JOIN lookup_waybills k ON k.waybill_key = w.waybill_key"
+            " WHERE NOT (w.entity = ? AND w.service = ? AND w.source_file = ?)",
+            (entity, service, source_file)).fetchall()
+        return np.array([r[0] for r in rows], dtype=np.int64)
+
+    def check_and_add(self, waybills, entity, service, source_file, month=None):
+        """Returns a bool array marking waybills already billed in another file, then records these ones."""
+        source_file = source_key(source_file)
+        normalized = normalize_waybills(waybills)
+        valid = np.array([w is not None for w in normalized], dtype=bool)
+        keys = waybill_keys(normalized)
+        duplicates = np.zeros(len(keys), dtype=bool)
+        if not valid.any():
+            return duplicates
+
+        if self.use_bloom and self._bloom is None:
+            # 처음 한 번은 잠금 없이 필터 파일을 읽거나 DB 에서 만듦
+            with self.conn:
+                self._sync_bloom(self._generation())
+
+        # 키 순서대로 넣어야 B-tree 페이지를 차례로 채워 색인이 커져도 기록 시간이 일정함
+        order = np.argsort(keys[valid], kind='stable')
+        new_keys = keys[valid][order]
+        new_waybills = np.asarray(normalized, dtype=object)[valid][order]
+        # 조회와 기록을 한 쓰기 트랜잭션에서 해야 동시에 검증되는 두 파일이 서로를 놓치지 않음
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            before = self._generation()
+            candidates = valid
+            if self.use_bloom:
+                self._sync_bloom(before)
+                candidates = valid & self._bloom.might_contain(keys)
+            if candidates.any():
+                found = self._find_elsewhere(np.unique(keys[candidates]), entity, service, source_file)
+                duplicates = candidates & np.isin(keys, found)
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO waybills (waybill_key, entity, service, source_file, month, waybill, added)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((k, entity, service, source_file, month, w, before + 1)
+                 for k, w in zip(new_keys.tolist(), new_waybills)))
+            self.conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'generation'")
+        if self.use_bloom:
+            self._add_to_bloom(keys[valid])
+            self._bloom_generation = before + 1
+            self._grow_bloom(before + 1)
+        return duplicates
+
+    def sources(self, waybill):
+        """Every (entity, service, month, source_file) the waybill was recorded for."""
+        key = int(waybill_keys(normalize_waybills([waybill]))[0])
+        return self.conn.execute(
+            "SELECT entity, service, month, source_file FROM waybills WHERE waybill_key = ?"
+            " ORDER BY month, entity, source_file", (key,)).fetchall()
+
+    def _save_bloom(self):
+        if not (self.use_bloom and self._bloom_dirty and self._bloom is not None):
+            return
+        tmp_path = f"{self.bloom_path}.tmp.npz"
+        try:
+            np.savez(tmp_path, bits=self._bloom.bits, capacity=self._bloom.capacity, count=self._bloom.count,
+                     generation=self._bloom_generation)
+            os.replace(tmp_path, self.bloom_path)
+            self._bloom_dirty = False
+        except OSError:
+            pass
+
+    def close(self):
+        self._save_bloom()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,114 @@
+import os
+import numpy as np
+import openpyxl
+import pandas as pd
+from excel_loader import DETAIL_SHEET, open_excel_source, pick_sheet_name, header_names
+from invoice_io import discard_partial, partial_path
+
+DEFAULT_CHUNK_SIZE = 50000
+
+def iter_sheet_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE, sheet_name=None):
+    """Yields the invoice sheet as DataFrames of at most chunk_size rows.
+
+    Uses openpyxl's read-only iterator so only one chunk is held in memory.
+    Fully empty rows are skipped, like pd.read_excel.
+    """
+    # Read from a memory-mapped view of the file; no temporary copy
+    with open_excel_source(file_path) as source:
+        wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+        try:
+            ws = wb[sheet_name or pick_sheet_name(wb.sheetnames)]
+            rows = ws.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = header_names(header)
+
+            buffer = []
+            for row in rows:
+                if all(value is None for value in row):
+                    continue
+                row = tuple(row[:len(columns)]) + (None,) * (len(columns) - len(row))
+                buffer.append(row)
+                if len(buffer) >= chunk_size:
+                    yield pd.DataFrame(buffer, columns=columns)
+                    buffer = []
+            if buffer:
+                yield pd.DataFrame(buffer, columns=columns)
+        finally:
+            wb.close()
+
+def _cell_value(value):
+    if value is None or isinstance(value, str):
+        return value
+    # NaN/NaT/NA는 빈 셀로 기록 (to_excel과 동일)
+    if pd.isna(value):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+class StreamingXlsxWriter:
+    """Appends DataFrame chunks to a write-only workbook; rows are flushed to disk as they go.
+
+    A path target only appears once close() succeeds (saved as '<path>.tmp' first);
+    on error the workbook is discarded.
+    """
+
+    def __init__(self, file_path, sheet_name=DETAIL_SHEET):
+        self.file_path = file_path
+        # 버퍼(BytesIO)에 쓸 때는 임시 파일 없이 바로 저장
+        self.partial_path = partial_path(file_path) if isinstance(file_path, (str, os.PathLike)) else None
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet(title=sheet_name)
+        self.columns = None
+        self.rows = 0
+
+    def write(self, df):
+        if self.columns is None:
+            self.columns = list(df.columns)
+            self.sheet.append(self.columns)
+        for row in df.itertuples(index=False, name=None):
+            self.sheet.append([_cell_value(value) for value in row])
+        self.rows += len(df)
+
+    def close(self):
+        if self.columns is None:
+            self.sheet.append([])
+        if self.partial_path is None:
+            self.workbook.save(self.file_path)
+        else:
+            try:
+                self.workbook.save(self.partial_path)
+            except Exception:
+                discard_partial(self.partial_path)
+                raise
+            os.replace(self.partial_path, self.file_path)
+        self.workbook.close()
+
+    def discard(self):
+        # 쓰던 시트를 닫아 두지 않으면 gc 때 openpyxl 이 닫힌 임시 파일에 쓰려다 ValueError 를 냄
+        if not self.sheet.closed:
+            self.sheet.close()
+        self.workbook.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+def write_dataframe_xlsx(df, target, sheet_name=DETAIL_SHEET, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Serializes df once through a write-only workbook. target may be a path or a binary buffer."""
+    writer = StreamingXlsxWriter(target, sheet_name=sheet_name)
+    for start in range(0, len(df), chunk_size):
+        writer.write(df.iloc[start:start + chunk_size])
+    if writer.columns is None:
+        writer.columns = list(df.columns)
+        writer.sheet.append(writer.columns)
+    writer.close()
+    return target